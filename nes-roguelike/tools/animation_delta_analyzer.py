@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Animation Frame Delta Analyzer
+------------------------------
+Works out what it would cost to stream each animation's tiles into CHR-RAM
+instead of keeping them all resident in a CHR bank.
+
+For every consecutive frame pair (including the wrap from the last frame
+back to the first for looping animations) it computes which tiles change,
+assigns them to a fixed window of CHR-RAM slots, and produces the minimal
+upload list for each frame with its byte cost. Animations whose worst
+per-frame upload exceeds the vblank transfer budget are flagged, which tells
+us which characters can stream and which need a dedicated bank.
+
+Tiles are compared flip-aware, so a mirrored frame that only changes
+attribute bits costs nothing to upload.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from arkista_sprite_extractor import (
+    TILE_SIZE,
+    CHR_TILE_BYTES,
+    ARKISTA_SPRITE_METADATA,
+    load_tile_array
+)
+from sprite_dedup import canonical_form
+from metasprite_generator import build_metasprites, group_animations, load_sprite_config
+
+# Default vblank transfer budget in bytes. NTSC vblank is ~2270 CPU cycles;
+# after OAM DMA (513 cycles) and other PPU updates, an unrolled $2007 copy
+# loop can move roughly 8 tiles.
+DEFAULT_VBLANK_BUDGET = 8 * CHR_TILE_BYTES
+
+def simulate_streaming(frames, slots=None, loop=True):
+    """Simulate streaming an animation's tiles through a window of CHR-RAM slots
+
+    frames is a list of frames, each a list of hashable tile keys. slots is the
+    size of the CHR-RAM window (default: the largest frame). Tiles already
+    resident are never re-uploaded; new tiles replace the least recently used
+    tiles that the current frame doesn't need.
+
+    Returns (initial_upload, uploads) where initial_upload lists the
+    (slot, tile) pairs needed to show the first frame from an empty window and
+    uploads[i] lists the (slot, tile) pairs to upload when switching to frame i
+    in steady state (frame 0 is the loop wrap, or empty for one-shot
+    animations).
+    """
+    frame_sets = [list(dict.fromkeys(frame)) for frame in frames]
+    largest = max((len(frame) for frame in frame_sets), default=0)
+    if slots is None:
+        slots = largest
+    if slots < largest:
+        raise ValueError(f"{slots} slots can't hold a frame of {largest} tiles")
+
+    resident = [None] * slots
+    last_used = [-1] * slots
+    clock = [0]
+
+    def show(frame):
+        needed = set(frame)
+        uploads = []
+        for tile in frame:
+            if tile in resident:
+                continue
+            # Reuse the least recently used slot the current frame doesn't need
+            free = [s for s in range(slots) if resident[s] not in needed]
+            slot = min(free, key=lambda s: last_used[s])
+            resident[slot] = tile
+            uploads.append((slot, tile))
+        for slot, tile in enumerate(resident):
+            if tile in needed:
+                last_used[slot] = clock[0]
+        clock[0] += 1
+        return uploads
+
+    if not frame_sets:
+        return [], []
+
+    initial_upload = show(frame_sets[0])
+
+    # Run the remaining frames, then measure one full steady-state pass
+    for frame in frame_sets[1:]:
+        show(frame)
+
+    uploads = []
+    for index, frame in enumerate(frame_sets):
+        if index == 0 and not loop:
+            uploads.append([])
+            continue
+        uploads.append(show(frame))
+
+    return initial_upload, uploads
+
+def analyze_animation(frames, budget=DEFAULT_VBLANK_BUDGET, slots=None, loop=True):
+    """Summarize the CHR-RAM streaming cost of one animation"""
+    initial_upload, uploads = simulate_streaming(frames, slots, loop)
+    frame_bytes = [len(upload) * CHR_TILE_BYTES for upload in uploads]
+    unique_tiles = len({tile for frame in frames for tile in frame})
+
+    worst = max(frame_bytes, default=0)
+    return {
+        "frames": len(frames),
+        "unique_tiles": unique_tiles,
+        "slots": slots if slots is not None else max((len(set(f)) for f in frames), default=0),
+        "initial_bytes": len(initial_upload) * CHR_TILE_BYTES,
+        "frame_uploads": [[slot for slot, _ in upload] for upload in uploads],
+        "frame_bytes": frame_bytes,
+        "max_frame_bytes": worst,
+        "resident_bytes": unique_tiles * CHR_TILE_BYTES,
+        "streamable": worst <= budget
+    }
+
+def frames_from_chr(chr_path, metadata):
+    """Build {animation: [frame tile keys]} from a CHR bank and sprite metadata"""
+    tiles, _ = load_tile_array(chr_path)
+    if tiles is None:
+        return {}
+
+    # Metasprite tile numbers are already flip-deduplicated across all frames
+    _, metasprites = build_metasprites(tiles, metadata)
+
+    animations = {}
+    for anim_name, sprite_names in group_animations(metadata).items():
+        animations[anim_name] = [
+            [tile for _, tile, _, _ in metasprites[sprite_name]] for sprite_name in sprite_names
+        ]
+    return animations
+
+def image_tile_keys(image_path):
+    """Return the flip-canonical keys of every non-blank 8x8 tile in a sprite image"""
+    with Image.open(image_path) as img:
+        rgba = np.ascontiguousarray(np.asarray(img.convert('RGBA')))
+
+    height, width = rgba.shape[0] - rgba.shape[0] % TILE_SIZE, rgba.shape[1] - rgba.shape[1] % TILE_SIZE
+    pixels = rgba[:height, :width].view(np.uint32)[..., 0]
+    opaque = rgba[:height, :width, 3] != 0
+    colored = np.any(rgba[:height, :width, :3] != 0, axis=2)
+
+    keys = []
+    for y in range(0, height, TILE_SIZE):
+        for x in range(0, width, TILE_SIZE):
+            # Fully transparent or background-colored tiles take no sprite slot
+            if not np.any(opaque[y:y + TILE_SIZE, x:x + TILE_SIZE] & colored[y:y + TILE_SIZE, x:x + TILE_SIZE]):
+                continue
+            keys.append(canonical_form(pixels[y:y + TILE_SIZE, x:x + TILE_SIZE])[0])
+    return keys
+
+def frames_from_asset(metadata_path):
+    """Build {animation: ([frame tile keys], loop)} from an asset wizard metadata.json"""
+    with open(metadata_path, 'r') as f:
+        asset_data = json.load(f)
+
+    sprite_paths = {s.get("id"): s.get("file_path", "") for s in asset_data.get("sprites", [])}
+    tile_cache = {}
+
+    animations = {}
+    for anim in asset_data.get("animations", []):
+        frames = []
+        for frame_ref in anim.get("frames", []):
+            # Frames are stored either as sprite ids or {"sprite_id": ...} references
+            sprite_id = frame_ref.get("sprite_id") if isinstance(frame_ref, dict) else frame_ref
+            sprite_path = sprite_paths.get(sprite_id, "")
+            if not sprite_path or not os.path.exists(sprite_path):
+                print(f"Warning: Missing sprite {sprite_id} in animation {anim.get('name', '')}")
+                continue
+            if sprite_path not in tile_cache:
+                tile_cache[sprite_path] = image_tile_keys(sprite_path)
+            frames.append(tile_cache[sprite_path])
+
+        if frames:
+            animations[anim.get("name", anim.get("id", ""))] = (frames, anim.get("loop", True))
+
+    return animations
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze animation frame deltas for CHR-RAM streaming')
+    parser.add_argument('input', help='CHR bank (PNG, .chr or .bin) or asset wizard metadata.json')
+    parser.add_argument('--config', '-c',
+                        help='sprite_config.json from arkista_sprite_extractor (default: built-in metadata)')
+    parser.add_argument('--budget', '-b', type=int, default=DEFAULT_VBLANK_BUDGET,
+                        help=f'Vblank CHR transfer budget in bytes per frame (default: {DEFAULT_VBLANK_BUDGET})')
+    parser.add_argument('--slots', '-s', type=int,
+                        help='CHR-RAM tile slots per animation (default: tiles in the largest frame)')
+    parser.add_argument('--no-loop', action='store_true',
+                        help='Treat CHR bank animations as one-shot (no last-to-first transition)')
+    parser.add_argument('--report', '-r', help='Save the full analysis as JSON to this path')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input):
+        print(f"Error: Input file {args.input} does not exist")
+        return False
+
+    # Gather animation frames from either source
+    if args.input.lower().endswith('.json'):
+        animations = frames_from_asset(args.input)
+    else:
+        if args.config:
+            metadata = load_sprite_config(args.config)
+        else:
+            metadata = ARKISTA_SPRITE_METADATA
+        animations = {
+            name: (frames, not args.no_loop)
+            for name, frames in frames_from_chr(args.input, metadata).items()
+        }
+
+    if not animations:
+        print("No animations found")
+        return False
+
+    results = {}
+    print(f"{'Animation':<28} {'Frames':>6} {'Tiles':>5} {'Max/frame':>10} {'Resident':>9}  Verdict")
+    for anim_name, (frames, loop) in animations.items():
+        try:
+            result = analyze_animation(frames, args.budget, args.slots, loop)
+        except ValueError as e:
+            print(f"{anim_name:<28} skipped: {e}")
+            continue
+        results[anim_name] = result
+
+        verdict = "stream" if result["streamable"] else "DEDICATED BANK (over budget)"
+        print(f"{anim_name:<28} {result['frames']:>6} {result['unique_tiles']:>5} "
+              f"{result['max_frame_bytes']:>9}B {result['resident_bytes']:>8}B  {verdict}")
+
+    over_budget = [name for name, result in results.items() if not result["streamable"]]
+    print(f"\n{len(results) - len(over_budget)} of {len(results)} animations fit a "
+          f"{args.budget}-byte vblank budget")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({"budget": args.budget, "animations": results}, f, indent=2)
+        print(f"Saved report to {args.report}")
+
+    return True
+
+if __name__ == '__main__':
+    main()
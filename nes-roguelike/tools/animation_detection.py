@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Animation Sequence Detection
+----------------------------
+Finds animation sequences across a whole sprite library in one pass.
+
+Every sprite name is parsed once into a (prefix, direction, frame) tuple,
+for example "goblin_walk_left_2.png" becomes ("goblin_walk", "left", 2).
+The tuples are sorted, and each run of consecutive frame numbers that share
+a prefix and direction becomes a sequence. Sorting dominates, so a library
+of n sprites costs O(n log n).
+
+Numbered sprite sheet dumps ("Enemies_338.png", "Enemies_339.png", ...)
+share one prefix for the whole sheet. For those, an optional pixel check
+splits a run wherever two consecutive frames differ too much to belong to
+the same animation.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import re
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from sprite_similarity import index_image
+
+# Direction words recognized in sprite names
+DIRECTION_NAMES = ("down", "up", "left", "right")
+
+# Animation type words recognized in sprite names
+ANIMATION_TYPE_NAMES = ("idle", "walk", "run", "attack", "death", "hurt", "jump", "fall", "cast", "special")
+
+# Default share of pixels that may change between consecutive frames
+DEFAULT_MAX_PIXEL_DELTA = 0.5
+
+def parse_sprite_name(sprite_path):
+    """Split a sprite path into (prefix, direction, frame)
+
+    The frame is the trailing number of the file name, or None if there is
+    none. The direction is the last direction word before it ("" if none),
+    and the prefix is everything else, including the directory, so sprites
+    in different folders never end up in the same sequence.
+    """
+    directory, filename = os.path.split(os.path.splitext(sprite_path)[0])
+    tokens = [token for token in re.split(r"[\s_\-]+", filename.lower()) if token]
+
+    frame = None
+    if tokens and tokens[-1].isdigit():
+        frame = int(tokens.pop())
+    elif tokens:
+        # Handle names like "walk2" where the number isn't separated
+        match = re.match(r"^(.*?)(\d+)$", tokens[-1])
+        if match and match.group(1):
+            tokens[-1] = match.group(1)
+            frame = int(match.group(2))
+
+    direction = ""
+    for position in range(len(tokens) - 1, -1, -1):
+        if tokens[position] in DIRECTION_NAMES:
+            direction = tokens.pop(position)
+            break
+
+    prefix = "_".join(tokens)
+    if directory:
+        prefix = f"{directory.replace(os.sep, '/')}/{prefix}"
+    return prefix, direction, frame
+
+def guess_animation_type(prefix):
+    """Return the animation type named in a prefix, or "" if there is none"""
+    words = re.split(r"[/_]", prefix)
+    for word in reversed(words):
+        if word in ANIMATION_TYPE_NAMES:
+            return word
+    return ""
+
+def pixel_delta(index_a, index_b):
+    """Return the share of pixels that differ between two index images (1.0 if sizes differ)"""
+    if index_a.shape != index_b.shape:
+        return 1.0
+    return float(np.count_nonzero(index_a != index_b)) / index_a.size
+
+def make_pixel_check(image_paths, max_delta=DEFAULT_MAX_PIXEL_DELTA):
+    """Build a frame check that compares sprites' pixels
+
+    image_paths maps sprite names to image files. The returned function takes
+    two sprite names and is True when they differ by at most max_delta. Each
+    image is decoded at most once.
+    """
+    cache = {}
+
+    def load(name):
+        if name not in cache:
+            try:
+                with Image.open(image_paths[name]) as img:
+                    cache[name] = index_image(img)
+            except Exception as e:
+                print(f"Warning: Could not load sprite {image_paths[name]}: {e}")
+                cache[name] = None
+        return cache[name]
+
+    def check(previous, current):
+        index_a, index_b = load(previous), load(current)
+        if index_a is None or index_b is None:
+            return False
+        return pixel_delta(index_a, index_b) <= max_delta
+
+    return check
+
+def detect_sequences(sprite_names, frame_check=None, min_frames=2):
+    """Group sprite names into animation sequences
+
+    Sprites are grouped by (prefix, direction) and ordered by frame number.
+    A sequence ends at a gap in the frame numbers, or where frame_check
+    (if given) rejects two consecutive frames. Returns a list of dicts with
+    "name", "prefix", "direction", "type", "frame_numbers" and "frames" (the
+    sprite names in order), keeping only sequences of at least min_frames.
+    """
+    parsed = []
+    for name in sprite_names:
+        prefix, direction, frame = parse_sprite_name(name)
+        if frame is not None:
+            parsed.append((prefix, direction, frame, name))
+    parsed.sort()
+
+    sequences = []
+    current = []
+
+    def close_run():
+        if len(current) >= min_frames:
+            prefix, direction = current[0][0], current[0][1]
+            sequences.append({
+                "name": f"{prefix}_{direction}" if direction else prefix,
+                "prefix": prefix,
+                "direction": direction,
+                "type": guess_animation_type(prefix),
+                "frame_numbers": [entry[2] for entry in current],
+                "frames": [entry[3] for entry in current]
+            })
+
+    for entry in parsed:
+        if current:
+            previous = current[-1]
+            same_group = entry[:2] == previous[:2]
+            consecutive = same_group and entry[2] - previous[2] <= 1
+            if not consecutive or (frame_check and not frame_check(previous[3], entry[3])):
+                close_run()
+                current = []
+        current.append(entry)
+    if current:
+        close_run()
+
+    # Name split runs after their first frame so every name is unique
+    label_counts = {}
+    for sequence in sequences:
+        label_counts[sequence["name"]] = label_counts.get(sequence["name"], 0) + 1
+    for sequence in sequences:
+        if label_counts[sequence["name"]] > 1:
+            sequence["name"] = f"{sequence['name']}_{sequence['frame_numbers'][0]}"
+
+    return sequences
+
+def collect_sprite_paths(directory):
+    """Collect {relative path: full path} for every PNG under a directory"""
+    sprite_paths = {}
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.lower().endswith('.png'):
+                full_path = os.path.join(root, file)
+                sprite_paths[os.path.relpath(full_path, directory)] = full_path
+    return sprite_paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect animation sequences across a sprite directory')
+    parser.add_argument('directory', help='Directory of sprite PNGs')
+    parser.add_argument('--pixel-check', action='store_true',
+                        help='Split sequences where consecutive frames differ too much')
+    parser.add_argument('--max-delta', type=float, default=DEFAULT_MAX_PIXEL_DELTA,
+                        help=f'Share of pixels allowed to change between frames (default: {DEFAULT_MAX_PIXEL_DELTA})')
+    parser.add_argument('--min-frames', type=int, default=2, help='Minimum frames per sequence')
+    parser.add_argument('--output', '-o', help='Save the detected sequences as JSON to this path')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return False
+
+    sprite_paths = collect_sprite_paths(args.directory)
+    frame_check = make_pixel_check(sprite_paths, args.max_delta) if args.pixel_check else None
+    sequences = detect_sequences(sprite_paths, frame_check, args.min_frames)
+
+    for sequence in sequences:
+        print(f"{sequence['name']:<48} {len(sequence['frames']):>3} frames  {sequence['type']}")
+    print(f"\nDetected {len(sequences)} sequences in {len(sprite_paths)} sprites")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(sequences, f, indent=2)
+        print(f"Saved sequences to {args.output}")
+
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ configuration data for a NES roguelike game.
 Requirements:
 - Python 3.6+
 - Pillow (PIL) library
+- NumPy
 - (Optional) pyrominfo for ROM analysis
 """
 
@@ -16,11 +17,19 @@ import os
 import sys
 import argparse
 import json
+import numpy as np
 from PIL import Image, ImageDraw
 
 # Constants for NES sprite properties
 TILE_SIZE = 8  # Standard NES tile size is 8x8 pixels
 SPRITE_SIZE = 16  # Most character sprites are 16x16 (2x2 tiles)
+CHR_TILE_BYTES = 16  # Each 2bpp tile is 8 bytes low plane + 8 bytes high plane
+
+# Palette index used for pixels of tiles that don't exist (rendered transparent)
+MISSING_TILE_INDEX = 255
+
+# Grayscale palette used for raw CHR data (same levels as extract_chr_data.py)
+DEFAULT_CHR_PALETTE = [(0, 0, 0), (85, 85, 85), (170, 170, 170), (255, 255, 255)]
 
 # Character definitions for Arkista's Ring
 # This organizes all sprites by character, with explicit tile indices for each direction/animation
@@ -137,6 +146,13 @@ ARKISTA_CHARACTERS = {
 # Sprite arrangement pattern for Arkista's Ring (swapped top-right and bottom-left quadrants)
 ARKISTA_ARRANGEMENT = [0, 2, 1, 3]
 
+# Layouts tried by automatic pattern discovery: (width, height) in tiles -> arrangement
+# 2x4 sprites are two stacked 2x2 blocks, each using the Arkista quadrant order
+PATTERN_LAYOUTS = {
+    (2, 2): ARKISTA_ARRANGEMENT,
+    (2, 4): [0, 2, 1, 3, 4, 6, 5, 7]
+}
+
 # Function to convert the character definitions into the format needed by the sprite extraction code
 def generate_sprite_metadata():
     metadata = {}
@@ -174,26 +190,25 @@ class ArkistaSprite:
         self.category = category
         self.width_px = size[0] * TILE_SIZE
         self.height_px = size[1] * TILE_SIZE
+        self.pixels = None  # Composed (H, W) array of palette indices
         self.image = None  # Will hold the composed sprite image
     
-    def compose_from_tiles(self, tiles):
-        """Create a complete sprite image from individual tiles"""
-        self.image = Image.new('RGBA', (self.width_px, self.height_px), (0, 0, 0, 0))
-        
-        for i, rel_idx in enumerate(self.arrangement):
-            # Calculate position in the composed image
-            x = (i % self.width_tiles) * TILE_SIZE
-            y = (i // self.width_tiles) * TILE_SIZE
-            
-            # Get the actual tile index
-            tile_idx = self.base_tile + rel_idx
-            
-            # Ensure the tile exists
-            if tile_idx < len(tiles):
-                self.image.paste(tiles[tile_idx], (x, y))
-            else:
-                print(f"Warning: Tile index {tile_idx} not found for sprite {self.name}")
-        
+    def compose_from_tiles(self, tiles, palette=None):
+        """Create a complete sprite image from an (N, 8, 8) tile array"""
+        metadata = {
+            self.name: {
+                "base_tile": self.base_tile,
+                "size": (self.width_tiles, self.height_tiles),
+                "arrangement": self.arrangement
+            }
+        }
+        pixels = compose_sprite_arrays(tiles, metadata)[self.name]
+        return self.set_pixels(pixels, palette)
+    
+    def set_pixels(self, pixels, palette=None):
+        """Use an already composed (H, W) index array as this sprite's image"""
+        self.pixels = pixels
+        self.image = render_index_array(pixels, palette)
         return self.image
     
     def save(self, output_dir):
@@ -218,67 +233,175 @@ def extract_chr_from_rom(rom_path, output_dir, bank_index=0):
     print("to extract the CHR banks and provide them as PNG files.")
     return False
 
-def extract_tiles_from_chr(chr_path, output_dir, palette=None):
-    """Extract individual 8x8 tiles from a CHR bank image"""
+def decode_chr_data(chr_data):
+    """Decode raw 2bpp CHR bytes into an (N, 8, 8) array of palette indices"""
+    data = np.frombuffer(bytes(chr_data), dtype=np.uint8)
+    count = len(data) // CHR_TILE_BYTES
+    
+    # (N, plane, row, 1) -> unpack the bits of every row byte into 8 pixels
+    planes = data[:count * CHR_TILE_BYTES].reshape(count, 2, TILE_SIZE, 1)
+    bits = np.unpackbits(planes, axis=3)
+    
+    return bits[:, 0] | (bits[:, 1] << 1)
+
+def encode_chr_data(tiles):
+    """Encode an (N, 8, 8) array of palette indices (0-3) as raw 2bpp CHR bytes"""
+    tiles = np.asarray(tiles, dtype=np.uint8)
+    low = np.packbits(tiles & 1, axis=2)
+    high = np.packbits((tiles >> 1) & 1, axis=2)
+    
+    # Low plane rows first, then high plane rows, for every tile
+    return np.concatenate([low, high], axis=1).tobytes()
+
+def image_to_tile_array(image):
+    """Split an image into an (N, 8, 8) array of palette indices
+    
+    Every color is mapped to the nearest DEFAULT_CHR_PALETTE gray level by
+    luminance, so a color gets the same CHR index in every bank no matter how
+    many of the four levels the bank uses. Fully transparent pixels are index
+    0, whatever color is stored under them. Returns the tile array and the RGB
+    palette the indices refer to: one of the image's colors for each index it
+    uses, and the default gray for the rest.
+    """
+    rgba = np.asarray(image.convert('RGBA'))
+    height, width = rgba.shape[0], rgba.shape[1]
+    tiles_y, tiles_x = height // TILE_SIZE, width // TILE_SIZE
+    rgba = rgba[:tiles_y * TILE_SIZE, :tiles_x * TILE_SIZE]
+    
+    # Transparent pixels are counted as black so they can't add colors
+    rgb = np.where(rgba[..., 3:] == 0, 0, rgba[..., :3])
+    colors, inverse = np.unique(rgb.reshape(-1, 3), axis=0, return_inverse=True)
+    
+    # Nearest gray level by luminance, scaled to 0-255 like the levels themselves
+    weights = np.array([299, 587, 114])
+    luminance = colors.astype(np.int32) @ weights / 1000
+    levels = np.array(DEFAULT_CHR_PALETTE, dtype=np.int32) @ weights / 1000
+    color_index = np.abs(luminance[:, None] - levels[None, :]).argmin(axis=1).astype(np.uint8)
+    
+    indices = color_index[inverse.reshape(-1)].reshape(tiles_y * TILE_SIZE, tiles_x * TILE_SIZE)
+    indices[rgba[..., 3] == 0] = 0
+    tiles = indices.reshape(tiles_y, TILE_SIZE, tiles_x, TILE_SIZE).swapaxes(1, 2)
+    
+    palette = list(DEFAULT_CHR_PALETTE)
+    for color, index in zip(colors[::-1], color_index[::-1]):
+        palette[index] = tuple(int(c) for c in color)
+    
+    return tiles.reshape(-1, TILE_SIZE, TILE_SIZE), palette
+
+def load_tile_array(chr_path):
+    """Load a CHR bank (PNG image or raw .chr/.bin data) as an (N, 8, 8) index array
+    
+    Returns a (tiles, palette) tuple, or (None, None) if the file can't be read.
+    """
     try:
-        source_img = Image.open(chr_path)
+        if os.path.splitext(chr_path)[1].lower() in ('.chr', '.bin'):
+            with open(chr_path, 'rb') as f:
+                return decode_chr_data(f.read()), list(DEFAULT_CHR_PALETTE)
+        
+        with Image.open(chr_path) as source_img:
+            return image_to_tile_array(source_img)
     except Exception as e:
-        print(f"Error opening CHR image {chr_path}: {e}")
-        return []
-    
-    # Get image dimensions
-    width, height = source_img.size
-    
-    # Calculate number of tiles in each dimension
-    tiles_x = width // TILE_SIZE
-    tiles_y = height // TILE_SIZE
-    
-    tiles = []
-    
-    # Extract each tile
-    for y in range(tiles_y):
-        for x in range(tiles_x):
-            # Calculate tile position
-            left = x * TILE_SIZE
-            upper = y * TILE_SIZE
-            right = left + TILE_SIZE
-            lower = upper + TILE_SIZE
-            
-            # Crop the tile
-            tile = source_img.crop((left, upper, right, lower))
-            
-            # If we have color information, apply it
-            if palette:
-                # This would require more complex color processing
-                pass
-            
-            # Save the individual tile
-            tile_idx = y * tiles_x + x
-            tile_filename = f"tile_{tile_idx:03d}.png"
-            tile_path = os.path.join(output_dir, "tiles", tile_filename)
-            
-            # Create directory if needed
-            os.makedirs(os.path.join(output_dir, "tiles"), exist_ok=True)
-            
-            # Save the tile
-            tile.save(tile_path)
-            
-            # Add to the tiles list
-            tiles.append(tile)
+        print(f"Error loading CHR data {chr_path}: {e}")
+        return None, None
+
+def render_index_array(pixels, palette=None):
+    """Render an (H, W) palette index array as an RGBA image
+    
+    Pixels set to MISSING_TILE_INDEX (tiles that weren't found) stay transparent.
+    """
+    if palette is None:
+        palette = DEFAULT_CHR_PALETTE
+    
+    lut = np.zeros((max(MISSING_TILE_INDEX, len(palette)) + 1, 4), dtype=np.uint8)
+    lut[:len(palette), :3] = palette
+    lut[:len(palette), 3] = 255
+    lut[MISSING_TILE_INDEX] = (0, 0, 0, 0)
+    
+    return Image.fromarray(lut[pixels], 'RGBA')
+
+def save_tile_images(tiles, output_dir, palette=None):
+    """Write every tile of an (N, 8, 8) array to tiles/tile_NNN.png"""
+    tiles_dir = os.path.join(output_dir, "tiles")
+    os.makedirs(tiles_dir, exist_ok=True)
+    
+    for tile_idx, tile in enumerate(tiles):
+        tile_path = os.path.join(tiles_dir, f"tile_{tile_idx:03d}.png")
+        render_index_array(tile, palette).save(tile_path)
+    
+    print(f"Saved {len(tiles)} tile images to {tiles_dir}")
+
+def extract_tiles_from_chr(chr_path, output_dir, palette=None, save_tiles=False):
+    """Decode a CHR bank into an (N, 8, 8) tile array
+    
+    Individual tile PNGs are only written to tiles/ when save_tiles is set.
+    Returns (tiles, palette); palette overrides the colors found in the file.
+    """
+    tiles, chr_palette = load_tile_array(chr_path)
+    if tiles is None:
+        return None, None
+    
+    if palette is None:
+        palette = chr_palette
+    
+    if save_tiles:
+        save_tile_images(tiles, output_dir, palette)
     
     print(f"Extracted {len(tiles)} tiles from {chr_path}")
-    return tiles
+    return tiles, palette
 
-def compose_sprites(tiles, output_dir, metadata=None):
-    """Create complete sprites from individual tiles using metadata"""
+def compose_sprite_arrays(tiles, metadata=None):
+    """Compose sprites directly from an (N, 8, 8) tile array
+    
+    Sprites sharing a size and arrangement are built with a single batched
+    gather: one (S, tiles_per_sprite) index array pulls every tile at once and
+    a reshape lays them out. Returns {sprite_name: (H, W) index array}.
+    """
+    if metadata is None:
+        metadata = ARKISTA_SPRITE_METADATA
+    
+    tiles = np.asarray(tiles)
+    
+    # Extra blank tile at the end stands in for any index that doesn't exist
+    missing_tile = np.full((1, TILE_SIZE, TILE_SIZE), MISSING_TILE_INDEX, dtype=tiles.dtype)
+    padded = np.concatenate([tiles, missing_tile])
+    
+    # Group sprites that can share one gather
+    groups = {}
+    for sprite_name, sprite_info in metadata.items():
+        key = (tuple(sprite_info['size']), tuple(sprite_info['arrangement']))
+        groups.setdefault(key, []).append(sprite_name)
+    
+    composed = {}
+    for ((width, height), arrangement), names in groups.items():
+        bases = np.array([metadata[name]['base_tile'] for name in names])
+        indices = bases[:, None] + np.array(arrangement)[None, :]
+        
+        # Report and blank out tiles that fall outside the bank
+        missing = (indices < 0) | (indices >= len(tiles))
+        for row, col in zip(*np.nonzero(missing)):
+            print(f"Warning: Tile index {indices[row, col]} not found for sprite {names[row]}")
+        indices[missing] = len(tiles)
+        
+        # (S, h*w, 8, 8) -> (S, h, 8, w, 8) -> (S, h*8, w*8)
+        blocks = padded[indices].reshape(len(names), height, width, TILE_SIZE, TILE_SIZE)
+        blocks = blocks.swapaxes(2, 3).reshape(len(names), height * TILE_SIZE, width * TILE_SIZE)
+        composed.update(zip(names, blocks))
+    
+    return composed
+
+def compose_sprites(tiles, output_dir, metadata=None, palette=None):
+    """Create complete sprites from an (N, 8, 8) tile array using metadata"""
     if metadata is None:
         metadata = ARKISTA_SPRITE_METADATA
     
     sprites = []
     sprite_data = {}  # For the config file
     
+    # Compose every sprite in one batched pass over the tile array
+    composed = compose_sprite_arrays(tiles, metadata)
+    
     for sprite_name, sprite_info in metadata.items():
-        # Create and compose the sprite
+        # Create the sprite from its composed pixels
         sprite = ArkistaSprite(
             sprite_name,
             sprite_info['base_tile'],
@@ -287,7 +410,7 @@ def compose_sprites(tiles, output_dir, metadata=None):
             sprite_info['category']
         )
         
-        sprite.compose_from_tiles(tiles)
+        sprite.set_pixels(composed[sprite_name], palette)
         sprite_path = sprite.save(output_dir)
         
         if sprite_path:
@@ -347,15 +470,121 @@ def create_sprite_sheet(sprites, output_dir, sheet_name="sprite_sheet"):
     
     return sheet_path
 
-def analyze_chr_patterns(chr_path, output_dir):
-    """Analyze CHR bank to attempt to automatically identify sprite patterns"""
+def edge_continuity_matrices(tiles):
+    """Score how well every tile's edges continue into every other tile's edges
+    
+    Returns (horizontal, vertical) (N, N) matrices where horizontal[i, j] is the
+    fraction of matching pixels between the right column of tile i and the
+    left column of tile j, and vertical[i, j] does the same for the bottom row
+    of i against the top row of j. Only pixels that are non-transparent on at
+    least one side count; seams that are empty on both sides score NaN.
+    """
+    tiles = np.asarray(tiles)
+    
+    def seam_scores(first_edges, second_edges):
+        a = first_edges[:, None, :]
+        b = second_edges[None, :, :]
+        solid = (a != 0) | (b != 0)
+        matches = ((a == b) & solid).sum(axis=2)
+        counted = solid.sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counted > 0, matches / counted, np.nan)
+    
+    horizontal = seam_scores(tiles[:, :, -1], tiles[:, :, 0])
+    vertical = seam_scores(tiles[:, -1, :], tiles[:, 0, :])
+    return horizontal, vertical
+
+def score_sprite_layouts(tiles, horizontal, vertical, size, arrangement):
+    """Score every possible base tile for one sprite layout
+    
+    Returns a (N - tiles_per_sprite + 1,) array with the mean seam continuity
+    of the sprite starting at each base tile (NaN where no seam has content).
+    """
+    width, height = size
+    count = len(arrangement)
+    if len(tiles) < count:
+        return np.zeros(0)
+    
+    bases = np.arange(len(tiles) - count + 1)
+    indices = bases[:, None] + np.array(arrangement)[None, :]
+    
+    # Collect every internal seam of the layout
+    seams = []
+    for position in range(count):
+        x, y = position % width, position // width
+        if x + 1 < width:
+            seams.append(horizontal[indices[:, position], indices[:, position + 1]])
+        if y + 1 < height:
+            seams.append(vertical[indices[:, position], indices[:, position + width]])
+    
+    seams = np.stack(seams, axis=1)
+    solid_seams = ~np.isnan(seams)
+    totals = np.where(solid_seams, seams, 0).sum(axis=1)
+    counts = solid_seams.sum(axis=1)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = np.where(counts > 0, totals / counts, np.nan)
+    
+    # Mostly blank candidates aren't sprites, however well their seams line up
+    blank = ~np.any(np.asarray(tiles).reshape(len(tiles), -1) != 0, axis=1)
+    mostly_blank = blank[indices].sum(axis=1) * 2 > count
+    scores[mostly_blank] = np.nan
+    
+    return scores
+
+def analyze_chr_patterns(chr_path, output_dir, min_confidence=0.6):
+    """Analyze CHR bank to attempt to automatically identify sprite patterns
+    
+    Scores the edge continuity between every pair of tiles in one (N x N)
+    matrix operation, then proposes non-overlapping 2x2 and 2x4 sprite
+    groupings (using the Arkista quadrant arrangement) whose seams match best.
+    Returns sprite metadata in the same format as ARKISTA_SPRITE_METADATA,
+    with an extra "confidence" value per sprite.
+    """
     print("Analyzing CHR patterns...")
-    print("This is an advanced feature that requires visual pattern recognition.")
-    print("For now, use the manual sprite configuration in the metadata dictionary.")
     
-    # Future enhancement: Use computer vision or pattern matching to identify
-    # which tiles likely form complete sprites based on visual similarity
-    return {}
+    tiles, _ = load_tile_array(chr_path)
+    if tiles is None or not len(tiles):
+        return {}
+    
+    horizontal, vertical = edge_continuity_matrices(tiles)
+    
+    # Score every candidate position for every layout
+    candidates = []
+    for size, arrangement in PATTERN_LAYOUTS.items():
+        scores = score_sprite_layouts(tiles, horizontal, vertical, size, arrangement)
+        for base_tile in np.nonzero(scores >= min_confidence)[0]:
+            candidates.append((float(scores[base_tile]), size[0] * size[1], int(base_tile), size, arrangement))
+    
+    # Greedily keep the most confident groupings, larger ones first on ties
+    candidates.sort(key=lambda c: (-c[0], -c[1], c[2]))
+    used_tiles = set()
+    detected = {}
+    for confidence, tile_count, base_tile, size, arrangement in candidates:
+        sprite_tiles = {base_tile + rel_idx for rel_idx in arrangement}
+        if sprite_tiles & used_tiles:
+            continue
+        used_tiles |= sprite_tiles
+        
+        sprite_name = f"auto_{base_tile:03X}_{size[0]}x{size[1]}"
+        detected[sprite_name] = {
+            "base_tile": base_tile,
+            "size": size,
+            "arrangement": arrangement,
+            "category": "auto",
+            "name": f"Detected sprite at ${base_tile:02X}",
+            "confidence": round(confidence, 3)
+        }
+    
+    # Keep the detected groupings in tile order and save them for review
+    detected = dict(sorted(detected.items(), key=lambda item: item[1]["base_tile"]))
+    patterns_path = os.path.join(output_dir, "detected_patterns.json")
+    with open(patterns_path, 'w') as f:
+        json.dump(detected, f, indent=2)
+    
+    print(f"Detected {len(detected)} likely sprites (confidence >= {min_confidence})")
+    print(f"Saved detected patterns to {patterns_path}")
+    return detected
 
 def create_test_rom(sprites_dir, output_dir):
     """Create a simple NES test ROM that displays the extracted sprites"""
@@ -374,6 +603,10 @@ def main():
                         help='Input is a ROM file (not implemented yet)')
     parser.add_argument('--test-rom', '-t', action='store_true',
                         help='Create a test ROM to visualize sprites (not implemented yet)')
+    parser.add_argument('--save-tiles', action='store_true',
+                        help='Also write every individual 8x8 tile to tiles/')
+    parser.add_argument('--min-confidence', type=float, default=0.6,
+                        help='Minimum edge continuity for --analyze to propose a sprite (0-1)')
     
     args = parser.parse_args()
     
@@ -393,23 +626,23 @@ def main():
         
         print(f"Processing CHR bank image: {args.input}")
         
-        # Extract individual tiles
-        tiles = extract_tiles_from_chr(args.input, args.output)
+        # Decode the tiles (tile PNGs are only written on request)
+        tiles, palette = extract_tiles_from_chr(args.input, args.output, save_tiles=args.save_tiles)
         
-        if not tiles:
+        if tiles is None or not len(tiles):
             print("Failed to extract tiles")
             return False
         
         # Analyze patterns if requested
-        sprite_metadata = ARKISTA_SPRITE_METADATA
+        sprite_metadata = dict(ARKISTA_SPRITE_METADATA)
         if args.analyze:
-            detected_metadata = analyze_chr_patterns(args.input, args.output)
+            detected_metadata = analyze_chr_patterns(args.input, args.output, args.min_confidence)
             if detected_metadata:
                 # Merge with known metadata
                 sprite_metadata.update(detected_metadata)
         
         # Compose sprites
-        sprites = compose_sprites(tiles, args.output, sprite_metadata)
+        sprites = compose_sprites(tiles, args.output, sprite_metadata, palette)
         
         # Create sprite sheet
         if sprites:
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Asset Manifest Store
+--------------------
+Keeps every asset wizard asset's metadata in one SQLite file (manifest.db in
+the wizard's base directory) instead of one pretty-printed metadata.json per
+asset directory, so listing the library is a single query rather than
+thousands of opens and parses.
+
+Assets are stored as compact JSON with their id, type, name and updated_at
+pulled out into columns, plus a small JSON summary (name, type, tags,
+sprite and animation counts) that listings read instead of the full record.
+Every write stamps the row with a new generation number, and deletes leave
+a tombstone row, so an in-memory index can catch up with "everything that
+changed since generation g" in one query.
+
+asset_wizard_core switches to this store automatically when manifest.db
+exists; asset directories are still used for sprite images and exports.
+Run this script on a base directory to migrate the per-directory layout.
+
+Requirements:
+- Python 3.6+
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import threading
+
+from metadata_writer import write_json_atomic
+
+# File name of the manifest inside an asset wizard base directory
+MANIFEST_FILENAME = "manifest.db"
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    name TEXT,
+    updated_at TEXT,
+    generation INTEGER NOT NULL,
+    data TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_assets_generation ON assets(generation);
+CREATE INDEX IF NOT EXISTS idx_assets_updated_at ON assets(updated_at);
+"""
+
+# Summary projection of the data column; the same keys as asset_wizard_core.asset_summary
+SUMMARY_SQL = """
+json_object(
+    'id', id,
+    'name', coalesce(json_extract(data, '$.name'), ''),
+    'type', coalesce(json_extract(data, '$.type'), ''),
+    'description', coalesce(json_extract(data, '$.description'), ''),
+    'tags', json(coalesce(json_extract(data, '$.tags'), '[]')),
+    'updated_at', coalesce(json_extract(data, '$.updated_at'), ''),
+    'sprite_count', coalesce(json_array_length(data, '$.sprites'), 0),
+    'animation_count', coalesce(json_array_length(data, '$.animations'), 0)
+)
+"""
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+MANIFEST_MIGRATIONS = [
+    # 1: summary column, so listings never have to read or parse the data column
+    f"""
+    ALTER TABLE assets ADD COLUMN summary TEXT;
+    UPDATE assets SET summary = {SUMMARY_SQL} WHERE data IS NOT NULL;
+    """
+]
+
+def manifest_path(base_dir):
+    """Return the path of the manifest for an asset wizard base directory"""
+    return os.path.join(base_dir, MANIFEST_FILENAME)
+
+class ManifestStore:
+    """Asset metadata dicts stored in one SQLite file"""
+
+    def __init__(self, path):
+        """Open (creating if needed) the manifest database at path"""
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(MANIFEST_SCHEMA)
+        self.conn.commit()
+        self.migrate()
+
+    def migrate(self):
+        """Apply any schema migrations the manifest hasn't had yet"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MANIFEST_MIGRATIONS[version:], version + 1):
+            self.conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+
+    def close(self):
+        """Close the manifest database"""
+        with self.lock:
+            self.conn.close()
+
+    def _next_generation(self):
+        return self.conn.execute("SELECT coalesce(max(generation), 0) + 1 FROM assets").fetchone()[0]
+
+    def save(self, asset_data):
+        """Insert or replace one asset"""
+        self.save_many([asset_data])
+
+    def save_many(self, assets):
+        """Insert or replace several assets in one transaction"""
+        with self.lock, self.conn:
+            generation = self._next_generation()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO assets (id, type, name, updated_at, generation, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(a["id"], a.get("type"), a.get("name"), a.get("updated_at"), generation,
+                  json.dumps(a, separators=(",", ":"))) for a in assets]
+            )
+            self.conn.execute(f"UPDATE assets SET summary = {SUMMARY_SQL} WHERE generation = ?", (generation,))
+
+    def load(self, asset_id):
+        """Return one asset's metadata, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM assets WHERE id = ? AND data IS NOT NULL", (asset_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, asset_id):
+        """Delete an asset, leaving a tombstone so indexes notice"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE assets SET data = NULL, summary = NULL, generation = ? WHERE id = ? AND data IS NOT NULL",
+                (self._next_generation(), asset_id)
+            )
+
+    def list(self):
+        """Return every asset, most recently updated first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM assets WHERE data IS NOT NULL ORDER BY updated_at DESC"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def changes_since(self, generation):
+        """Return (latest generation, [(id, metadata or None if deleted)]) for rows newer than generation"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, generation, data FROM assets WHERE generation > ? ORDER BY generation",
+                (generation,)
+            ).fetchall()
+        latest = rows[-1][1] if rows else generation
+        return latest, [(asset_id, json.loads(data) if data else None) for asset_id, _, data in rows]
+
+    def summaries(self):
+        """Return every asset's summary, most recently updated first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT summary FROM assets WHERE data IS NOT NULL ORDER BY updated_at DESC"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def summaries_since(self, generation):
+        """Like changes_since, but with (id, generation, summary or None) for each changed asset"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, generation, summary FROM assets WHERE generation > ? ORDER BY generation",
+                (generation,)
+            ).fetchall()
+        latest = rows[-1][1] if rows else generation
+        return latest, [(asset_id, row_generation, json.loads(summary) if summary else None)
+                        for asset_id, row_generation, summary in rows]
+
+    def generation(self):
+        """Return the generation of the most recent change"""
+        with self.lock:
+            return self.conn.execute("SELECT coalesce(max(generation), 0) FROM assets").fetchone()[0]
+
+    def count(self):
+        """Return the number of stored assets"""
+        with self.lock:
+            return self.conn.execute("SELECT count(*) FROM assets WHERE data IS NOT NULL").fetchone()[0]
+
+    def compact(self):
+        """Drop tombstones and reclaim free space"""
+        with self.lock:
+            with self.conn:
+                # Keep the newest row even if it's a tombstone so generations never repeat
+                self.conn.execute(
+                    "DELETE FROM assets WHERE data IS NULL "
+                    "AND generation < (SELECT max(generation) FROM assets)"
+                )
+            self.conn.execute("VACUUM")
+
+# Open stores by absolute manifest path
+_STORES = {}
+
+def open_manifest(base_dir, create=False):
+    """Return the shared ManifestStore for a base directory
+
+    Returns None when the directory has no manifest and create is False.
+    """
+    path = os.path.abspath(manifest_path(base_dir))
+    store = _STORES.get(path)
+    if store is None:
+        if not create and not os.path.exists(path):
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store = ManifestStore(path)
+        _STORES[path] = store
+    return store
+
+def read_directory_layout(base_dir):
+    """Yield (asset_id, metadata or None if unreadable) for every per-directory asset"""
+    assets_dir = os.path.join(base_dir, "assets")
+    if not os.path.isdir(assets_dir):
+        return
+    for asset_id in sorted(os.listdir(assets_dir)):
+        metadata_file = os.path.join(assets_dir, asset_id, "metadata.json")
+        if not os.path.isfile(metadata_file):
+            continue
+        try:
+            with open(metadata_file, 'r') as f:
+                yield asset_id, json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading metadata for asset {asset_id}: {e}")
+            yield asset_id, None
+
+def migrate_to_manifest(base_dir, remove_json=False):
+    """Copy every metadata.json under base_dir/assets into the manifest
+
+    Returns (migrated, failed) counts. With remove_json, metadata files are
+    deleted once the manifest has been committed.
+    """
+    migrated = []
+    directories = []
+    failed = 0
+    for asset_id, asset_data in read_directory_layout(base_dir):
+        if asset_data is None:
+            failed += 1
+            continue
+        asset_data.setdefault("id", asset_id)
+        migrated.append(asset_data)
+        directories.append(asset_id)
+
+    store = open_manifest(base_dir, create=True)
+    store.save_many(migrated)
+
+    if remove_json:
+        for asset_id in directories:
+            os.remove(os.path.join(base_dir, "assets", asset_id, "metadata.json"))
+
+    return len(migrated), failed
+
+def export_manifest(base_dir):
+    """Write every manifest asset back out as base_dir/assets/<id>/metadata.json
+
+    Each file is replaced atomically, so a crash never leaves one truncated.
+    Returns the number of assets written. The manifest itself is left in place.
+    """
+    store = open_manifest(base_dir)
+    if store is None:
+        print(f"Error: No manifest in {base_dir}")
+        return 0
+
+    assets = store.list()
+    for asset_data in assets:
+        asset_dir = os.path.join(base_dir, "assets", asset_data["id"])
+        os.makedirs(asset_dir, exist_ok=True)
+        write_json_atomic(os.path.join(asset_dir, "metadata.json"), asset_data)
+    return len(assets)
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate asset wizard metadata to or from a single manifest database')
+    parser.add_argument('base_dir', help='Asset wizard base directory (the one containing assets/)')
+    parser.add_argument('--remove-json', action='store_true',
+                        help='Delete the per-asset metadata.json files after migrating')
+    parser.add_argument('--export', action='store_true',
+                        help='Write the manifest back out as per-asset metadata.json files')
+    parser.add_argument('--compact', action='store_true', help='Drop deleted-asset tombstones and vacuum')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.base_dir):
+        print(f"Error: Directory {args.base_dir} does not exist")
+        return False
+
+    if args.export:
+        written = export_manifest(args.base_dir)
+        print(f"Wrote {written} metadata files")
+        return written > 0
+
+    if args.compact:
+        store = open_manifest(args.base_dir)
+        if store is None:
+            print(f"Error: No manifest in {args.base_dir}")
+            return False
+        store.compact()
+        print(f"{store.count()} assets in {store.path}")
+        return True
+
+    migrated, failed = migrate_to_manifest(args.base_dir, args.remove_json)
+    print(f"Migrated {migrated} assets to {manifest_path(args.base_dir)}")
+    if failed:
+        print(f"Skipped {failed} unreadable metadata files")
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Asset Metadata Model
+--------------------
+One schema for asset wizard metadata, with slotted record classes, a
+compact serialization and a bulk loader for whole libraries.
+
+Metadata is stored as plain JSON objects, and over time the tools have
+written the same things under different keys (a sprite's "frame" vs
+"frame_number", an animation's "animation_type" and "fps" vs "type" and
+"frame_duration", frames as sprite ids vs {"sprite_id": ...} references).
+Asset.from_dict() validates a metadata object and maps those variants onto
+the canonical keys; normalize_asset() returns a canonical copy of a metadata
+dict the same way, which the core module does on every load and save. Keys
+the schema doesn't know are kept as they are.
+
+The records use __slots__ and share repeated strings (types, directions,
+asset ids), so a library held as records takes a fraction of the memory of
+the same library as dicts. Asset.to_row() is a compact positional form,
+used by dump_compact() / load_compact() to cache a whole library in one
+file that loads without re-validating.
+
+Requirements:
+- Python 3.6+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from asset_manifest_store import open_manifest, read_directory_layout
+import metadata_writer
+
+# Marks compact library files written by dump_compact()
+COMPACT_FORMAT = "nes-asset-library"
+COMPACT_VERSION = 1
+
+# Animations are timed in NES frames (60 per second)
+FRAMES_PER_SECOND = 60
+
+class SchemaError(ValueError):
+    """Raised when asset metadata doesn't fit the schema"""
+
+def _identifier(value):
+    if not isinstance(value, str) or not value:
+        raise TypeError("expected a non-empty string")
+    return value
+
+def _key(value):
+    # Asset ids are shared with every sprite and animation that points back at them
+    return sys.intern(_identifier(value))
+
+def _text(value):
+    if not isinstance(value, str):
+        raise TypeError("expected a string")
+    return value
+
+def _name(value):
+    # Types, directions and asset ids repeat across records; share one copy of each
+    return sys.intern(_text(value))
+
+def _integer(value):
+    if isinstance(value, bool):
+        raise TypeError("expected an integer")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    if not isinstance(value, int):
+        raise TypeError("expected an integer")
+    return value
+
+def _boolean(value):
+    if value in (0, 1):
+        return bool(value)
+    raise TypeError("expected true or false")
+
+def _sequence(value):
+    if not isinstance(value, (list, tuple)):
+        raise TypeError("expected a list")
+    return value
+
+def _integers(value):
+    return tuple(_integer(item) for item in _sequence(value))
+
+def _texts(value):
+    return tuple(_text(item) for item in _sequence(value))
+
+def _size(value):
+    size = _integers(value)
+    if len(size) != 2:
+        raise ValueError("expected [width, height]")
+    return size
+
+def _palette(value):
+    # NES color indices, or RGB triples still to be converted
+    return tuple(_integers(color) if isinstance(color, (list, tuple)) else _integer(color)
+                 for color in _sequence(value))
+
+def _frame_refs(value):
+    frames = []
+    for frame_ref in _sequence(value):
+        if isinstance(frame_ref, dict):
+            frame_ref = frame_ref.get("sprite_id")
+        frames.append(_identifier(frame_ref))
+    return tuple(frames)
+
+def _mapping(value):
+    if not isinstance(value, dict):
+        raise TypeError("expected an object")
+    return value
+
+def _plain(value):
+    """Turn tuples back into lists for JSON"""
+    if isinstance(value, tuple):
+        return [_plain(item) for item in value]
+    return value
+
+def _frozen(value):
+    """Turn JSON lists into tuples, as the converters do"""
+    if isinstance(value, list):
+        return tuple(_frozen(item) for item in value)
+    return value
+
+class Record:
+    """Base for the slotted metadata records
+
+    FIELDS lists (name, converter, default) in serialization order; a
+    callable default is called for a fresh value. Fields named in CHILDREN
+    hold lists of nested records. Unknown keys are kept in extra.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    ALIASES = {}          # drifted key -> canonical key
+    CHILDREN = {}         # field -> record class
+    PARENT_FIELD = None   # filled from the parent's id, and left out of compact rows
+    TUPLE_FIELDS = ()     # fields stored as tuples
+    SHARED_FIELDS = ()    # string fields interned when read from compact rows
+
+    @classmethod
+    def _upgrade(cls, values):
+        """Rewrite older representations in values before conversion"""
+
+    @classmethod
+    def from_dict(cls, data, parent_id=None):
+        """Validate a metadata object and build a record from it; raises SchemaError"""
+        if not isinstance(data, dict):
+            raise SchemaError(f"{cls.__name__} must be an object, not {type(data).__name__}")
+
+        values = dict(data)
+        for old, new in cls.ALIASES.items():
+            if old in values:
+                value = values.pop(old)
+                values.setdefault(new, value)
+        cls._upgrade(values)
+
+        record = cls.__new__(cls)
+        errors = []
+        for name, convert, default in cls.FIELDS:
+            value = values.pop(name, None)
+            if name in cls.CHILDREN:
+                children = []
+                try:
+                    for item in _sequence(value or []):
+                        children.append(cls.CHILDREN[name].from_dict(item, record.id))
+                except (TypeError, SchemaError) as e:
+                    errors.append(f"{name}: {e}")
+                value = children
+            elif value is None and name == cls.PARENT_FIELD and parent_id is not None:
+                value = sys.intern(parent_id)
+            elif value is None:
+                value = default() if callable(default) else default
+            else:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError) as e:
+                    errors.append(f"{name}: {e}")
+            setattr(record, name, value)
+        record.extra = values or None
+
+        if record.id is None:
+            errors.insert(0, "id: missing")
+        if errors:
+            raise SchemaError(f"{cls.__name__} {data.get('id', '?')}: {'; '.join(errors)}")
+        return record
+
+    def to_dict(self):
+        """Return the record as a metadata object with canonical keys"""
+        data = {}
+        for name, _, _ in self.FIELDS:
+            value = getattr(self, name)
+            if name in self.CHILDREN:
+                value = [child.to_dict() for child in value]
+            data[name] = _plain(value)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_row(self):
+        """Return the record as a positional list (see from_row)"""
+        row = []
+        for name, _, _ in self.FIELDS:
+            if name == self.PARENT_FIELD:
+                continue
+            value = getattr(self, name)
+            if name in self.CHILDREN:
+                value = [child.to_row() for child in value]
+            row.append(_plain(value))
+        row.append(self.extra)
+        return row
+
+    @classmethod
+    def from_row(cls, row, parent_id=None):
+        """Build a record from to_row() output without validating it again"""
+        record = cls.__new__(cls)
+        values = iter(row)
+        for name, _, _ in cls.FIELDS:
+            if name == cls.PARENT_FIELD:
+                value = sys.intern(parent_id) if parent_id is not None else None
+            else:
+                value = next(values)
+                if name in cls.CHILDREN:
+                    value = [cls.CHILDREN[name].from_row(child, record.id) for child in value]
+                elif name in cls.TUPLE_FIELDS:
+                    value = _frozen(value)
+                elif name in cls.SHARED_FIELDS and value is not None:
+                    value = sys.intern(value)
+            setattr(record, name, value)
+        record.extra = next(values)
+        return record
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}>"
+
+class Sprite(Record):
+    """One sprite frame of an asset"""
+
+    FIELDS = (
+        ("id", _identifier, None),
+        ("asset_id", _name, None),
+        ("name", _text, ""),
+        ("file_path", _text, None),
+        ("animation_type", _name, None),
+        ("direction", _name, None),
+        ("frame_number", _integer, 0),
+        ("tile_arrangement", _integers, (0, 1, 2, 3)),
+        ("created_at", _text, "")
+    )
+    __slots__ = tuple(field[0] for field in FIELDS) + ("extra",)
+    ALIASES = {"frame": "frame_number", "created": "created_at"}
+    PARENT_FIELD = "asset_id"
+    TUPLE_FIELDS = ("tile_arrangement",)
+    SHARED_FIELDS = ("animation_type", "direction")
+
+class Animation(Record):
+    """One animation of an asset: an ordered list of sprite ids"""
+
+    FIELDS = (
+        ("id", _identifier, None),
+        ("asset_id", _name, None),
+        ("name", _text, ""),
+        ("type", _name, "idle"),
+        ("direction", _name, None),
+        ("frames", _frame_refs, ()),
+        ("frame_duration", _integer, 10),
+        ("loop", _boolean, True),
+        ("created_at", _text, "")
+    )
+    __slots__ = tuple(field[0] for field in FIELDS) + ("extra",)
+    ALIASES = {"animation_type": "type", "created": "created_at"}
+    PARENT_FIELD = "asset_id"
+    TUPLE_FIELDS = ("frames",)
+    SHARED_FIELDS = ("type", "direction")
+
+    @classmethod
+    def _upgrade(cls, values):
+        # The editor used to store a playback rate instead of a frame duration
+        fps = values.pop("fps", None)
+        if values.get("frame_duration") is None and isinstance(fps, (int, float)) and fps > 0:
+            values["frame_duration"] = max(1, round(FRAMES_PER_SECOND / fps))
+
+class Asset(Record):
+    """An asset with its sprites and animations"""
+
+    FIELDS = (
+        ("id", _key, None),
+        ("name", _text, ""),
+        ("type", _name, ""),
+        ("description", _text, ""),
+        ("created_at", _text, ""),
+        ("updated_at", _text, ""),
+        ("size", _size, (8, 8)),
+        ("chr_bank", _integer, 0),
+        ("palette", _palette, (0, 1, 2, 3)),
+        ("animations", None, list),
+        ("sprites", None, list),
+        ("export_configs", _mapping, dict),
+        ("tags", _texts, ())
+    )
+    __slots__ = tuple(field[0] for field in FIELDS) + ("extra",)
+    CHILDREN = {"animations": Animation, "sprites": Sprite}
+    TUPLE_FIELDS = ("size", "palette", "tags")
+    SHARED_FIELDS = ("id", "type")
+
+def normalize_asset(asset_data):
+    """Validate asset metadata and return a copy with canonical keys
+
+    asset_data itself is never modified, so it is safe to pass records that
+    are shared, e.g. ones cached by an asset index. Raises SchemaError if the
+    metadata doesn't fit the schema.
+    """
+    return Asset.from_dict(asset_data).to_dict()
+
+def load_library(base_dir, strict=False):
+    """Load every asset of a library (manifest or per-directory layout) as records
+
+    Assets that don't fit the schema are reported and skipped, or raise
+    SchemaError with strict=True.
+    """
+    store = open_manifest(base_dir)
+    if store is not None:
+        items = store.list()
+    else:
+        # Saves still queued must land before the files are read
+        metadata_writer.flush(os.path.join(base_dir, "assets"))
+        items = (data for _, data in read_directory_layout(base_dir) if data is not None)
+
+    assets = []
+    for data in items:
+        try:
+            assets.append(Asset.from_dict(data))
+        except SchemaError as e:
+            if strict:
+                raise
+            print(f"Error: {e}")
+    return assets
+
+def dump_compact(assets, path):
+    """Write records to a compact library file (atomically)"""
+    metadata_writer.write_json_atomic(path, {
+        "format": COMPACT_FORMAT,
+        "version": COMPACT_VERSION,
+        "assets": [asset.to_row() for asset in assets]
+    }, indent=None)
+
+def load_compact(path):
+    """Read records from a file written by dump_compact(); raises SchemaError for other files"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get("format") != COMPACT_FORMAT:
+        raise SchemaError(f"{path} is not a compact asset library")
+    if data.get("version") != COMPACT_VERSION:
+        raise SchemaError(f"{path} has unsupported version {data.get('version')}")
+    return [Asset.from_row(row) for row in data["assets"]]
+
+def _measure(load):
+    """Return (result, seconds, bytes the result holds) for load()
+
+    Tracing allocations slows loading down, so the load is timed on its own
+    first and then repeated under tracemalloc.
+    """
+    start = time.perf_counter()
+    load()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = load()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, allocated
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate an asset library and benchmark loading it as records')
+    parser.add_argument('base_dir', help='Asset wizard base directory')
+    parser.add_argument('--compact', help='Write the library to this compact file and time loading it back')
+    parser.add_argument('--check', action='store_true', help='Only validate every asset and report problems')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.base_dir):
+        print(f"Error: Directory {args.base_dir} does not exist")
+        return False
+
+    if args.check:
+        assets = load_library(args.base_dir)
+        print(f"{len(assets)} assets fit the schema")
+        return True
+
+    store = open_manifest(args.base_dir)
+    if store is not None:
+        load_dicts = store.list
+    else:
+        load_dicts = lambda: [data for _, data in read_directory_layout(args.base_dir) if data is not None]
+
+    dicts, dict_seconds, dict_bytes = _measure(load_dicts)
+    del dicts
+    assets, record_seconds, record_bytes = _measure(lambda: load_library(args.base_dir))
+    sprites = sum(len(asset.sprites) for asset in assets)
+
+    print(f"{len(assets)} assets, {sprites} sprites")
+    print(f"Dicts:   {dict_seconds:.3f}s, {dict_bytes / 1024:.0f} KiB")
+    print(f"Records: {record_seconds:.3f}s, {record_bytes / 1024:.0f} KiB")
+    if sprites:
+        sprite = next(s for asset in assets for s in asset.sprites)
+        print(f"One sprite: {sys.getsizeof(sprite.to_dict())} bytes as a dict, "
+              f"{sys.getsizeof(sprite)} bytes as a record (shallow)")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = args.compact or os.path.join(scratch, "library.json")
+        dump_compact(assets, path)
+        del assets
+        loaded, compact_seconds, compact_bytes = _measure(lambda: load_compact(path))
+        print(f"Compact: {compact_seconds:.3f}s, {compact_bytes / 1024:.0f} KiB, "
+              f"{os.path.getsize(path) / 1024:.0f} KiB file")
+    return True
+
+if __name__ == '__main__':
+    main()
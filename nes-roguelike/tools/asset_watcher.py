@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Asset Directory Watcher
+-----------------------
+Watches an asset library for files being added, modified or deleted, so
+open tools can update their indexes incrementally instead of rescanning.
+
+On Linux the watcher uses inotify through ctypes, with a watch on every
+directory of the tree (new subdirectories are picked up as they appear).
+Elsewhere, or if inotify isn't available, it falls back to polling the tree
+with os.scandir.
+
+Events are debounced: each path is reported once it has been quiet for a
+short while, and a burst of events for one path collapses into one (a file
+created and then written is one ADDED event; created and deleted again is
+nothing). The callback receives a list of (kind, path) tuples on the
+watcher thread, so GUI code should hand them over to its own thread, e.g.
+through a queue polled with root.after().
+
+Requirements:
+- Python 3.6+
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import argparse
+import threading
+import ctypes
+import ctypes.util
+
+# Event kinds
+ADDED = "added"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# Default quiet time before a path's events are reported, in seconds
+DEFAULT_DEBOUNCE = 0.3
+
+# Default interval between scans for the polling fallback, in seconds
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF
+
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# How a new event for a path combines with one still waiting to be reported
+# (None means the two cancel out)
+COALESCE = {
+    (ADDED, ADDED): ADDED,
+    (ADDED, MODIFIED): ADDED,
+    (ADDED, DELETED): None,
+    (MODIFIED, ADDED): MODIFIED,
+    (MODIFIED, MODIFIED): MODIFIED,
+    (MODIFIED, DELETED): DELETED,
+    (DELETED, ADDED): MODIFIED,
+    (DELETED, MODIFIED): MODIFIED,
+    (DELETED, DELETED): DELETED
+}
+
+def is_watched_name(name, suffixes=None):
+    """True for file names the watcher reports: not hidden (temp files), and with a wanted suffix"""
+    if name.startswith("."):
+        return False
+    return suffixes is None or name.lower().endswith(suffixes)
+
+def scan_tree(root, suffixes=None):
+    """Return {path: (mtime_ns, size)} for every watched file under root"""
+    files = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif is_watched_name(entry.name, suffixes):
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return files
+
+class PollingBackend:
+    """Finds changes by rescanning the tree every interval seconds"""
+
+    name = "polling"
+
+    def __init__(self, root, suffixes=None, interval=DEFAULT_POLL_INTERVAL):
+        self.root = root
+        self.suffixes = suffixes
+        self.interval = interval
+        self.files = scan_tree(root, suffixes)
+        self.next_scan = time.monotonic() + interval
+
+    def wait(self, timeout, stop_event):
+        """Wait up to timeout seconds and return [(kind, path)] seen meanwhile"""
+        delay = min(timeout, max(0, self.next_scan - time.monotonic()))
+        if stop_event.wait(delay) or time.monotonic() < self.next_scan:
+            return []
+        self.next_scan = time.monotonic() + self.interval
+
+        current = scan_tree(self.root, self.suffixes)
+        events = [(ADDED, path) for path in current.keys() - self.files.keys()]
+        events += [(DELETED, path) for path in self.files.keys() - current.keys()]
+        events += [(MODIFIED, path) for path in current.keys() & self.files.keys()
+                   if current[path] != self.files[path]]
+        self.files = current
+        return events
+
+    def close(self):
+        pass
+
+class InotifyBackend:
+    """Receives changes from the Linux kernel through inotify"""
+
+    name = "inotify"
+
+    def __init__(self, root, suffixes=None):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc.inotify_init1.argtypes = [ctypes.c_int]
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self.root = root
+        self.suffixes = suffixes
+        self.watches = {}         # watch descriptor -> directory
+        self.files = set()        # watched files known to exist, to report directory removals
+        self.buffer = b""
+        try:
+            self._add_tree(root, report=False)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"{os.strerror(error)}: {directory}")
+        self.watches[wd] = directory
+
+    def _add_tree(self, directory, report=True):
+        """Watch a directory and its subdirectories; returns ADDED events for files already there"""
+        events = []
+        for dirpath, dirnames, filenames in os.walk(directory):
+            try:
+                self._add_watch(dirpath)
+            except OSError as e:
+                # The root must be watchable; a subdirectory may vanish while we walk
+                if dirpath == directory and not report:
+                    raise
+                if e.errno == errno.ENOSPC:
+                    print(f"Warning: Out of inotify watches at {dirpath}")
+                continue
+            for filename in filenames:
+                if is_watched_name(filename, self.suffixes):
+                    path = os.path.join(dirpath, filename)
+                    self.files.add(path)
+                    events.append((ADDED, path))
+        return events if report else []
+
+    def _remove_tree(self, directory):
+        """Report every known file under a directory that went away"""
+        prefix = directory.rstrip(os.sep) + os.sep
+        gone = [path for path in self.files if path.startswith(prefix)]
+        self.files.difference_update(gone)
+        return [(DELETED, path) for path in gone]
+
+    def wait(self, timeout, stop_event):
+        """Wait up to timeout seconds and return [(kind, path)] seen meanwhile"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            self.buffer += os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(self.buffer):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(self.buffer, offset)
+            end = offset + INOTIFY_EVENT.size + length
+            if end > len(self.buffer):
+                break
+            name = os.fsdecode(self.buffer[offset + INOTIFY_EVENT.size:end].rstrip(b"\0"))
+            offset = end
+            events.extend(self._translate(wd, mask, name))
+        self.buffer = self.buffer[offset:]
+        return events
+
+    def _translate(self, wd, mask, name):
+        """Turn one raw inotify event into watcher events"""
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost; report the difference against a fresh scan
+            current = set(scan_tree(self.root, self.suffixes))
+            events = [(ADDED, path) for path in current - self.files]
+            events += [(DELETED, path) for path in self.files - current]
+            self.files = current
+            return events
+
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return []
+
+        directory = self.watches.get(wd)
+        if directory is None or not name:
+            return []
+        path = os.path.join(directory, name)
+
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                return self._add_tree(path)
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                return self._remove_tree(path)
+            return []
+
+        if not is_watched_name(name, self.suffixes):
+            return []
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self.files.discard(path)
+            return [(DELETED, path)]
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            self.files.add(path)
+            return [(ADDED, path)]
+        if mask & IN_CLOSE_WRITE:
+            return [(MODIFIED, path)]
+        return []
+
+    def close(self):
+        os.close(self.fd)
+
+class AssetWatcher:
+    """Debounced file watcher for one directory tree"""
+
+    def __init__(self, root, callback, suffixes=None, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        """Watch root, calling callback([(kind, path)]) with debounced events
+
+        suffixes limits events to file names ending in one of them (e.g.
+        (".png", ".json")); hidden files are always ignored.
+        """
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self.suffixes = tuple(s.lower() for s in suffixes) if suffixes else None
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.pending = {}         # path -> [kind, first seen, last seen]
+        self.backend = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """Start watching on a background thread; returns the backend name"""
+        if self.thread is not None:
+            return self.backend.name
+
+        if self.use_inotify:
+            try:
+                self.backend = InotifyBackend(self.root, self.suffixes)
+            except (OSError, AttributeError) as e:
+                print(f"Warning: inotify unavailable ({e}); polling {self.root} instead")
+        if self.backend is None:
+            self.backend = PollingBackend(self.root, self.suffixes, self.poll_interval)
+
+        self.thread = threading.Thread(target=self._run, name="asset-watcher", daemon=True)
+        self.thread.start()
+        return self.backend.name
+
+    def stop(self):
+        """Stop watching and wait for the watcher thread to finish"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            self.backend.close()
+
+    def _queue(self, kind, path, now):
+        entry = self.pending.get(path)
+        if entry is None:
+            self.pending[path] = [kind, now, now]
+            return
+        combined = COALESCE[(entry[0], kind)]
+        if combined is None:
+            del self.pending[path]
+        else:
+            entry[0] = combined
+            entry[2] = now
+
+    def _due(self, entry, now):
+        # Quiet for the debounce time, or waiting too long under constant changes
+        return now - entry[2] >= self.debounce or now - entry[1] >= self.debounce * 10
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            timeout = self.debounce / 2 if self.pending else 0.5
+            try:
+                events = self.backend.wait(timeout, self.stop_event)
+            except OSError as e:
+                print(f"Error watching {self.root}: {e}")
+                return
+
+            now = time.monotonic()
+            for kind, path in events:
+                self._queue(kind, path, now)
+
+            ready = [(entry[0], path) for path, entry in self.pending.items() if self._due(entry, now)]
+            if ready:
+                for _, path in ready:
+                    del self.pending[path]
+                try:
+                    self.callback(ready)
+                except Exception as e:
+                    print(f"Error handling file events: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Print debounced file events for an asset directory')
+    parser.add_argument('directory', help='Directory to watch')
+    parser.add_argument('--suffix', action='append', help='Only report files ending in this (repeatable)')
+    parser.add_argument('--poll', action='store_true', help="Poll instead of using inotify")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'Quiet time before a change is reported (default: {DEFAULT_DEBOUNCE}s)')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return False
+
+    def report(events):
+        for kind, path in events:
+            print(f"{kind:<9} {path}")
+        sys.stdout.flush()
+
+    watcher = AssetWatcher(args.directory, report, args.suffix, args.debounce, use_inotify=not args.poll)
+    print(f"Watching {watcher.root} with {watcher.start()} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return True
+
+if __name__ == '__main__':
+    main()
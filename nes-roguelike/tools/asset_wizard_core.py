@@ -9,8 +9,15 @@ This module focuses on data structures and helper functions.
 import os
 import json
 import uuid
+import hashlib
 import datetime
 from pathlib import Path
+from collections import OrderedDict
+
+from asset_manifest_store import open_manifest
+from asset_model import normalize_asset, SchemaError
+import metadata_writer
+from sprite_export import place_file, pack_atlas
 
 # Animation type definitions
 ANIMATION_TYPES = [
@@ -52,10 +59,54 @@ ASSET_TYPES = {
     "Prop": "Static game world objects"
 }
 
+# Namespace for content-derived ids (see stable_id)
+STABLE_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "nes-roguelike/asset-wizard")
+
+def stable_id(*parts):
+    """Return a uuid5 id derived from parts, the same on every run and machine
+    
+    Parts should identify what the item is made from: content hashes, and
+    source file names rather than full paths so ids match on other machines.
+    Creating an item again from the same parts yields the same id, so it can
+    replace the earlier one instead of duplicating it (see upsert_by_id).
+    """
+    return str(uuid.uuid5(STABLE_ID_NAMESPACE, "\0".join(str(part) for part in parts)))
+
+def file_content_hash(path):
+    """Return the SHA-1 hex digest of a file's bytes"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def image_content_hash(image):
+    """Return the SHA-1 hex digest of a PIL image's mode, size and pixels"""
+    digest = hashlib.sha1(f"{image.mode}:{image.width}x{image.height}:".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def upsert_by_id(items, item):
+    """Replace the entry of items with item's id, or append item; returns True if one was replaced"""
+    for i, existing in enumerate(items):
+        if existing.get("id") == item["id"]:
+            items[i] = item
+            return True
+    items.append(item)
+    return False
+
 # Default metadata structure
-def create_default_metadata(asset_type="Player", name="New Asset"):
-    """Create default metadata for a new asset"""
-    asset_id = str(uuid.uuid4())
+def create_default_metadata(asset_type="Player", name="New Asset", deterministic=False, source=""):
+    """Create default metadata for a new asset
+    
+    With deterministic=True the id is derived from the type, name and source
+    (e.g. the sprite sheet file name and content hash the asset is built
+    from) instead of being random.
+    """
+    if deterministic:
+        asset_id = stable_id("asset", asset_type, name, source)
+    else:
+        asset_id = str(uuid.uuid4())
     now = datetime.datetime.now().isoformat()
     
     # Set default size based on asset type
@@ -96,10 +147,19 @@ def create_default_metadata(asset_type="Player", name="New Asset"):
     }
 
 # Animation frame management
-def create_animation_definition(asset_id, name, animation_type="idle", direction="down", frame_duration=10, loop=True):
-    """Create a new animation definition for an asset"""
+def create_animation_definition(asset_id, name, animation_type="idle", direction="down", frame_duration=10, loop=True,
+                                deterministic=False):
+    """Create a new animation definition for an asset
+    
+    With deterministic=True the id is derived from the asset, name, type and
+    direction, so defining the same animation again replaces it.
+    """
+    if deterministic:
+        animation_id = stable_id("animation", asset_id, name, animation_type, direction)
+    else:
+        animation_id = str(uuid.uuid4())
     return {
-        "id": str(uuid.uuid4()),
+        "id": animation_id,
         "asset_id": asset_id,
         "name": name,
         "type": animation_type,
@@ -111,10 +171,23 @@ def create_animation_definition(asset_id, name, animation_type="idle", direction
     }
 
 # Sprite frame management
-def create_sprite_definition(asset_id, name, file_path=None, animation_type=None, direction=None, frame_number=0):
-    """Create a new sprite frame definition"""
+def create_sprite_definition(asset_id, name, file_path=None, animation_type=None, direction=None, frame_number=0,
+                             deterministic=False, source_path=None):
+    """Create a new sprite frame definition
+    
+    With deterministic=True the id is derived from the asset and the image's
+    file name and content (source_path if given, otherwise file_path), so
+    importing the same image again yields the same sprite.
+    """
+    image_path = source_path or file_path
+    if deterministic and image_path and os.path.isfile(image_path):
+        sprite_id = stable_id("sprite", asset_id, os.path.basename(image_path), file_content_hash(image_path))
+    elif deterministic:
+        sprite_id = stable_id("sprite", asset_id, name, frame_number)
+    else:
+        sprite_id = str(uuid.uuid4())
     return {
-        "id": str(uuid.uuid4()),
+        "id": sprite_id,
         "asset_id": asset_id,
         "name": name,
         "file_path": file_path,
@@ -141,18 +214,34 @@ def ensure_asset_directory(base_dir, asset_id=None):
     return asset_dir
 
 def save_asset_metadata(base_dir, asset_data):
-    """Save asset metadata to file"""
-    asset_id = asset_data["id"]
+    """Save asset metadata to file
+    
+    A validated copy with canonical keys is what gets saved (see asset_model);
+    metadata that doesn't fit the schema is not saved and None is returned.
+    Of the caller's dict only updated_at is changed.
+    """
+    try:
+        canonical = normalize_asset(asset_data)
+    except SchemaError as e:
+        print(f"Error: Not saving invalid metadata: {e}")
+        return None
+    
+    asset_id = canonical["id"]
     asset_dir = ensure_asset_directory(base_dir, asset_id)
     metadata_file = os.path.join(asset_dir, "metadata.json")
     
     # Update the updated_at timestamp
-    asset_data["updated_at"] = datetime.datetime.now().isoformat()
+    asset_data["updated_at"] = canonical["updated_at"] = datetime.datetime.now().isoformat()
     
-    # Save to file
-    with open(metadata_file, 'w') as f:
-        json.dump(asset_data, f, indent=2)
+    # Save to the manifest if the library has one, otherwise queue a coalesced file write
+    store = open_manifest(base_dir)
+    if store is not None:
+        store.save(canonical)
+        metadata_file = store.path
+    else:
+        metadata_writer.write_json(metadata_file, canonical)
     
+    _asset_saved(base_dir, canonical, metadata_file)
     return metadata_file
 
 def load_asset_metadata(base_dir, asset_id):
@@ -160,13 +249,39 @@ def load_asset_metadata(base_dir, asset_id):
     asset_dir = os.path.join(base_dir, "assets", asset_id)
     metadata_file = os.path.join(asset_dir, "metadata.json")
     
+    # Serve from the asset index when one is open for this directory
+    index = _ASSET_INDEXES.get(os.path.abspath(base_dir))
+    if index is not None:
+        return index.get(asset_id, refresh=True)
+    
+    store = open_manifest(base_dir)
+    if store is not None:
+        return canonical_asset(store.load(asset_id))
+    
+    metadata_writer.flush(metadata_file)
     if not os.path.exists(metadata_file):
         return None
     
     with open(metadata_file, 'r') as f:
         data = json.load(f)
     
-    return data
+    return canonical_asset(data)
+
+def delete_asset_metadata(base_dir, asset_id):
+    """Remove an asset's metadata from the manifest (if any) and open indexes
+    
+    The asset directory itself is left for the caller to remove.
+    """
+    store = open_manifest(base_dir)
+    if store is not None:
+        store.delete(asset_id)
+    
+    # Don't let a queued save recreate the metadata of a deleted asset
+    metadata_writer.discard(os.path.join(base_dir, "assets", asset_id))
+    
+    index = _ASSET_INDEXES.get(os.path.abspath(base_dir))
+    if index is not None:
+        index.remove(asset_id)
 
 def generate_sprite_filename(asset_id, name, animation_type=None, direction=None, frame=None):
     """Generate a standardized filename for a sprite"""
@@ -182,28 +297,317 @@ def generate_sprite_filename(asset_id, name, animation_type=None, direction=None
         return f"{base_name}.png"
 
 # Asset list management
-def get_asset_list(base_dir):
-    """Get a list of all assets in the assets directory"""
-    assets_dir = os.path.join(base_dir, "assets")
-    if not os.path.exists(assets_dir):
-        return []
-    
-    asset_list = []
-    for asset_id in os.listdir(assets_dir):
-        asset_dir = os.path.join(assets_dir, asset_id)
-        if os.path.isdir(asset_dir):
-            metadata_file = os.path.join(asset_dir, "metadata.json")
-            if os.path.exists(metadata_file):
-                with open(metadata_file, 'r') as f:
+# Full records of recently opened assets kept by each AssetIndex
+RECORD_CACHE_SIZE = 16
+
+# Per-directory layout: summaries cached across sessions, next to the assets directory
+SUMMARY_CACHE_FILENAME = "asset_summaries.json"
+
+def asset_summary(asset_data):
+    """Return the small projection of an asset that listings need"""
+    return {
+        "id": asset_data["id"],
+        "name": asset_data.get("name", ""),
+        "type": asset_data.get("type", ""),
+        "description": asset_data.get("description", ""),
+        "tags": list(asset_data.get("tags", [])),
+        "updated_at": asset_data.get("updated_at", ""),
+        "sprite_count": len(asset_data.get("sprites", [])),
+        "animation_count": len(asset_data.get("animations", []))
+    }
+
+def canonical_asset(asset_data):
+    """Bring metadata read from disk onto the canonical schema (see asset_model)
+    
+    Metadata that doesn't fit the schema is returned as it is, with a warning.
+    """
+    if asset_data is None:
+        return None
+    try:
+        return normalize_asset(asset_data)
+    except SchemaError as e:
+        print(f"Warning: {e}")
+        return asset_data
+
+def read_asset_record(base_dir, asset_id):
+    """Read one asset's full metadata from the manifest or its metadata.json, bypassing any index"""
+    store = open_manifest(base_dir)
+    if store is not None:
+        return canonical_asset(store.load(asset_id))
+    
+    metadata_file = os.path.join(base_dir, "assets", asset_id, "metadata.json")
+    metadata_writer.flush(metadata_file)
+    try:
+        with open(metadata_file, 'r') as f:
+            return canonical_asset(json.load(f))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+class AssetIndex:
+    """In-memory index of asset summaries for a base directory
+    
+    Only each asset's summary (see asset_summary) is held for listing and
+    filtering; full records are read on demand by get(), and the most
+    recently used few are kept. In the per-directory layout refresh() stats
+    each metadata.json and re-parses the ones whose mtime changed, and the
+    summaries are cached in asset_summaries.json so a new session doesn't
+    parse every file. With a manifest store, refresh() fetches the summaries
+    written since the last manifest generation it saw. Assets saved through
+    this module update the index directly. generation increases on every
+    change, so callers can tell when cached views of the index are stale.
+    """
+    
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.assets_dir = os.path.join(base_dir, "assets")
+        self.summaries = {}       # asset id -> summary
+        self.mtimes = {}          # asset id -> metadata.json mtime
+        self.generations = {}     # asset id -> manifest generation of its last save
+        self.records = OrderedDict()  # asset id -> full metadata, least recently used first
+        self.generation = 0
+        self._sorted = None       # (generation, summaries sorted by updated_at)
+        self.summary_file = os.path.join(base_dir, SUMMARY_CACHE_FILENAME)
+        self.store = open_manifest(base_dir)
+        self.store_generation = 0 # last manifest generation applied
+        if self.store is None:
+            self._load_summary_cache()
+    
+    def _metadata_file(self, asset_id):
+        return os.path.join(self.assets_dir, asset_id, "metadata.json")
+    
+    def _load_summary_cache(self):
+        """Start from the summaries saved by an earlier session, if any"""
+        try:
+            with open(self.summary_file, 'r') as f:
+                cached = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        for asset_id, (mtime, summary) in cached.get("assets", {}).items():
+            self.mtimes[asset_id] = mtime
+            self.summaries[asset_id] = summary
+    
+    def _save_summary_cache(self):
+        """Queue a write of the summaries for the next session"""
+        if self.store is None and os.path.isdir(self.base_dir):
+            metadata_writer.write_json(self.summary_file, {
+                "assets": {
+                    asset_id: [self.mtimes[asset_id], summary]
+                    for asset_id, summary in self.summaries.items() if asset_id in self.mtimes
+                }
+            }, indent=None)
+    
+    def _remember(self, asset_id, asset_data):
+        """Keep a full record in the small most-recently-used cache"""
+        self.records[asset_id] = asset_data
+        self.records.move_to_end(asset_id)
+        while len(self.records) > RECORD_CACHE_SIZE:
+            self.records.popitem(last=False)
+    
+    def _load(self, asset_id, mtime):
+        """(Re)load one asset's summary, returning True if the index changed"""
+        self.mtimes[asset_id] = mtime
+        self.records.pop(asset_id, None)
+        try:
+            with open(self._metadata_file(asset_id), 'r') as f:
+                self.summaries[asset_id] = asset_summary(json.load(f))
+            return True
+        except (OSError, json.JSONDecodeError, KeyError):
+            # Remember the mtime anyway so a broken file is only reported once
+            print(f"Error reading metadata for asset {asset_id}")
+            return self.summaries.pop(asset_id, None) is not None
+    
+    def _refresh_from_store(self):
+        """Apply manifest summaries written since the last refresh"""
+        self.store_generation, changes = self.store.summaries_since(self.store_generation)
+        for asset_id, generation, summary in changes:
+            self.records.pop(asset_id, None)
+            if summary is None:
+                self.summaries.pop(asset_id, None)
+                self.generations.pop(asset_id, None)
+            else:
+                self.summaries[asset_id] = summary
+                self.generations[asset_id] = generation
+        return bool(changes)
+    
+    def refresh(self):
+        """Pick up assets added, changed or removed on disk; returns True if anything changed"""
+        if self.store is None:
+            # The library may have been migrated since the index was opened
+            self.store = open_manifest(self.base_dir)
+            if self.store is not None:
+                self.summaries.clear()
+                self.mtimes.clear()
+                self.generations.clear()
+                self.records.clear()
+        
+        if self.store is not None:
+            changed = self._refresh_from_store()
+            if changed:
+                self.generation += 1
+            return changed
+        
+        changed = False
+        seen = set()
+        
+        # Queued saves must land first, or their old files would look like external edits
+        metadata_writer.flush(self.assets_dir)
+        
+        if os.path.isdir(self.assets_dir):
+            with os.scandir(self.assets_dir) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
                     try:
-                        metadata = json.load(f)
-                        asset_list.append(metadata)
-                    except json.JSONDecodeError:
-                        print(f"Error reading metadata for asset {asset_id}")
+                        mtime = os.stat(self._metadata_file(entry.name)).st_mtime_ns
+                    except OSError:
+                        continue
+                    seen.add(entry.name)
+                    if self.mtimes.get(entry.name) != mtime:
+                        changed = self._load(entry.name, mtime) or changed
+        
+        for asset_id in list(self.mtimes):
+            if asset_id not in seen:
+                self.summaries.pop(asset_id, None)
+                self.records.pop(asset_id, None)
+                del self.mtimes[asset_id]
+                changed = True
+        
+        if changed:
+            self.generation += 1
+            self._save_summary_cache()
+        return changed
+    
+    def update(self, asset_data, metadata_file=None):
+        """Record an asset that was just written to disk"""
+        asset_id = asset_data["id"]
+        if self.store is not None:
+            # The new generation is picked up by the next refresh
+            self.generations.pop(asset_id, None)
+        else:
+            metadata_file = metadata_file or self._metadata_file(asset_id)
+            if metadata_writer.get_writer().is_pending(metadata_file):
+                # Unknown until the queued write lands; the next refresh re-reads it once
+                self.mtimes.pop(asset_id, None)
+            else:
+                try:
+                    self.mtimes[asset_id] = os.stat(metadata_file).st_mtime_ns
+                except OSError:
+                    self.mtimes.pop(asset_id, None)
+        self.summaries[asset_id] = asset_summary(asset_data)
+        self._remember(asset_id, asset_data)
+        self.generation += 1
+    
+    def remove(self, asset_id):
+        """Forget an asset that was deleted"""
+        self.records.pop(asset_id, None)
+        self.generations.pop(asset_id, None)
+        if asset_id in self.mtimes or asset_id in self.summaries:
+            self.summaries.pop(asset_id, None)
+            self.mtimes.pop(asset_id, None)
+            self.generation += 1
+            self._save_summary_cache()
+    
+    def refresh_asset(self, asset_id):
+        """Re-check one asset on disk, e.g. after a file watcher event; returns True if it changed"""
+        if self.store is not None:
+            return self.refresh()
+        
+        metadata_writer.flush(self._metadata_file(asset_id))
+        try:
+            mtime = os.stat(self._metadata_file(asset_id)).st_mtime_ns
+        except OSError:
+            changed = asset_id in self.summaries
+            self.remove(asset_id)
+            return changed
+        if self.mtimes.get(asset_id) == mtime:
+            return False
+        changed = self._load(asset_id, mtime)
+        if changed:
+            self.generation += 1
+            self._save_summary_cache()
+        return changed
+    
+    def get(self, asset_id, refresh=False):
+        """Return one asset's full metadata, or None; refresh=True re-checks its file first"""
+        if refresh:
+            self.refresh_asset(asset_id)
+        
+        if asset_id not in self.summaries:
+            return None
+        record = self.records.get(asset_id)
+        if record is None:
+            record = read_asset_record(self.base_dir, asset_id)
+            if record is None:
+                return None
+        self._remember(asset_id, record)
+        return record
+    
+    def version(self, asset_id):
+        """Return a value that changes whenever the asset's stored metadata does
+        
+        That is its manifest generation or its metadata.json mtime, or None if
+        it isn't known until the next refresh.
+        """
+        if self.store is not None:
+            return self.generations.get(asset_id)
+        return self.mtimes.get(asset_id)
+    
+    def list(self, asset_type=None, query=None):
+        """Return asset summaries, most recently updated first, optionally filtered
+        
+        asset_type filters on the asset's type ("All" or None for every type);
+        query is a case-insensitive substring of the name, description or tags.
+        """
+        if self._sorted is None or self._sorted[0] != self.generation:
+            ordered = sorted(self.summaries.values(), key=lambda x: x.get("updated_at", ""), reverse=True)
+            self._sorted = (self.generation, ordered)
+        assets = self._sorted[1]
+        
+        if asset_type and asset_type != "All":
+            assets = [a for a in assets if a.get("type") == asset_type]
+        if query:
+            query = query.lower()
+            assets = [
+                a for a in assets
+                if query in a.get("name", "").lower()
+                or query in a.get("description", "").lower()
+                or any(query in tag.lower() for tag in a.get("tags", []))
+            ]
+        return list(assets)
+    
+    def __len__(self):
+        return len(self.summaries)
+    
+    def __contains__(self, asset_id):
+        return asset_id in self.summaries
+
+# Open indexes by absolute base directory, so saves can keep them current
+_ASSET_INDEXES = {}
+
+def get_asset_index(base_dir):
+    """Return the shared AssetIndex for a base directory, loading it on first use"""
+    key = os.path.abspath(base_dir)
+    index = _ASSET_INDEXES.get(key)
+    if index is None:
+        index = AssetIndex(base_dir)
+        index.refresh()
+        _ASSET_INDEXES[key] = index
+    return index
+
+def _asset_saved(base_dir, asset_data, metadata_file):
+    """Keep an open index for base_dir in step with a metadata file just written"""
+    index = _ASSET_INDEXES.get(os.path.abspath(base_dir))
+    if index is not None:
+        index.update(asset_data, metadata_file)
+
+def get_asset_list(base_dir):
+    """Get summaries of all assets in the assets directory, most recently updated first
     
-    # Sort by updated_at
-    asset_list.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
-    return asset_list
+    Each entry is an asset_summary; load the full record with load_asset_metadata.
+    """
+    index = get_asset_index(base_dir)
+    index.refresh()
+    return index.list()
 
 # Conversion utilities
 def convert_to_nes_palette(rgb_color):
@@ -312,19 +716,36 @@ def save_frame_image(frame_image, asset_dir, filename):
     return file_path
 
 def save_asset(base_dir, asset_data):
-    """Save an asset, including its metadata"""
+    """Save an asset, including its metadata (a canonical copy, as in save_asset_metadata)"""
+    try:
+        canonical = normalize_asset(asset_data)
+    except SchemaError as e:
+        print(f"Error: Not saving invalid metadata: {e}")
+        return None
+    
     # Ensure the asset directory exists
-    asset_dir = get_asset_dir(base_dir, asset_data)
+    asset_dir = get_asset_dir(base_dir, canonical)
     
-    # Save the metadata file
-    metadata_file = os.path.join(asset_dir, "metadata.json")
-    with open(metadata_file, 'w') as f:
-        json.dump(asset_data, f, indent=2)
+    # Save the metadata to the manifest if the library has one, otherwise to file
+    store = open_manifest(base_dir)
+    if store is not None:
+        store.save(canonical)
+        metadata_file = store.path
+    else:
+        metadata_file = os.path.join(asset_dir, "metadata.json")
+        metadata_writer.write_json(metadata_file, canonical)
     
+    _asset_saved(base_dir, canonical, metadata_file)
     return metadata_file
 
-def export_asset_for_game(base_dir, asset_data, export_dir=None):
-    """Export asset in a format ready for game integration"""
+def export_asset_for_game(base_dir, asset_data, export_dir=None, include_sprites=True, link_mode="copy"):
+    """Export asset in a format ready for game integration
+    
+    link_mode says how sprite files are placed (see sprite_export): "copy",
+    "hardlink", "reflink", or "pack" for one <name>_atlas.png per asset.
+    With include_sprites=False only the JSON is written, and any sprite
+    files left by an earlier export are removed.
+    """
     asset_id = asset_data["id"]
     asset_name = asset_data["name"].lower().replace(" ", "_")
     
@@ -344,28 +765,40 @@ def export_asset_for_game(base_dir, asset_data, export_dir=None):
         json.dump(game_data, f, indent=2)
     
     # Export sprite files if they exist
-    if "sprites" in asset_data and asset_data["sprites"]:
-        # Create a sprites directory for this asset
-        sprites_dir = os.path.join(export_dir, f"{asset_name}_sprites")
-        os.makedirs(sprites_dir, exist_ok=True)
-        
-        # Copy each sprite file
-        for sprite in asset_data["sprites"]:
+    sprites_dir = os.path.join(export_dir, f"{asset_name}_sprites")
+    atlas_path = os.path.join(export_dir, f"{asset_name}_atlas.png")
+    frames = {}
+    if include_sprites:
+        for sprite in asset_data.get("sprites", []):
             if "file_path" in sprite and os.path.exists(sprite["file_path"]):
                 # Get sprite information
                 anim_type = sprite.get("animation_type", "idle")
                 direction = sprite.get("direction", "")
-                frame = sprite.get("frame", 0)
+                frame = sprite.get("frame_number", 0)
                 
                 # Generate output filename
                 if direction:
                     out_file = f"{anim_type}_{direction}_{frame:02d}.png"
                 else:
                     out_file = f"{anim_type}_{frame:02d}.png"
-                
-                # Copy the file
-                import shutil
-                shutil.copy2(sprite["file_path"], os.path.join(sprites_dir, out_file))
+                frames[out_file] = sprite["file_path"]
+    
+    # Drop whichever layout an earlier export left that this one doesn't use
+    if (not frames or link_mode == "pack") and os.path.isdir(sprites_dir):
+        import shutil
+        shutil.rmtree(sprites_dir)
+    if not frames or link_mode != "pack":
+        for stale in (atlas_path, os.path.splitext(atlas_path)[0] + ".json"):
+            if os.path.exists(stale):
+                os.remove(stale)
+    
+    if frames and link_mode == "pack":
+        pack_atlas({os.path.splitext(out_file)[0]: path for out_file, path in frames.items()}, atlas_path)
+    elif frames:
+        # Create a sprites directory for this asset
+        os.makedirs(sprites_dir, exist_ok=True)
+        for out_file, path in frames.items():
+            place_file(path, os.path.join(sprites_dir, out_file), link_mode)
     
     return json_file
 
@@ -11,9 +11,12 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 from PIL import Image, ImageTk, ImageDraw
 import json
+import copy
 import uuid
 import datetime
 import shutil
+import queue
+import threading
 
 # Import sprite sheet editor
 try:
@@ -23,23 +26,28 @@ except ImportError:
     print("Warning: Could not import SpriteSheetEditor module")
     SpriteSheetEditor = None
 
+from thumbnail_cache import ThumbnailCache
+from export_engine import ExportEngine, SKIPPED, FAILED
+from sprite_export import LINK_MODES
+from asset_watcher import AssetWatcher
+
 # Import core functionality
 from asset_wizard_core import (
     ASSET_TYPES,
     ANIMATION_TYPES,
     DIRECTION_TYPES,
     create_default_metadata,
-    get_asset_list,
-    load_asset_metadata,
+    get_asset_index,
+    delete_asset_metadata,
     get_asset_dir,
     save_asset,
-    export_asset_for_game,
     create_animation_definition,
-    create_sprite_definition,
     ensure_asset_directory,
     save_asset_metadata,
-    get_asset_list,
-    generate_sprite_filename
+    stable_id,
+    file_content_hash,
+    image_content_hash,
+    upsert_by_id
 )
 
 class AssetWizardApp:
@@ -60,14 +68,27 @@ class AssetWizardApp:
         # Ensure directories exist
         ensure_asset_directory(self.base_dir)
         
+        # Cache of scaled sprite previews
+        self.thumbnails = ThumbnailCache(os.path.join(self.base_dir, "thumbnails.db"))
+        
         # Current asset being edited
         self.current_asset = None
         
+        # Asset metadata is loaded once and kept in memory
+        self.asset_index = get_asset_index(self.base_dir)
+        self.visible_assets = []  # Summaries of the assets shown in the listbox, in listbox order
+        
         # Setup the UI
         self.setup_ui()
         
         # Load asset list
         self.load_asset_list()
+        
+        # Watch the library so files changed outside the wizard show up without a reload
+        self.file_events = queue.Queue()
+        self.watcher = AssetWatcher(self.asset_index.assets_dir, self.file_events.put, suffixes=(".png", ".json"))
+        self.watcher.start()
+        self.root.after(500, self.poll_file_events)
     
     def setup_ui(self):
         """Setup the main UI components"""
@@ -492,12 +513,21 @@ The exported files can be imported directly into your C/assembly code."""
         ttk.Checkbutton(format_frame, text="Organize by type", 
                        variable=self.organize_by_type).grid(row=0, column=2, sticky=tk.W, padx=5)
         
+        ttk.Label(format_frame, text="Sprite files:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.link_mode = tk.StringVar(value="copy")
+        ttk.Combobox(format_frame, textvariable=self.link_mode, values=LINK_MODES,
+                     state="readonly", width=12).grid(row=1, column=1, sticky=tk.W, padx=5)
+        
+        self.export_binary = tk.BooleanVar(value=False)
+        ttk.Checkbutton(format_frame, text="NES binary (.chr/.bin + .inc)",
+                       variable=self.export_binary).grid(row=1, column=2, sticky=tk.W, padx=5)
+        
         # Export buttons
         btn_frame = ttk.Frame(export_frame)
         btn_frame.pack(fill=tk.X, pady=20)
         
-        ttk.Button(btn_frame, text="Export Now", 
-                  command=self.perform_export).pack(side=tk.RIGHT)
+        self.export_button = ttk.Button(btn_frame, text="Export Now", command=self.perform_export)
+        self.export_button.pack(side=tk.RIGHT)
         
         # Export log
         log_frame = ttk.LabelFrame(export_frame, text="Export Log")
@@ -511,28 +541,49 @@ The exported files can be imported directly into your C/assembly code."""
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
     
     def load_asset_list(self):
-        """Load the list of assets into the UI"""
+        """Load the list of assets into the UI, picking up changes on disk"""
+        self.asset_index.refresh()
+        self.populate_asset_list()
+    
+    def poll_file_events(self):
+        """Apply file watcher events to the asset index and thumbnail cache"""
+        changed_assets = set()
+        while True:
+            try:
+                events = self.file_events.get_nowait()
+            except queue.Empty:
+                break
+            for kind, path in events:
+                if path.lower().endswith(".png"):
+                    self.thumbnails.invalidate(path)
+                elif os.path.basename(path) == "metadata.json":
+                    changed_assets.add(os.path.relpath(path, self.asset_index.assets_dir).split(os.sep)[0])
+        
+        # Each asset is re-read on its own instead of rescanning the library
+        changed = [self.asset_index.refresh_asset(asset_id) for asset_id in changed_assets]
+        if any(changed):
+            self.populate_asset_list()
+            self.update_editor_asset_list()
+        self.root.after(500, self.poll_file_events)
+    
+    def populate_asset_list(self):
+        """Fill the asset listbox from the in-memory index"""
         # Clear current list
         self.asset_listbox.delete(0, tk.END)
         
-        # Get assets
-        assets = get_asset_list(self.base_dir)
-        
-        # Filter if needed
-        filter_type = self.filter_var.get()
-        if filter_type != "All":
-            assets = [a for a in assets if a.get("type") == filter_type]
+        # Get assets, filtered if needed
+        self.visible_assets = self.asset_index.list(self.filter_var.get())
         
         # Add to listbox
-        for asset in assets:
+        for asset in self.visible_assets:
             self.asset_listbox.insert(tk.END, f"{asset['name']} ({asset['type']})")
         
         # Update status
-        self.status_var.set(f"Loaded {len(assets)} assets")
+        self.status_var.set(f"Loaded {len(self.visible_assets)} assets")
     
     def filter_assets(self, event=None):
         """Filter assets based on selected type"""
-        self.load_asset_list()
+        self.populate_asset_list()
     
     def on_asset_select(self, event=None):
         """Handle asset selection from the list"""
@@ -542,14 +593,11 @@ The exported files can be imported directly into your C/assembly code."""
         
         index = self.asset_listbox.curselection()[0]
         
-        # Get the asset at that index
-        assets = get_asset_list(self.base_dir)
-        filter_type = self.filter_var.get()
-        if filter_type != "All":
-            assets = [a for a in assets if a.get("type") == filter_type]
-        
-        if index < len(assets):
-            self.display_asset_details(assets[index])
+        # The listbox rows line up with visible_assets; the full record is loaded only now
+        if index < len(self.visible_assets):
+            asset = self.asset_index.get(self.visible_assets[index]["id"])
+            if asset:
+                self.display_asset_details(asset)
     
     def display_asset_details(self, asset):
         """Display details of the selected asset"""
@@ -726,6 +774,9 @@ The exported files can be imported directly into your C/assembly code."""
         # Get asset directory
         asset_dir = os.path.join(self.base_dir, "assets", self.current_asset["id"])
         
+        # Forget the metadata first so no queued save lands in the deleted directory
+        delete_asset_metadata(self.base_dir, self.current_asset["id"])
+        
         # Delete directory if it exists
         if os.path.exists(asset_dir):
             import shutil
@@ -754,12 +805,7 @@ The exported files can be imported directly into your C/assembly code."""
     #---------------------------
     def update_editor_asset_list(self, event=None):
         """Update the asset list in the editor tab"""
-        assets = get_asset_list(self.base_dir)
-        
-        # Apply filter if needed
-        filter_type = self.editor_filter_var.get()
-        if filter_type != "All":
-            assets = [a for a in assets if a.get("type") == filter_type]
+        assets = self.asset_index.list(self.editor_filter_var.get())
         
         # Clear and update the combobox
         self.editor_asset_combo["values"] = [f"{a['name']} ({a['type']})" for a in assets]
@@ -783,8 +829,12 @@ The exported files can be imported directly into your C/assembly code."""
             messagebox.showinfo("Info", "Please select an asset to edit")
             return
         
-        # Get the asset data
-        self.current_editing_asset = self.editor_asset_map[selected]
+        # Get the asset data (the map holds summaries; load the full record)
+        asset = self.asset_index.get(self.editor_asset_map[selected]["id"])
+        if not asset:
+            messagebox.showerror("Error", f"Could not load asset: {selected}")
+            return
+        self.current_editing_asset = asset
         
         # Update status
         self.status_var.set(f"Editing asset: {self.current_editing_asset['name']}")
@@ -802,7 +852,7 @@ The exported files can be imported directly into your C/assembly code."""
         """Generate a display name for a sprite"""
         anim_type = sprite.get("animation_type", "idle")
         direction = sprite.get("direction", "")
-        frame = sprite.get("frame", 0)
+        frame = sprite.get("frame_number", 0)
         
         # Create a descriptive name
         if direction:
@@ -829,7 +879,7 @@ The exported files can be imported directly into your C/assembly code."""
         # Update the sprite details
         self.sprite_anim_var.set(sprite.get("animation_type", ""))
         self.sprite_dir_var.set(sprite.get("direction", ""))
-        self.sprite_frame_var.set(sprite.get("frame", 0))
+        self.sprite_frame_var.set(sprite.get("frame_number", 0))
         
         # Display the sprite preview
         self.display_sprite_preview(sprite)
@@ -845,11 +895,9 @@ The exported files can be imported directly into your C/assembly code."""
             return
         
         try:
-            # Load the image and scale it up for better visibility
-            image = Image.open(sprite_path)
+            # Scale the image up for better visibility, decoding only on a cache miss
             scale_factor = 3  # NES sprites are tiny, scale up for visibility
-            width, height = image.size
-            image = image.resize((width * scale_factor, height * scale_factor), Image.NEAREST)
+            image = self.thumbnails.thumbnail(sprite_path, scale=scale_factor)
             
             # Convert to Tkinter-compatible format
             photo = ImageTk.PhotoImage(image)
@@ -884,8 +932,20 @@ The exported files can be imported directly into your C/assembly code."""
             sprite_dir = os.path.join(asset_dir, "sprites")
             os.makedirs(sprite_dir, exist_ok=True)
             
+            # Frames imported before (same sheet, rectangle and pixels) are skipped, not duplicated
+            known_ids = {sprite.get("id") for sprite in self.current_editing_asset.get("sprites", [])}
+            sheet_name = os.path.basename(metadata.get("source_sheet", ""))
+            added = 0
+            
             # Process each frame
             for i, frame in enumerate(frames):
+                sprite_id = stable_id("sprite", self.current_editing_asset["id"], sheet_name,
+                                      list(frame.rect), image_content_hash(frame.image))
+                if sprite_id in known_ids:
+                    continue
+                known_ids.add(sprite_id)
+                added += 1
+                
                 # Determine frame metadata
                 frame_num = len(self.current_editing_asset.get("sprites", []))
                 anim_type = "idle"  # Default animation type
@@ -898,14 +958,14 @@ The exported files can be imported directly into your C/assembly code."""
                 
                 # Create sprite data
                 sprite_data = {
-                    "id": str(uuid.uuid4()),
+                    "id": sprite_id,
                     "file_path": file_path,
                     "animation_type": anim_type,
                     "direction": direction,
-                    "frame": frame_num,
+                    "frame_number": frame_num,
                     "source_sheet": metadata.get("source_sheet", ""),
                     "rect": frame.rect,
-                    "created": datetime.datetime.now().isoformat()
+                    "created_at": datetime.datetime.now().isoformat()
                 }
                 
                 # Add to asset
@@ -922,7 +982,9 @@ The exported files can be imported directly into your C/assembly code."""
             save_asset(self.base_dir, self.current_editing_asset)
             
             # Update status
-            self.status_var.set(f"Added {len(frames)} sprites from sheet")
+            skipped = len(frames) - added
+            self.status_var.set(f"Added {added} sprites from sheet"
+                                + (f" ({skipped} already imported)" if skipped else ""))
         
         # Open the sprite sheet editor
         SpriteSheetEditor(self.root, on_frames_selected)
@@ -950,17 +1012,23 @@ The exported files can be imported directly into your C/assembly code."""
         sprite_dir = os.path.join(asset_dir, "sprites")
         os.makedirs(sprite_dir, exist_ok=True)
         
-        # Get current sprite count
-        start_frame = len(self.current_editing_asset.get("sprites", []))
+        # Files imported before (same name and content) are skipped, not duplicated
+        known_ids = {sprite.get("id") for sprite in self.current_editing_asset.get("sprites", [])}
+        added = 0
         
         # Process each file
         for i, src_path in enumerate(file_paths):
             try:
+                sprite_id = stable_id("sprite", self.current_editing_asset["id"], os.path.basename(src_path),
+                                      file_content_hash(src_path))
+                if sprite_id in known_ids:
+                    continue
+                
                 # Load the image
                 img = Image.open(src_path)
                 
                 # Determine frame metadata
-                frame_num = start_frame + i
+                frame_num = len(self.current_editing_asset.get("sprites", []))
                 anim_type = "idle"  # Default animation type
                 direction = ""      # Default direction (none)
                 
@@ -971,13 +1039,13 @@ The exported files can be imported directly into your C/assembly code."""
                 
                 # Create sprite data
                 sprite_data = {
-                    "id": str(uuid.uuid4()),
+                    "id": sprite_id,
                     "file_path": dst_path,
                     "animation_type": anim_type,
                     "direction": direction,
-                    "frame": frame_num,
+                    "frame_number": frame_num,
                     "source_file": src_path,
-                    "created": datetime.datetime.now().isoformat()
+                    "created_at": datetime.datetime.now().isoformat()
                 }
                 
                 # Add to asset
@@ -985,6 +1053,8 @@ The exported files can be imported directly into your C/assembly code."""
                     self.current_editing_asset["sprites"] = []
                 
                 self.current_editing_asset["sprites"].append(sprite_data)
+                known_ids.add(sprite_id)
+                added += 1
                 
                 # Add to listbox
                 sprite_name = self.get_sprite_display_name(sprite_data)
@@ -997,7 +1067,9 @@ The exported files can be imported directly into your C/assembly code."""
         save_asset(self.base_dir, self.current_editing_asset)
         
         # Update status
-        self.status_var.set(f"Added {len(file_paths)} sprites from files")
+        skipped = len(file_paths) - added
+        self.status_var.set(f"Added {added} sprites from files"
+                            + (f" ({skipped} already imported or failed)" if skipped else ""))
     
     def remove_selected_sprite(self):
         """Remove the selected sprite"""
@@ -1070,7 +1142,7 @@ The exported files can be imported directly into your C/assembly code."""
         # Update the sprite details
         self.sprite_anim_var.set(sprite.get("animation_type", ""))
         self.sprite_dir_var.set(sprite.get("direction", ""))
-        self.sprite_frame_var.set(sprite.get("frame", 0))
+        self.sprite_frame_var.set(sprite.get("frame_number", 0))
         
         # Display the sprite preview
         self.display_sprite_preview(sprite)
@@ -1098,8 +1170,8 @@ The exported files can be imported directly into your C/assembly code."""
         # Get updated values
         sprite["animation_type"] = self.sprite_anim_var.get()
         sprite["direction"] = self.sprite_dir_var.get()
-        sprite["frame"] = self.sprite_frame_var.get()
-        sprite["updated"] = datetime.datetime.now().isoformat()
+        sprite["frame_number"] = self.sprite_frame_var.get()
+        sprite["updated_at"] = datetime.datetime.now().isoformat()
         
         # Update the list
         sprites[index] = sprite
@@ -1144,27 +1216,15 @@ The exported files can be imported directly into your C/assembly code."""
         # Get sprites list
         sprites = self.current_editing_asset.get("sprites", [])
         
-        # Create sprite references for the animation
-        sprite_refs = []
-        for idx in selected_indices:
-            if idx < len(sprites):
-                sprite = sprites[idx]
-                sprite_refs.append({
-                    "sprite_id": sprite["id"],
-                    "frame_index": sprite.get("frame", 0)
-                })
-        
-        # Create animation data
-        animation = {
-            "id": str(uuid.uuid4()),
-            "name": name,
-            "animation_type": anim_type,
-            "direction": self.sprite_dir_var.get(),  # Use current direction selection
-            "fps": 6,  # Default FPS for NES-style animations
-            "frames": sprite_refs,
-            "loop": True,
-            "created": datetime.datetime.now().isoformat()
-        }
+        # Animation frames are the selected sprites' ids, in order
+        sprite_refs = [sprites[idx]["id"] for idx in selected_indices if idx < len(sprites)]
+        
+        # Create animation data (the default 10 NES frames per sprite is 6 FPS)
+        animation = create_animation_definition(
+            self.current_editing_asset["id"], name, anim_type,
+            self.sprite_dir_var.get()  # Use current direction selection
+        )
+        animation["frames"] = sprite_refs
         
         # Add to asset
         if "animations" not in self.current_editing_asset:
@@ -1209,13 +1269,10 @@ The exported files can be imported directly into your C/assembly code."""
         animations_created = 0
         for (anim_type, direction), group_sprites in sprite_groups.items():
             # Sort by frame number
-            group_sprites.sort(key=lambda s: s.get("frame", 0))
+            group_sprites.sort(key=lambda s: s.get("frame_number", 0))
             
-            # Create sprite references
-            sprite_refs = [{
-                "sprite_id": s["id"],
-                "frame_index": s.get("frame", 0)
-            } for s in group_sprites]
+            # Animation frames are sprite ids, in frame order
+            sprite_refs = [s["id"] for s in group_sprites]
             
             # Generate name
             if direction:
@@ -1223,23 +1280,17 @@ The exported files can be imported directly into your C/assembly code."""
             else:
                 name = anim_type
             
-            # Create animation data
-            animation = {
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "animation_type": anim_type,
-                "direction": direction,
-                "fps": 6,  # Default FPS for NES-style animations
-                "frames": sprite_refs,
-                "loop": True,
-                "created": datetime.datetime.now().isoformat()
-            }
+            # Create animation data; the id is derived from the group, so regenerating replaces it
+            animation = create_animation_definition(
+                self.current_editing_asset["id"], name, anim_type, direction, deterministic=True
+            )
+            animation["frames"] = sprite_refs
             
             # Add to asset
             if "animations" not in self.current_editing_asset:
                 self.current_editing_asset["animations"] = []
             
-            self.current_editing_asset["animations"].append(animation)
+            upsert_by_id(self.current_editing_asset["animations"], animation)
             animations_created += 1
         
         # Save the asset
@@ -1273,58 +1324,90 @@ The exported files can be imported directly into your C/assembly code."""
         self.log_export_message("Starting export...")        
         
         # Determine which assets to export
-        if self.export_selection.get() == "selected":
+        export_selected = self.export_selection.get() == "selected"
+        if export_selected:
             if not self.current_asset:
                 messagebox.showinfo("Info", "No asset selected for export")
                 return
             assets_to_export = [self.current_asset]
         else:  # "all"
-            assets_to_export = get_asset_list(self.base_dir)
+            # Summaries and versions are enough to skip unchanged assets; the
+            # export workers read full records only for the ones that changed
+            self.asset_index.refresh()
+            assets_to_export = [
+                (summary, self.asset_index.version(summary["id"])) for summary in self.asset_index.list()
+            ]
         
         self.log_export_message(f"Exporting {len(assets_to_export)} assets to: {export_path}")
         
+        # The export thread works on a snapshot, so edits made meanwhile can't race it
+        if export_selected:
+            assets_to_export = copy.deepcopy(assets_to_export)
+        
         # Create category directories if organizing by type
         if self.organize_by_type.get():
             for asset_type in ASSET_TYPES.keys():
                 os.makedirs(os.path.join(export_path, asset_type.lower()), exist_ok=True)
         
-        # Import the export function from core module
-        try:
-            from asset_wizard_core import export_asset_for_game
-        except ImportError as e:
-            self.log_export_message(f"Error importing export function: {e}")
-            return
+        # Export on a worker pool off the Tk thread; unchanged assets are skipped
+        engine = ExportEngine(
+            self.base_dir, export_path,
+            organize_by_type=self.organize_by_type.get(),
+            include_sprites=self.include_sprites.get(),
+            link_mode=self.link_mode.get(),
+            binary=self.export_binary.get()
+        )
+        self.export_events = queue.Queue()
         
-        # Export each asset
-        for asset in assets_to_export:
+        def progress(done, total, asset, status, detail):
+            if status == SKIPPED:
+                return
+            if status == FAILED:
+                self.export_events.put(f"Error exporting {asset['name']}: {detail}")
+            else:
+                self.export_events.put(f"[{done}/{total}] {status.capitalize()}: {os.path.basename(detail)}")
+        
+        def run():
             try:
-                # Determine asset-specific export directory
-                if self.organize_by_type.get():
-                    asset_export_dir = os.path.join(export_path, asset["type"].lower())
+                if export_selected:
+                    counts = engine.export(assets_to_export, progress)
                 else:
-                    asset_export_dir = export_path
-                
-                # Export the asset
-                asset_name = asset["name"]
-                self.log_export_message(f"Exporting {asset_name}...")
-                
-                # Export JSON with or without sprite files
-                result_path = export_asset_for_game(self.base_dir, asset, asset_export_dir)
-                
-                # If not including sprites, clean up sprite directory
-                if not self.include_sprites.get():
-                    sprites_dir = os.path.join(asset_export_dir, f"{asset_name.lower().replace(' ', '_')}_sprites")
-                    if os.path.exists(sprites_dir):
-                        import shutil
-                        shutil.rmtree(sprites_dir)
-                
-                self.log_export_message(f"Successfully exported: {os.path.basename(result_path)}")
-            
+                    counts = engine.export_summaries(assets_to_export, progress)
+                self.export_events.put(counts)
             except Exception as e:
-                self.log_export_message(f"Error exporting {asset['name']}: {e}")
+                self.export_events.put(f"Export failed: {e}")
+                self.export_events.put(None)
         
-        self.log_export_message("Export completed!")
-        messagebox.showinfo("Export Complete", f"Successfully exported assets to {export_path}")
+        self.export_button.configure(state=tk.DISABLED)
+        self.export_thread = threading.Thread(target=run, daemon=True)
+        self.export_thread.start()
+        self.root.after(100, self.poll_export, export_path)
+    
+    def poll_export(self, export_path):
+        """Show progress from the background export, and the summary once it's done"""
+        while True:
+            try:
+                event = self.export_events.get_nowait()
+            except queue.Empty:
+                self.root.after(100, self.poll_export, export_path)
+                return
+            
+            if isinstance(event, str):
+                self.log_export_message(event)
+                continue
+            
+            # A counts dict (or None after a crash) marks the end of the export
+            self.export_button.configure(state=tk.NORMAL)
+            if event is None:
+                messagebox.showerror("Export Failed", "The export stopped early; see the export log")
+                return
+            
+            self.log_export_message(
+                f"Export completed in {event['seconds']:.2f}s: {event['exported']} exported, "
+                f"{event['skipped']} unchanged, {event['failed']} failed"
+            )
+            messagebox.showinfo("Export Complete", f"Successfully exported assets to {export_path}")
+            return
     
     def log_export_message(self, message):
         """Add a message to the export log"""
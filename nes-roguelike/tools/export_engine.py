@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Incremental Asset Export Engine
+-------------------------------
+Exports asset wizard assets in parallel, skipping the ones that haven't
+changed since the last export to the same directory.
+
+A whole library is checked from the asset index alone: each asset's digest
+covers its summary, the version of its stored metadata (manifest generation
+or metadata.json mtime) and the export options, so no record is read and no
+sprite file is stat'ed to find the unchanged ones. Only changed assets have
+their full record loaded, by the worker that exports them. Sprite files
+edited in place without saving the asset are picked up with --force.
+
+Digests are kept in a state file in the export directory; an asset whose
+digest matches and whose exported JSON (and .inc, for binary exports) is
+still there is skipped without touching the disk. The rest are exported on
+a thread pool, and a progress callback reports each asset as it finishes.
+
+Requirements:
+- Python 3.6+
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asset_wizard_core import export_asset_for_game, get_asset_index, read_asset_record
+from metadata_writer import write_json_atomic
+from sprite_export import LINK_MODES
+from game_binary_export import export_asset_binary
+
+# State file kept in the root of every export directory
+EXPORT_STATE_FILENAME = ".export_state.json"
+
+# Per-asset export results reported to progress callbacks
+EXPORTED = "exported"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+def asset_digest(asset_data, options=()):
+    """Return a digest of an asset's metadata, export options and sprite files
+
+    Sprite files are identified by path, size and mtime rather than read, so
+    computing the digest costs one stat per sprite.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(asset_data, sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps(list(options)).encode("utf-8"))
+
+    for sprite in asset_data.get("sprites", []):
+        file_path = sprite.get("file_path", "")
+        try:
+            stat = os.stat(file_path)
+            digest.update(f"\0{file_path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            digest.update(f"\0{file_path}\0missing".encode("utf-8"))
+
+    return digest.hexdigest()
+
+def summary_digest(summary, version, options=()):
+    """Return a digest of an asset's index summary, stored metadata version and export options
+
+    Costs no file access; see AssetIndex.version for what version is.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps(summary, sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps([version] + list(options)).encode("utf-8"))
+    return digest.hexdigest()
+
+class ExportEngine:
+    """Parallel, incremental exporter for asset wizard assets"""
+
+    def __init__(self, base_dir, export_dir, organize_by_type=True, include_sprites=True, workers=None,
+                 link_mode="copy", binary=False):
+        self.base_dir = base_dir
+        self.export_dir = export_dir
+        self.organize_by_type = organize_by_type
+        self.include_sprites = include_sprites
+        self.link_mode = link_mode
+        self.binary = binary
+        self.workers = workers
+        self.state_file = os.path.join(export_dir, EXPORT_STATE_FILENAME)
+
+    def options(self):
+        """Export options that change the output, folded into every digest"""
+        return ("sprites" if self.include_sprites else "json", self.link_mode, self.binary)
+
+    def asset_export_dir(self, asset_data):
+        """Return the directory an asset is exported into"""
+        if self.organize_by_type:
+            return os.path.join(self.export_dir, asset_data["type"].lower())
+        return self.export_dir
+
+    def load_state(self):
+        """Return {asset id: {"digest", "json_file", "inc_file"}} from the last export"""
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state):
+        """Write the export state atomically"""
+        os.makedirs(self.export_dir, exist_ok=True)
+        write_json_atomic(self.state_file, state, indent=None)
+
+    def export_one(self, asset_data):
+        """Export one asset and return the paths of its JSON file and .inc (None without binary)"""
+        export_dir = self.asset_export_dir(asset_data)
+        json_file = export_asset_for_game(
+            self.base_dir, asset_data, export_dir,
+            include_sprites=self.include_sprites, link_mode=self.link_mode
+        )
+        inc_file = None
+        if self.binary:
+            inc_file = export_asset_binary(asset_data, export_dir)
+        return json_file, inc_file
+
+    def export_summary(self, summary):
+        """Read an asset's full record and export it; see export_one"""
+        asset_data = read_asset_record(self.base_dir, summary["id"])
+        if asset_data is None:
+            raise ValueError(f"Could not read metadata for asset {summary['id']}")
+        return self.export_one(asset_data)
+
+    def outputs_exist(self, previous):
+        """Return True if every file recorded for an asset's last export is still there"""
+        if not os.path.exists(previous.get("json_file") or ""):
+            return False
+        return not self.binary or os.path.exists(previous.get("inc_file") or "")
+
+    def export(self, assets, progress=None, force=False):
+        """Export full asset records, skipping unchanged ones unless force is set
+
+        Records are digested by content, so unsaved edits are exported too.
+        progress(done, total, asset, status, detail) is called from the
+        calling thread as each asset finishes; status is EXPORTED, SKIPPED or
+        FAILED and detail is the JSON path or the error. Returns a dict of
+        counts per status plus "seconds".
+        """
+        options = self.options()
+        items = [
+            (asset_data, asset_digest(asset_data, options + (self.asset_export_dir(asset_data),)))
+            for asset_data in assets
+        ]
+        return self._export(items, self.export_one, progress, force)
+
+    def export_summaries(self, summaries, progress=None, force=False):
+        """Export assets given as (summary, version) pairs from an AssetIndex
+
+        Unchanged assets are skipped on their summary and version alone; only
+        the others have their full record read, on the worker that exports
+        them. progress and the result are as for export(), with summaries in
+        place of full records.
+        """
+        options = self.options()
+        items = [
+            (summary, summary_digest(summary, version, options + (self.asset_export_dir(summary),)))
+            for summary, version in summaries
+        ]
+        return self._export(items, self.export_summary, progress, force)
+
+    def _export(self, items, export_item, progress, force):
+        """Skip or export (asset, digest) items, running export_item on the thread pool"""
+        start = time.perf_counter()
+        state = self.load_state()
+        total = len(items)
+        counts = {EXPORTED: 0, SKIPPED: 0, FAILED: 0}
+        done = 0
+
+        def report(asset_data, status, detail):
+            counts[status] += 1
+            if progress:
+                progress(done, total, asset_data, status, detail)
+
+        # Unchanged assets never reach the pool
+        pending = []
+        for asset_data, digest in items:
+            previous = state.get(asset_data["id"])
+            if not force and previous and previous.get("digest") == digest and self.outputs_exist(previous):
+                done += 1
+                report(asset_data, SKIPPED, previous["json_file"])
+            else:
+                pending.append((asset_data, digest))
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(export_item, asset_data): (asset_data, digest)
+                    for asset_data, digest in pending
+                }
+                for future in as_completed(futures):
+                    asset_data, digest = futures[future]
+                    done += 1
+                    try:
+                        json_file, inc_file = future.result()
+                    except Exception as e:
+                        state.pop(asset_data["id"], None)
+                        report(asset_data, FAILED, str(e))
+                        continue
+                    state[asset_data["id"]] = {"digest": digest, "json_file": json_file, "inc_file": inc_file}
+                    report(asset_data, EXPORTED, json_file)
+
+            self.save_state(state)
+
+        counts["seconds"] = time.perf_counter() - start
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Export asset wizard assets, skipping unchanged ones')
+    parser.add_argument('base_dir', help='Asset wizard base directory')
+    parser.add_argument('export_dir', help='Directory to export into')
+    parser.add_argument('--no-sprites', action='store_true', help='Export JSON only, without sprite files')
+    parser.add_argument('--flat', action='store_true', help="Don't organize exports into per-type directories")
+    parser.add_argument('--force', action='store_true', help='Re-export every asset even if unchanged')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='copy',
+                        help='How sprite files are exported: copied, hard linked, reflinked or packed into an atlas')
+    parser.add_argument('--binary', action='store_true',
+                        help='Also write .chr/.bin tables and a ca65 .inc for every asset')
+    parser.add_argument('--workers', type=int, help='Number of export threads (default: Python default)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='List every asset as it finishes')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.base_dir):
+        print(f"Error: Directory {args.base_dir} does not exist")
+        return False
+
+    def progress(done, total, asset_data, status, detail):
+        if args.verbose or status == FAILED:
+            print(f"[{done}/{total}] {status:<8} {asset_data.get('name', asset_data['id'])}: {detail}")
+
+    engine = ExportEngine(args.base_dir, args.export_dir, not args.flat, not args.no_sprites, args.workers,
+                          args.link_mode, args.binary)
+    index = get_asset_index(args.base_dir)
+    summaries = [(summary, index.version(summary["id"])) for summary in index.list()]
+    counts = engine.export_summaries(summaries, progress, args.force)
+
+    print(f"Exported {counts[EXPORTED]}, skipped {counts[SKIPPED]} unchanged, "
+          f"{counts[FAILED]} failed in {counts['seconds']:.2f}s")
+    return counts[FAILED] == 0
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+NES Binary Asset Export
+-----------------------
+Exports an asset wizard asset straight to the binary data the game build
+uses, so ca65 can pull it in with .incbin instead of a JSON conversion step.
+
+For an asset whose export_configs.nes_asm.label_prefix is "hero" this
+writes:
+    hero.chr             2bpp CHR tiles, flip-deduplicated across all frames
+    hero_meta.bin        metasprites: dy, tile, attr, dx records, each
+                         metasprite terminated by $80
+    hero_pal.bin         4 palette bytes (NES color indices)
+    hero_anim.bin        animations: frame count, frame duration, loop flag,
+                         then one metasprite index per frame
+    hero.inc             labels for all of the above, to .include in the build
+
+Sprite images are reduced to 2-bit color indices by brightness (transparent
+pixels are color 0), like the similarity index does.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from arkista_sprite_extractor import TILE_SIZE, encode_chr_data
+from sprite_dedup import dedup_blocks
+from sprite_similarity import index_image
+from metasprite_generator import METASPRITE_END, MAX_PATTERN_TILES, asm_label
+from asset_wizard_core import convert_to_nes_palette
+
+# Animation flag bits in hero_anim.bin
+ANIM_FLAG_LOOP = 0x01
+
+# Animation frames and the frame count are single bytes
+MAX_METASPRITES = 256
+MAX_ANIMATION_FRAMES = 255
+
+def label_prefix(asset_data):
+    """Return the asset's ca65 label prefix from export_configs, or its name"""
+    prefix = asset_data.get("export_configs", {}).get("nes_asm", {}).get("label_prefix")
+    return asm_label(prefix or asset_data.get("name", "asset").lower().replace(" ", "_"))
+
+def sprite_tile_blocks(image_path):
+    """Return [(dy, dx, 8x8 index block)] for every non-empty tile of a sprite image"""
+    with Image.open(image_path) as img:
+        index = index_image(img)
+
+    # Pad to whole tiles; color 0 is transparent so padding costs nothing
+    height = -(-index.shape[0] // TILE_SIZE) * TILE_SIZE
+    width = -(-index.shape[1] // TILE_SIZE) * TILE_SIZE
+    padded = np.zeros((height, width), dtype=np.uint8)
+    padded[:index.shape[0], :index.shape[1]] = index
+
+    blocks = []
+    for y in range(0, height, TILE_SIZE):
+        for x in range(0, width, TILE_SIZE):
+            block = padded[y:y + TILE_SIZE, x:x + TILE_SIZE]
+            if np.any(block):
+                blocks.append((y, x, block))
+    return blocks
+
+def palette_bytes(asset_data):
+    """Return the asset's 4-color palette as NES color index bytes"""
+    colors = []
+    for color in list(asset_data.get("palette", []))[:4]:
+        if isinstance(color, (list, tuple)):
+            color = convert_to_nes_palette(color)
+        colors.append(int(color) & 0x3F)
+    colors += [0x0F] * (4 - len(colors))
+    return bytes(colors)
+
+def build_binary_asset(asset_data, palette_index=0):
+    """Build the binary tables for an asset
+
+    Returns a dict with "tiles" (M, 8, 8 array), "sprites" (exported sprite
+    names in metasprite order), "metasprites" (bytes), "metasprite_offsets",
+    "palette" (bytes), "animations" (bytes), "animation_offsets" and
+    "animation_names".
+
+    Raises ValueError if the tiles don't fit in one pattern table or the
+    sprites or animation frames can't be indexed with a byte.
+    """
+    sprite_names = []
+    sprite_index = {}
+    placements = []
+    blocks = []
+
+    for sprite in asset_data.get("sprites", []):
+        file_path = sprite.get("file_path")
+        if not file_path or not os.path.exists(file_path):
+            print(f"Warning: Missing sprite file for {sprite.get('name', sprite.get('id', ''))}")
+            continue
+        number = len(sprite_names)
+        sprite_index[sprite.get("id")] = number
+        sprite_names.append(sprite.get("name") or sprite.get("id", f"sprite_{number}"))
+        for dy, dx, block in sprite_tile_blocks(file_path):
+            placements.append((number, dy, dx))
+            blocks.append(block)
+
+    unique, refs = dedup_blocks(blocks)
+    if len(unique) > MAX_PATTERN_TILES:
+        raise ValueError(f"{len(unique)} unique tiles don't fit in the {MAX_PATTERN_TILES}-tile pattern table")
+    if len(sprite_names) > MAX_METASPRITES:
+        raise ValueError(f"{len(sprite_names)} sprites can't be indexed by animations (at most {MAX_METASPRITES})")
+
+    records = [[] for _ in sprite_names]
+    for (number, dy, dx), (tile, flip) in zip(placements, refs):
+        records[number].append((dy, tile, flip | palette_index, dx))
+
+    metasprites = bytearray()
+    metasprite_offsets = []
+    for sprite_records in records:
+        metasprite_offsets.append(len(metasprites))
+        for dy, tile, attr, dx in sprite_records:
+            metasprites += bytes([dy & 0xFF, tile, attr, dx & 0xFF])
+        metasprites.append(METASPRITE_END)
+
+    animations = bytearray()
+    animation_offsets = []
+    animation_names = []
+    for anim in asset_data.get("animations", []):
+        frames = []
+        for frame_ref in anim.get("frames", []):
+            # Frames are stored either as sprite ids or {"sprite_id": ...} references
+            sprite_id = frame_ref.get("sprite_id") if isinstance(frame_ref, dict) else frame_ref
+            if sprite_id in sprite_index:
+                frames.append(sprite_index[sprite_id])
+            else:
+                print(f"Warning: Missing sprite {sprite_id} in animation {anim.get('name', '')}")
+        if not frames:
+            continue
+        if len(frames) > MAX_ANIMATION_FRAMES:
+            raise ValueError(f"Animation {anim.get('name', '')} has {len(frames)} frames "
+                             f"(at most {MAX_ANIMATION_FRAMES})")
+
+        animation_offsets.append(len(animations))
+        animation_names.append(anim.get("name") or anim.get("id", ""))
+        flags = ANIM_FLAG_LOOP if anim.get("loop", True) else 0
+        animations += bytes([len(frames), int(anim.get("frame_duration", 10)) & 0xFF, flags])
+        animations += bytes(frames)
+
+    if unique:
+        tiles = np.stack(unique)
+    else:
+        tiles = np.zeros((0, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+
+    return {
+        "tiles": tiles,
+        "sprites": sprite_names,
+        "metasprites": bytes(metasprites),
+        "metasprite_offsets": metasprite_offsets,
+        "palette": palette_bytes(asset_data),
+        "animations": bytes(animations),
+        "animation_offsets": animation_offsets,
+        "animation_names": animation_names
+    }
+
+def unique_labels(names, prefix):
+    """Turn names into ca65 labels, numbering repeats so every label is distinct"""
+    labels = []
+    seen = set()
+    for name in names:
+        label = asm_label(name, prefix)
+        candidate, number = label, 2
+        while candidate in seen:
+            candidate = f"{label}_{number}"
+            number += 1
+        seen.add(candidate)
+        labels.append(candidate)
+    return labels
+
+def format_binary_inc(prefix, files, tables):
+    """Generate the ca65 .inc that pulls the binary files in and labels their contents"""
+    lines = [
+        "; Generated by game_binary_export.py - do not edit by hand",
+        f"; Metasprite records: dy, tile, attr, dx, terminated by ${METASPRITE_END:02X}",
+        "; Animations: frame count, frame duration, flags (bit 0 = loop), metasprite indices",
+        "",
+        f"{prefix}_TILE_COUNT = {len(tables['tiles'])}",
+        f"{prefix}_SPRITE_COUNT = {len(tables['sprites'])}",
+        f"{prefix}_ANIM_COUNT = {len(tables['animation_names'])}",
+        "",
+        '.segment "RODATA"',
+        "",
+        f"{prefix}_metasprites:",
+        f'  .incbin "{files["metasprites"]}"',
+        ""
+    ]
+
+    sprite_labels = unique_labels(tables["sprites"], prefix + "_")
+    for label, offset in zip(sprite_labels, tables["metasprite_offsets"]):
+        lines.append(f"{label} = {prefix}_metasprites + {offset}")
+
+    # Pointer table so animation frame indices can be turned into metasprite addresses
+    lines.append("")
+    lines.append(f"{prefix}_metasprite_ptrs:")
+    for label in sprite_labels:
+        lines.append(f"  .addr {label}")
+
+    if "palette" in files:
+        lines += ["", f"{prefix}_palette:", f'  .incbin "{files["palette"]}"']
+
+    lines += ["", f"{prefix}_animations:", f'  .incbin "{files["animations"]}"']
+    anim_labels = unique_labels(tables["animation_names"], prefix + "_anim_")
+    for label, offset in zip(anim_labels, tables["animation_offsets"]):
+        lines.append(f"{label} = {prefix}_animations + {offset}")
+
+    lines += ["", '.segment "CHARS"', f"{prefix}_chr:", f'  .incbin "{files["chr"]}"', ""]
+    return "\n".join(lines)
+
+def export_asset_binary(asset_data, export_dir, palette_index=0):
+    """Write an asset's CHR, metasprite, palette and animation binaries plus its .inc
+
+    Returns the path of the .inc file. Raises ValueError, before anything is
+    written, if the asset doesn't fit the byte-sized tables.
+    """
+    prefix = label_prefix(asset_data)
+    tables = build_binary_asset(asset_data, palette_index)
+
+    files = {
+        "chr": f"{prefix}.chr",
+        "metasprites": f"{prefix}_meta.bin",
+        "animations": f"{prefix}_anim.bin"
+    }
+    if asset_data.get("export_configs", {}).get("nes_asm", {}).get("include_palette", True):
+        files["palette"] = f"{prefix}_pal.bin"
+
+    os.makedirs(export_dir, exist_ok=True)
+    contents = {
+        "chr": encode_chr_data(tables["tiles"]),
+        "metasprites": tables["metasprites"],
+        "palette": tables["palette"],
+        "animations": tables["animations"]
+    }
+    for key, file_name in files.items():
+        with open(os.path.join(export_dir, file_name), 'wb') as f:
+            f.write(contents[key])
+
+    inc_path = os.path.join(export_dir, f"{prefix}.inc")
+    with open(inc_path, 'w') as f:
+        f.write(format_binary_inc(prefix, files, tables))
+    return inc_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an asset wizard asset as NES binary data and a ca65 .inc')
+    parser.add_argument('metadata', help="Asset's metadata.json")
+    parser.add_argument('--output', '-o', default='.', help='Output directory')
+    parser.add_argument('--palette', type=int, default=0, choices=range(4),
+                        help='Sprite palette (0-3) written into the attribute byte')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.metadata):
+        print(f"Error: Metadata file {args.metadata} does not exist")
+        return False
+
+    with open(args.metadata, 'r') as f:
+        asset_data = json.load(f)
+
+    try:
+        inc_path = export_asset_binary(asset_data, args.output, args.palette)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+    print(f"Saved binary export to {inc_path}")
+    return True
+
+if __name__ == '__main__':
+    main()
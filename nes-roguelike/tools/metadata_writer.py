@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Write-Behind Metadata Writer
+----------------------------
+Coalesces JSON metadata saves from the sprite tools into one atomic write
+per file.
+
+write_json() snapshots the data and queues it by path; a background thread
+writes it out once the coalescing window (half a second by default) has
+passed since the first queued save. Saving the same file again within the
+window just replaces the queued data, so a burst of field edits or a bulk
+tag pass costs one write per file rather than one per change.
+
+Every write goes to a temporary file in the same directory, is fsynced and
+then renamed over the target, so a crash never leaves a half-written
+metadata file. Pending writes are flushed when the interpreter exits, and
+readers can flush() a path first to see their own writes.
+
+Requirements:
+- Python 3.6+
+"""
+
+import os
+import copy
+import json
+import time
+import atexit
+import tempfile
+import argparse
+import threading
+
+# Default coalescing window in seconds
+DEFAULT_DELAY = 0.5
+
+def write_json_atomic(path, data, indent=2):
+    """Write data as JSON to path via a temporary file and rename
+
+    With indent=None the JSON is written without any whitespace.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    separators = (",", ":") if indent is None else None
+    fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent, separators=separators)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # mkstemp creates the file owner-only; keep the target's permissions
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def _under(path, prefix):
+    """True if path is prefix or inside the directory prefix"""
+    return path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep)
+
+class MetadataWriter:
+    """Background writer that coalesces JSON saves by path"""
+
+    def __init__(self, delay=DEFAULT_DELAY):
+        self.delay = delay
+        self.pending = {}         # abspath -> (due time, data, indent)
+        self.condition = threading.Condition()
+        self.io_lock = threading.Lock()   # held while jobs are taken and written, so writes stay in order
+        self.thread = None
+        self.requests = 0
+        self.writes = 0
+
+    def write(self, path, data, indent=2):
+        """Queue data to be written to path, replacing any save still pending for it"""
+        snapshot = copy.deepcopy(data)
+        path = os.path.abspath(path)
+        with self.condition:
+            # The window runs from the first pending save, so constant edits still get written
+            due = self.pending[path][0] if path in self.pending else time.monotonic() + self.delay
+            self.pending[path] = (due, snapshot, indent)
+            self.requests += 1
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="metadata-writer", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _take(self, select):
+        """Remove and return the pending jobs whose paths satisfy select"""
+        with self.condition:
+            paths = [path for path in self.pending if select(path)]
+            return [(path, self.pending.pop(path)) for path in paths]
+
+    def _write_jobs(self, jobs):
+        for path, (_, data, indent) in jobs:
+            try:
+                write_json_atomic(path, data, indent)
+                self.writes += 1
+            except Exception as e:
+                print(f"Error writing metadata to {path}: {e}")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                wait = min(due for due, _, _ in self.pending.values()) - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+
+            with self.io_lock:
+                now = time.monotonic()
+                self._write_jobs(self._take(lambda path: self.pending[path][0] <= now))
+
+    def flush(self, path=None):
+        """Write pending saves now: all of them, or those for path (or under it, for a directory)"""
+        with self.io_lock:
+            if path is None:
+                jobs = self._take(lambda pending_path: True)
+            else:
+                prefix = os.path.abspath(path)
+                jobs = self._take(lambda pending_path: _under(pending_path, prefix))
+            self._write_jobs(jobs)
+        return len(jobs)
+
+    def discard(self, path):
+        """Drop pending saves for path or anything under it, e.g. before deleting a directory"""
+        prefix = os.path.abspath(path)
+        with self.io_lock:
+            return len(self._take(lambda pending_path: _under(pending_path, prefix)))
+
+    def is_pending(self, path):
+        """True if a save for path hasn't been written yet"""
+        with self.condition:
+            return os.path.abspath(path) in self.pending
+
+# Shared writer used by the sprite tools
+_writer = MetadataWriter()
+atexit.register(_writer.flush)
+
+def get_writer():
+    """Return the shared MetadataWriter"""
+    return _writer
+
+def write_json(path, data, indent=2):
+    """Queue a coalesced, atomic JSON write on the shared writer"""
+    _writer.write(path, data, indent)
+
+def flush(path=None):
+    """Write pending saves on the shared writer now (see MetadataWriter.flush)"""
+    return _writer.flush(path)
+
+def discard(path):
+    """Drop pending saves on the shared writer (see MetadataWriter.discard)"""
+    return _writer.discard(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark coalesced metadata writes against direct writes')
+    parser.add_argument('directory', help='Scratch directory to write test files into')
+    parser.add_argument('--files', type=int, default=100, help='Number of metadata files')
+    parser.add_argument('--edits', type=int, default=10, help='Saves per file')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return False
+
+    paths = [os.path.join(args.directory, f"bench_{i}.json") for i in range(args.files)]
+
+    start = time.perf_counter()
+    for edit in range(args.edits):
+        for path in paths:
+            with open(path, 'w') as f:
+                json.dump({"edit": edit}, f, indent=2)
+    direct = time.perf_counter() - start
+
+    writer = MetadataWriter()
+    start = time.perf_counter()
+    for edit in range(args.edits):
+        for path in paths:
+            writer.write(path, {"edit": edit})
+    writer.flush()
+    coalesced = time.perf_counter() - start
+
+    for path in paths:
+        os.remove(path)
+
+    print(f"Direct:    {args.files * args.edits} writes in {direct:.3f}s")
+    print(f"Coalesced: {writer.writes} atomic writes for {writer.requests} saves in {coalesced:.3f}s")
+    return True
+
+if __name__ == '__main__':
+    main()
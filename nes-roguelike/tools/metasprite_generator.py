@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Metasprite / OAM Table Generator
+--------------------------------
+Turns composed sprites and their animations into packed metasprite tables
+for ca65, replacing hand-written tile layouts like the ones in
+christine_walker.s and sprite_test.s.
+
+Each metasprite is a list of 4-byte records in OAM byte order:
+    dy, tile, attr, dx
+terminated by a single $80 byte. Tiles are deduplicated across every frame
+(including horizontally/vertically flipped copies, which only cost a flip
+bit in attr), and fully transparent tiles are dropped so they never use an
+OAM slot. The per-frame OAM slot count and worst-case sprites-per-scanline
+are reported so the 64-sprite / 8-per-scanline limits can be budgeted
+offline.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import re
+import json
+import argparse
+import numpy as np
+
+from arkista_sprite_extractor import (
+    TILE_SIZE,
+    MISSING_TILE_INDEX,
+    ARKISTA_SPRITE_METADATA,
+    load_tile_array,
+    encode_chr_data,
+    compose_sprite_arrays
+)
+from sprite_dedup import FLIP_H, dedup_blocks
+
+# NES hardware limits
+MAX_OAM_SPRITES = 64        # Sprites in OAM
+MAX_SPRITES_PER_SCANLINE = 8
+MAX_PATTERN_TILES = 256     # Tiles addressable from one pattern table
+
+# Metasprite table terminator (written in place of dy)
+METASPRITE_END = 0x80
+
+def parse_frame_name(sprite_id):
+    """Split a sprite id like "down_2" into ("down", 2); unnumbered ids are frame 0"""
+    match = re.match(r"^(.*?)_?(\d+)$", sprite_id)
+    if match and match.group(1):
+        return match.group(1), int(match.group(2))
+    return sprite_id, 0
+
+def group_animations(metadata):
+    """Group sprite names into animations by category and frame name
+
+    For example player_down_1 and player_down_2 become the two frames of
+    the "player_down" animation. Returns {animation: [sprite names in order]}.
+    """
+    animations = {}
+    for sprite_name, sprite_info in metadata.items():
+        category = sprite_info.get("category", "")
+        sprite_id = sprite_name
+        if category and sprite_name.startswith(category + "_"):
+            sprite_id = sprite_name[len(category) + 1:]
+
+        anim_name, frame = parse_frame_name(sprite_id)
+        anim_label = f"{category}_{anim_name}" if category else anim_name
+        animations.setdefault(anim_label, []).append((frame, sprite_name))
+
+    return {anim: [name for _, name in sorted(frames)] for anim, frames in animations.items()}
+
+def load_sprite_config(config_path):
+    """Convert a sprite_config.json written by arkista_sprite_extractor into sprite metadata"""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+
+    metadata = {}
+    for sprite_name, sprite_info in config.items():
+        # The category is the directory the sprite was saved under
+        category = os.path.dirname(sprite_info.get("file", "")).replace(os.sep, "/")
+        metadata[sprite_name] = {
+            "base_tile": sprite_info["base_tile"],
+            "size": (sprite_info.get("tile_width", 2), sprite_info.get("tile_height", 2)),
+            "arrangement": sprite_info.get("arrangement", [0, 1, 2, 3]),
+            "category": category
+        }
+
+    return metadata
+
+def build_metasprites(tiles, metadata, palette_index=0, first_tile=0, origin=(0, 0)):
+    """Build metasprite records for every sprite, sharing tiles across frames
+
+    Returns (unique_tiles, metasprites): an (M, 8, 8) array of the tiles that
+    need to be in CHR, and {sprite_name: [(dy, tile, attr, dx), ...]}.
+    Offsets are relative to origin, given as (x, y) pixels into the sprite.
+    Raises ValueError if the tiles don't fit in the pattern table starting
+    at first_tile, or palette_index isn't a sprite palette (0-3).
+    """
+    if palette_index not in range(4):
+        raise ValueError(f"Sprite palette {palette_index} is not in 0-3")
+
+    composed = compose_sprite_arrays(tiles, metadata)
+    origin_x, origin_y = origin
+
+    blocks = []
+    placements = []
+    for sprite_name, pixels in composed.items():
+        height, width = pixels.shape
+        for y in range(0, height, TILE_SIZE):
+            for x in range(0, width, TILE_SIZE):
+                block = pixels[y:y + TILE_SIZE, x:x + TILE_SIZE]
+
+                # Color 0 is transparent for sprites, so empty tiles need no OAM slot
+                if not np.any((block != 0) & (block != MISSING_TILE_INDEX)):
+                    continue
+
+                blocks.append(np.where(block == MISSING_TILE_INDEX, 0, block))
+                placements.append((sprite_name, y - origin_y, x - origin_x))
+
+    unique, refs = dedup_blocks(blocks)
+    if first_tile < 0 or first_tile + len(unique) > MAX_PATTERN_TILES:
+        raise ValueError(f"{len(unique)} tiles starting at {first_tile} don't fit in the "
+                         f"{MAX_PATTERN_TILES}-tile pattern table")
+
+    metasprites = {sprite_name: [] for sprite_name in composed}
+    for (sprite_name, dy, dx), (index, flip) in zip(placements, refs):
+        metasprites[sprite_name].append((dy, first_tile + index, flip | palette_index, dx))
+
+    if unique:
+        unique_tiles = np.stack(unique)
+    else:
+        unique_tiles = np.zeros((0, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+
+    return unique_tiles, metasprites
+
+def mirror_metasprite(records, width_px, origin_x=0):
+    """Mirror a metasprite horizontally by flipping each tile and its x offset
+
+    Offsets are relative to origin_x, the same x origin the records were built
+    with, so the mirrored frame stays anchored to that point.
+    """
+    return [
+        (dy, tile, attr ^ FLIP_H, width_px - 2 * origin_x - TILE_SIZE - dx)
+        for dy, tile, attr, dx in records
+    ]
+
+def add_mirrored_frames(metasprites, metadata, source="right", target="left", origin_x=0):
+    """Create missing <category>_<target>_N frames by mirroring <category>_<source>_N
+
+    origin_x must match the origin passed to build_metasprites. Returns the
+    names of the frames that were added.
+    """
+    added = []
+    for sprite_name, sprite_info in list(metadata.items()):
+        category = sprite_info.get("category", "")
+        prefix = f"{category}_{source}_"
+        if not sprite_name.startswith(prefix):
+            continue
+
+        mirrored_name = f"{category}_{target}_" + sprite_name[len(prefix):]
+        if mirrored_name in metasprites:
+            continue
+
+        width_px = sprite_info["size"][0] * TILE_SIZE
+        metasprites[mirrored_name] = mirror_metasprite(metasprites[sprite_name], width_px, origin_x)
+        metadata[mirrored_name] = dict(sprite_info)
+        added.append(mirrored_name)
+
+    return added
+
+def oam_usage(records):
+    """Return (OAM slots used, worst-case hardware sprites on one scanline)"""
+    if not records:
+        return 0, 0
+
+    # Count how many 8-pixel-tall sprites cover each scanline of the metasprite
+    tops = np.array([dy for dy, _, _, _ in records])
+    scanlines = np.arange(tops.min(), tops.max() + TILE_SIZE)
+    covered = (scanlines[:, None] >= tops[None, :]) & (scanlines[:, None] < tops[None, :] + TILE_SIZE)
+
+    return len(records), int(covered.sum(axis=1).max())
+
+def asm_label(name, prefix=""):
+    """Turn a sprite/animation name into a valid ca65 label"""
+    label = re.sub(r"[^A-Za-z0-9_]", "_", f"{prefix}{name}")
+    if label[0].isdigit():
+        label = "_" + label
+    return label
+
+def format_metasprite_asm(metasprites, animations, prefix="", chr_file=None):
+    """Generate ca65 source for the metasprite and animation tables
+
+    Raises ValueError if a record's tile or attr doesn't fit in a byte.
+    """
+    lines = [
+        "; Generated by metasprite_generator.py - do not edit by hand",
+        "; Metasprite records: dy, tile, attr, dx (OAM byte order), terminated by $80",
+        "",
+        '.segment "RODATA"',
+        ""
+    ]
+
+    for sprite_name, records in metasprites.items():
+        label = asm_label(sprite_name, prefix)
+        lines.append(f".export {label}")
+        lines.append(f"{label}:")
+        for dy, tile, attr, dx in records:
+            if not (0 <= tile < MAX_PATTERN_TILES and 0 <= attr <= 0xFF):
+                raise ValueError(f"{sprite_name} has tile {tile}, attr {attr}; both must be 0-255")
+            lines.append(f"  .byte ${dy & 0xFF:02X}, ${tile:02X}, ${attr:02X}, ${dx & 0xFF:02X}")
+        lines.append(f"  .byte ${METASPRITE_END:02X}")
+        lines.append("")
+
+    # Animation tables: frame count followed by pointers to each metasprite
+    for anim_name, frames in animations.items():
+        label = asm_label(anim_name, prefix) + "_frames"
+        frame_labels = ", ".join(asm_label(frame, prefix) for frame in frames)
+        lines.append(f".export {label}")
+        lines.append(f"{label}:")
+        lines.append(f"  .byte {len(frames)}")
+        lines.append(f"  .addr {frame_labels}")
+        lines.append("")
+
+    if chr_file:
+        lines.append('.segment "CHARS"')
+        lines.append(f'  .incbin "{chr_file}"')
+        lines.append("")
+
+    return "\n".join(lines)
+
+def report_oam_budget(metasprites):
+    """Print the OAM usage for every frame and return it as a dict"""
+    usage = {}
+    print(f"\n{'Frame':<32} {'OAM':>4} {'Max/line':>9}")
+    for sprite_name, records in metasprites.items():
+        slots, per_line = oam_usage(records)
+        usage[sprite_name] = {"oam_slots": slots, "max_per_scanline": per_line}
+
+        warning = ""
+        if per_line > MAX_SPRITES_PER_SCANLINE:
+            warning = "  <-- exceeds 8 per scanline"
+        elif slots > MAX_OAM_SPRITES:
+            warning = "  <-- exceeds 64 OAM sprites"
+        print(f"{sprite_name:<32} {slots:>4} {per_line:>9}{warning}")
+
+    return usage
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate ca65 metasprite tables from composed sprites')
+    parser.add_argument('input', help='Path to CHR bank (PNG, .chr or .bin)')
+    parser.add_argument('--config', '-c',
+                        help='sprite_config.json from arkista_sprite_extractor (default: built-in metadata)')
+    parser.add_argument('--output', '-o', default='metasprites',
+                        help='Output directory for the .s, .chr and report files')
+    parser.add_argument('--name', '-n', default='metasprites',
+                        help='Base name of the generated files')
+    parser.add_argument('--prefix', '-p', default='',
+                        help='Prefix added to every generated label')
+    parser.add_argument('--palette', type=int, default=0, choices=range(4),
+                        help='Sprite palette (0-3) written into the attribute byte')
+    parser.add_argument('--first-tile', type=int, default=0,
+                        help='Index of the first generated tile in the pattern table')
+    parser.add_argument('--origin', type=int, nargs=2, default=[0, 0], metavar=('X', 'Y'),
+                        help='Pixel offset of the metasprite origin within each sprite')
+    parser.add_argument('--mirror-left', action='store_true',
+                        help='Generate missing left-facing frames by mirroring right-facing ones')
+
+    args = parser.parse_args()
+
+    tiles, _ = load_tile_array(args.input)
+    if tiles is None:
+        return False
+
+    if args.config:
+        metadata = load_sprite_config(args.config)
+    else:
+        metadata = {name: dict(info) for name, info in ARKISTA_SPRITE_METADATA.items()}
+
+    try:
+        unique_tiles, metasprites = build_metasprites(
+            tiles, metadata, args.palette, args.first_tile, tuple(args.origin)
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return False
+
+    if args.mirror_left:
+        added = add_mirrored_frames(metasprites, metadata, origin_x=args.origin[0])
+        print(f"Added {len(added)} mirrored left-facing frames")
+
+    animations = group_animations(metadata)
+
+    os.makedirs(args.output, exist_ok=True)
+
+    # CHR data for the shared tiles
+    chr_name = f"{args.name}.chr"
+    if unique_tiles.size and unique_tiles.max() > 3:
+        print("Error: tiles use more than 4 colors and can't be encoded as CHR")
+        return False
+    with open(os.path.join(args.output, chr_name), 'wb') as f:
+        f.write(encode_chr_data(unique_tiles))
+
+    total_refs = sum(len(records) for records in metasprites.values())
+    print(f"{len(unique_tiles)} unique tiles for {total_refs} tile references "
+          f"across {len(metasprites)} frames")
+
+    # ca65 source
+    asm_path = os.path.join(args.output, f"{args.name}.s")
+    with open(asm_path, 'w') as f:
+        f.write(format_metasprite_asm(metasprites, animations, args.prefix, chr_name))
+    print(f"Saved metasprite tables to {asm_path}")
+
+    # OAM budget report
+    usage = report_oam_budget(metasprites)
+    report_path = os.path.join(args.output, f"{args.name}_report.json")
+    with open(report_path, 'w') as f:
+        json.dump({
+            "unique_tiles": len(unique_tiles),
+            "tile_references": total_refs,
+            "frames": usage,
+            "animations": animations
+        }, f, indent=2)
+    print(f"\nSaved OAM budget report to {report_path}")
+
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Flip-Aware Sprite Deduplication Tool
+------------------------------------
+Finds sprites and tiles that are identical up to a horizontal and/or vertical
+flip, across any number of sprite sheets and CHR banks. Each flip class is
+stored once, and every other member records the OAM flip bits needed to draw
+it from that stored copy. Left-facing frames that are mirrored right-facing
+frames therefore cost no extra PNGs and no extra CHR tiles.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+from arkista_sprite_extractor import load_tile_array, encode_chr_data
+
+# OAM attribute bits (byte 2 of each hardware sprite entry)
+FLIP_H = 0x40
+FLIP_V = 0x80
+
+# All four flip variants in the order they are tried
+FLIP_VARIANTS = [0, FLIP_H, FLIP_V, FLIP_H | FLIP_V]
+
+def apply_flip(block, flip):
+    """Mirror a (..., H, W) pixel block according to OAM flip bits"""
+    if flip & FLIP_H:
+        block = block[..., :, ::-1]
+    if flip & FLIP_V:
+        block = block[..., ::-1, :]
+    return block
+
+def canonical_form(block):
+    """Return (key, flip) for the lexicographically smallest flip variant of a block
+
+    Every flip is its own inverse, so apply_flip(canonical, flip) gives back the
+    original block. Blocks in the same flip class share the same key.
+    """
+    block = np.asarray(block)
+    best_key, best_flip = None, 0
+    for flip in FLIP_VARIANTS:
+        variant = np.ascontiguousarray(apply_flip(block, flip))
+        key = (variant.shape, variant.dtype.str, variant.tobytes())
+        if best_key is None or key < best_key:
+            best_key, best_flip = key, flip
+    return best_key, best_flip
+
+def dedup_blocks(blocks):
+    """Collapse pixel blocks into one stored copy per flip class
+
+    The first block seen in each class is kept as the stored copy, so sprites
+    keep their original orientation. Returns (unique, refs) where refs holds a
+    (unique_index, flip) pair for every input block such that
+    apply_flip(unique[unique_index], flip) equals that block.
+    """
+    classes = {}
+    unique = []
+    refs = []
+
+    for block in blocks:
+        key, flip = canonical_form(block)
+
+        if key not in classes:
+            classes[key] = (len(unique), flip)
+            unique.append(np.asarray(block))
+
+        # Flips compose by XOR: block = flip(canonical), first = flip(canonical)
+        index, first_flip = classes[key]
+        refs.append((index, first_flip ^ flip))
+
+    return unique, refs
+
+def load_sprite_pixels(sprite_path):
+    """Load a sprite image as an (H, W) array with one packed RGBA value per pixel"""
+    with Image.open(sprite_path) as img:
+        rgba = np.ascontiguousarray(np.asarray(img.convert('RGBA')))
+    return rgba.view(np.uint32)[..., 0]
+
+def collect_sprite_files(inputs):
+    """Collect (name, path) pairs for every PNG in the given files/directories"""
+    sprite_files = []
+    for input_path in inputs:
+        if os.path.isfile(input_path):
+            name = os.path.splitext(os.path.basename(input_path))[0]
+            sprite_files.append((name, input_path))
+            continue
+
+        # Prefix names with the sheet directory so they stay unique across sheets
+        sheet_name = os.path.basename(os.path.normpath(input_path))
+        for root, _, files in sorted(os.walk(input_path)):
+            for file in sorted(files):
+                if file.lower().endswith('.png'):
+                    full_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(full_path, input_path)
+                    name = os.path.join(sheet_name, os.path.splitext(relative_path)[0])
+                    sprite_files.append((name.replace(os.sep, '/'), full_path))
+
+    return sprite_files
+
+def dedup_sprites(sprite_files):
+    """Deduplicate sprite images, returning the stored copies and a per-sprite map"""
+    names = []
+    blocks = []
+    for name, path in sprite_files:
+        try:
+            blocks.append(load_sprite_pixels(path))
+            names.append(name)
+        except Exception as e:
+            print(f"Warning: Could not load sprite {path}: {e}")
+
+    unique, refs = dedup_blocks(blocks)
+
+    # Name each class after its stored copy
+    canonical_names = {}
+    for name, (index, flip) in zip(names, refs):
+        canonical_names.setdefault(index, name)
+
+    sprite_map = {}
+    for name, (index, flip) in zip(names, refs):
+        sprite_map[name] = {
+            "canonical": canonical_names[index],
+            "flip_h": bool(flip & FLIP_H),
+            "flip_v": bool(flip & FLIP_V),
+            "attr": flip
+        }
+
+    paths = dict(sprite_files)
+    stored = {canonical_names[i]: paths[canonical_names[i]] for i in range(len(unique))}
+    return stored, sprite_map
+
+def dedup_chr_tiles(chr_paths):
+    """Deduplicate the tiles of one or more CHR banks"""
+    tile_blocks = []
+    tile_names = []
+    for chr_path in chr_paths:
+        tiles, _ = load_tile_array(chr_path)
+        if tiles is None:
+            continue
+        bank_name = os.path.splitext(os.path.basename(chr_path))[0]
+        tile_blocks.extend(tiles)
+        tile_names.extend(f"{bank_name}:{i:03d}" for i in range(len(tiles)))
+
+    unique, refs = dedup_blocks(tile_blocks)
+
+    tile_map = {}
+    for name, (index, flip) in zip(tile_names, refs):
+        tile_map[name] = {"tile": index, "attr": flip}
+
+    return unique, tile_map
+
+def main():
+    parser = argparse.ArgumentParser(description='Deduplicate sprites and CHR tiles under horizontal/vertical flips')
+    parser.add_argument('sprites', nargs='*', help='Sprite PNG files or directories (one per sheet)')
+    parser.add_argument('--chr', '-c', action='append', default=[],
+                        help='CHR bank (PNG, .chr or .bin) whose tiles should be deduplicated; may be repeated')
+    parser.add_argument('--output', '-o', default='dedup_sprites',
+                        help='Output directory for canonical sprites, tiles and the dedup map')
+
+    args = parser.parse_args()
+
+    if not args.sprites and not args.chr:
+        parser.error("Provide at least one sprite directory or --chr bank")
+
+    os.makedirs(args.output, exist_ok=True)
+    dedup_map = {}
+
+    # Sprites: keep one PNG per flip class
+    if args.sprites:
+        sprite_files = collect_sprite_files(args.sprites)
+        stored, sprite_map = dedup_sprites(sprite_files)
+
+        sprites_dir = os.path.join(args.output, "sprites")
+        for name, path in stored.items():
+            out_path = os.path.join(sprites_dir, name + ".png")
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with Image.open(path) as img:
+                img.save(out_path)
+
+        dedup_map["sprites"] = sprite_map
+        print(f"Sprites: {len(sprite_map)} input, {len(stored)} unique after flip deduplication")
+
+    # Tiles: pack the unique tiles into a single CHR blob
+    if args.chr:
+        unique_tiles, tile_map = dedup_chr_tiles(args.chr)
+
+        if unique_tiles:
+            tile_array = np.stack(unique_tiles)
+            if tile_array.max() > 3:
+                print("Warning: tiles use more than 4 colors, skipping canonical_tiles.chr")
+            else:
+                chr_path = os.path.join(args.output, "canonical_tiles.chr")
+                with open(chr_path, 'wb') as f:
+                    f.write(encode_chr_data(tile_array))
+                print(f"Saved canonical tiles to {chr_path}")
+
+        dedup_map["tiles"] = tile_map
+        print(f"Tiles: {len(tile_map)} input, {len(unique_tiles)} unique after flip deduplication")
+
+    map_path = os.path.join(args.output, "dedup_map.json")
+    with open(map_path, 'w') as f:
+        json.dump(dedup_map, f, indent=2)
+
+    print(f"Saved deduplication map to {map_path}")
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Sprite Export Helpers
+---------------------
+Places sprite files into an export directory without duplicating their
+bytes where the filesystem allows it, or packs them into one atlas.
+
+Link modes:
+    copy      - plain byte copy (shutil.copy2)
+    hardlink  - hard link to the source; copies only across devices
+    reflink   - copy-on-write clone (FICLONE on Btrfs, XFS, ...); copies
+                where the filesystem can't clone
+    pack      - one atlas PNG per asset plus a JSON map of frame rectangles
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library (pack mode only)
+"""
+
+import os
+import json
+import errno
+import shutil
+import argparse
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; reflinks fall back to copies there
+    fcntl = None
+
+LINK_MODES = ("copy", "hardlink", "reflink", "pack")
+
+# Linux ioctl that clones a whole file: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Errors that mean "this filesystem / pair of paths can't share data", so copy instead
+LINK_FALLBACK_ERRORS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK}
+if hasattr(errno, "ENOTSUP"):
+    LINK_FALLBACK_ERRORS.add(errno.ENOTSUP)
+
+def _remove_existing(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def hardlink_file(src, dst):
+    """Hard link dst to src, copying if the link isn't possible; returns the mode used"""
+    try:
+        if os.path.samefile(src, dst):
+            return "hardlink"
+    except OSError:
+        pass
+
+    _remove_existing(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in LINK_FALLBACK_ERRORS:
+            raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+def reflink_file(src, dst):
+    """Clone src to dst copy-on-write, copying if the filesystem can't; returns the mode used"""
+    if fcntl is not None:
+        _remove_existing(dst)
+        with open(src, 'rb') as source, open(dst, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+                cloned = True
+            except OSError as e:
+                if e.errno not in LINK_FALLBACK_ERRORS:
+                    raise
+                cloned = False
+        if cloned:
+            shutil.copystat(src, dst)
+            return "reflink"
+    shutil.copy2(src, dst)
+    return "copy"
+
+def place_file(src, dst, mode="copy"):
+    """Put src at dst using a link mode ("copy", "hardlink" or "reflink"); returns the mode used"""
+    if mode == "hardlink":
+        return hardlink_file(src, dst)
+    if mode == "reflink":
+        return reflink_file(src, dst)
+    # dst may still be a hard link to src from an earlier export
+    _remove_existing(dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+def pack_rectangles(sizes):
+    """Shelf-pack (width, height) sizes into a roughly square sheet
+
+    Returns ((sheet width, sheet height), [(x, y)] in the order of sizes).
+    Tallest images are placed first, filling rows left to right.
+    """
+    if not sizes:
+        return (0, 0), []
+
+    area = sum(width * height for width, height in sizes)
+    sheet_width = max(max(width for width, _ in sizes), int(area ** 0.5 + 0.5))
+
+    positions = [None] * len(sizes)
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    x = y = row_height = 0
+    used_width = 0
+    for i in order:
+        width, height = sizes[i]
+        if x and x + width > sheet_width:
+            y += row_height
+            x = row_height = 0
+        positions[i] = (x, y)
+        x += width
+        used_width = max(used_width, x)
+        row_height = max(row_height, height)
+
+    return (used_width, y + row_height), positions
+
+def pack_atlas(frames, atlas_path):
+    """Pack {frame name: image path} into one PNG atlas
+
+    Writes atlas_path and a JSON map next to it (same name, .json) of
+    {frame name: [x, y, width, height]}. Returns the map path.
+    """
+    from PIL import Image
+
+    names = []
+    images = []
+    for name, path in frames.items():
+        with Image.open(path) as img:
+            images.append(img.convert("RGBA"))
+        names.append(name)
+
+    size, positions = pack_rectangles([image.size for image in images])
+    atlas = Image.new("RGBA", (max(size[0], 1), max(size[1], 1)), (0, 0, 0, 0))
+    rects = {}
+    for name, image, (x, y) in zip(names, images, positions):
+        atlas.paste(image, (x, y))
+        rects[name] = [x, y, image.width, image.height]
+    atlas.save(atlas_path)
+
+    map_path = os.path.splitext(atlas_path)[0] + ".json"
+    with open(map_path, 'w') as f:
+        json.dump({"image": os.path.basename(atlas_path), "frames": rects}, f, indent=2)
+    return map_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack sprite PNGs into an atlas')
+    parser.add_argument('directory', help='Directory of sprite PNGs')
+    parser.add_argument('output', help='Atlas PNG to write (a .json frame map is written next to it)')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return False
+
+    frames = {
+        os.path.splitext(file)[0]: os.path.join(args.directory, file)
+        for file in sorted(os.listdir(args.directory)) if file.lower().endswith('.png')
+    }
+    if not frames:
+        print("No sprites found")
+        return False
+
+    map_path = pack_atlas(frames, args.output)
+    print(f"Packed {len(frames)} sprites into {args.output} ({map_path})")
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Sprite Similarity Index
+-----------------------
+Finds visually similar sprites across a whole library using perceptual
+hashes, so tags can be propagated from one sprite to its look-alikes.
+
+Each sprite is reduced to a 2-bit index image (transparent pixels are
+color 0, opaque colors are ranked by brightness), which makes palette swaps
+of the same sprite hash identically. A 64-bit difference hash (dHash) is
+taken over that image and over its three horizontal/vertical flips. Only the
+plain hash goes into the search tree; a query searches with all four of its
+own flips and keeps the nearest distance per sprite, so mirrored frames
+match too.
+
+Hashes are cached per file and mtime in an optional SQLite table, and
+searched with a BK-tree so "everything within Hamming distance k" only
+visits a small part of the library.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+- NumPy
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import numpy as np
+from PIL import Image
+
+from sprite_dedup import FLIP_VARIANTS, apply_flip
+
+# dHash grid: HASH_SIZE rows of HASH_SIZE comparisons gives a 64-bit hash
+HASH_SIZE = 8
+
+# Default Hamming distance for "similar" (out of 64 bits)
+DEFAULT_MAX_DISTANCE = 6
+
+# One dHash per entry of FLIP_VARIANTS; dhash is the unflipped image
+SIMILARITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sprite_hashes (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    dhash INTEGER NOT NULL,
+    dhash_h INTEGER NOT NULL,
+    dhash_v INTEGER NOT NULL,
+    dhash_hv INTEGER NOT NULL
+);
+"""
+
+def hamming_distance(a, b):
+    """Return the number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+def index_image(image):
+    """Reduce an image to a 2-bit (0-3) index array ranked by brightness
+
+    Transparent pixels become 0. With three or fewer opaque colors each gets
+    its own index; larger palettes are split into three brightness bands.
+    """
+    rgba = np.asarray(image.convert("RGBA")).astype(np.int32)
+    packed = (rgba[..., 0] << 16) | (rgba[..., 1] << 8) | rgba[..., 2]
+    opaque = rgba[..., 3] != 0
+
+    # np.unique returns the colors sorted, so searchsorted maps pixels to them
+    colors = np.unique(packed[opaque])
+    luminance = 0.299 * (colors >> 16) + 0.587 * ((colors >> 8) & 0xFF) + 0.114 * (colors & 0xFF)
+    brightness_rank = np.empty(len(colors), dtype=np.int64)
+    brightness_rank[np.argsort(luminance, kind="stable")] = np.arange(len(colors))
+
+    index = np.zeros(packed.shape, dtype=np.uint8)
+    if len(colors):
+        ranks = brightness_rank[np.searchsorted(colors, packed[opaque])]
+        index[opaque] = 1 + ranks * 3 // max(len(colors), 3)
+    return index
+
+def dhash(index):
+    """Return the 64-bit difference hash of a 2D index array"""
+    # Area-average down to (HASH_SIZE + 1) x HASH_SIZE, then compare neighbors
+    small = Image.fromarray((np.asarray(index) * 85).astype(np.uint8), "L")
+    small = np.asarray(small.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def flip_dhashes(index):
+    """Return the dHashes of an index array in FLIP_VARIANTS order, unflipped first
+
+    The minimum of these is not used as a single flip-invariant hash: two
+    near-identical sprites can take their minimum from different flips, and
+    Hamming distance between such minimums is no longer a metric.
+    """
+    return tuple(dhash(np.ascontiguousarray(apply_flip(index, flip))) for flip in FLIP_VARIANTS)
+
+def sprite_hashes(image_path):
+    """Return the four flip dHashes of a sprite image, unflipped first"""
+    with Image.open(image_path) as img:
+        index = index_image(img)
+    return flip_dhashes(index)
+
+def _to_sql(value):
+    """Store an unsigned 64-bit hash in SQLite's signed INTEGER"""
+    return value - (1 << 63)
+
+def _from_sql(value):
+    """Inverse of _to_sql"""
+    return value + (1 << 63)
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        """Insert an item under its hash; equal hashes share a node"""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Return [(distance, item)] for every item within max_distance, nearest first"""
+        results = []
+        if self.root is None:
+            return results
+
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+
+            # Triangle inequality: only children in [d - k, d + k] can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+class SimilarityIndex:
+    """Perceptual hash index over a set of sprite images"""
+
+    def __init__(self, database=None, flip_invariant=True):
+        """Create an index, caching hashes in the given database path if any"""
+        self.flip_invariant = flip_invariant
+        self.hashes = {}      # key -> dHashes of its four flips; the first is in the tree
+        self.tree = BKTree()
+
+        self.conn = None
+        if database:
+            self.conn = sqlite3.connect(database)
+            self.conn.executescript(SIMILARITY_SCHEMA)
+            self.conn.commit()
+
+    def close(self):
+        """Close the hash cache database"""
+        if self.conn:
+            self.conn.close()
+
+    def add_images(self, items):
+        """Hash and index images given as (key, path) pairs
+
+        Cached hashes are reused when the file's mtime hasn't changed.
+        Returns the number of images that could not be read.
+        """
+        cached = {}
+        if self.conn:
+            for row in self.conn.execute("SELECT * FROM sprite_hashes"):
+                cached[row[0]] = (row[1], tuple(_from_sql(value) for value in row[2:]))
+
+        computed = []
+        failed = 0
+        for key, path in items:
+            path = os.path.abspath(path)
+            try:
+                mtime = os.stat(path).st_mtime
+                entry = cached.get(path)
+                if entry and entry[0] == mtime:
+                    hashes = entry[1]
+                else:
+                    hashes = sprite_hashes(path)
+                    computed.append((path, mtime) + tuple(_to_sql(value) for value in hashes))
+            except Exception as e:
+                print(f"Warning: Could not hash sprite {path}: {e}")
+                failed += 1
+                continue
+
+            self.hashes[key] = hashes
+            self.tree.add(hashes[0], key)
+
+        if self.conn and computed:
+            self.conn.executemany("INSERT OR REPLACE INTO sprite_hashes VALUES (?, ?, ?, ?, ?, ?)", computed)
+            self.conn.commit()
+
+        return failed
+
+    def find_similar(self, key, max_distance=DEFAULT_MAX_DISTANCE):
+        """Return [(distance, key)] for indexed sprites similar to key, nearest first"""
+        if key not in self.hashes:
+            return []
+
+        # Search with each flip of the query and keep the nearest distance per sprite
+        queries = set(self.hashes[key]) if self.flip_invariant else {self.hashes[key][0]}
+        nearest = {}
+        for query in queries:
+            for distance, other in self.tree.search(query, max_distance):
+                if other != key and distance < nearest.get(other, max_distance + 1):
+                    nearest[other] = distance
+
+        return sorted(((distance, other) for other, distance in nearest.items()), key=lambda result: result[0])
+
+    def similar_groups(self, max_distance=DEFAULT_MAX_DISTANCE):
+        """Cluster every indexed sprite with its neighbors within max_distance
+
+        Returns a list of groups (lists of keys) with more than one member.
+        """
+        parent = {key: key for key in self.hashes}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key in self.hashes:
+            for _, other in self.find_similar(key, max_distance):
+                parent[find(other)] = find(key)
+
+        groups = {}
+        for key in self.hashes:
+            groups.setdefault(find(key), []).append(key)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+def collect_images(directory):
+    """Collect (relative path, full path) pairs for every PNG under a directory"""
+    images = []
+    for root, _, files in sorted(os.walk(directory)):
+        for file in sorted(files):
+            if file.lower().endswith('.png'):
+                full_path = os.path.join(root, file)
+                images.append((os.path.relpath(full_path, directory), full_path))
+    return images
+
+def main():
+    parser = argparse.ArgumentParser(description='Find visually similar sprites with perceptual hashes')
+    parser.add_argument('directory', help='Directory of sprite PNGs')
+    parser.add_argument('--distance', '-d', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'Maximum Hamming distance out of 64 bits (default: {DEFAULT_MAX_DISTANCE})')
+    parser.add_argument('--query', '-q', help='Only list sprites similar to this one (path relative to directory)')
+    parser.add_argument('--no-flip', action='store_true', help="Don't treat flipped sprites as similar")
+    parser.add_argument('--cache', help='SQLite database to cache hashes in')
+    parser.add_argument('--output', '-o', help='Save the similar groups as JSON to this path')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory {args.directory} does not exist")
+        return False
+
+    index = SimilarityIndex(args.cache, flip_invariant=not args.no_flip)
+    index.add_images(collect_images(args.directory))
+    print(f"Indexed {len(index.hashes)} sprites")
+
+    if args.query:
+        for distance, key in index.find_similar(args.query, args.distance):
+            print(f"{distance:>3}  {key}")
+        index.close()
+        return True
+
+    groups = index.similar_groups(args.distance)
+    for group in groups:
+        print(f"\n{len(group)} similar sprites:")
+        for key in group:
+            print(f"  {key}")
+    print(f"\n{len(groups)} groups within distance {args.distance}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(groups, f, indent=2)
+        print(f"Saved groups to {args.output}")
+
+    index.close()
+    return True
+
+if __name__ == '__main__':
+    main()
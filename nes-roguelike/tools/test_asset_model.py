@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for asset_model.py
+
+Run with: python -m unittest test_asset_model
+"""
+
+import copy
+import unittest
+
+from asset_model import Asset, normalize_asset
+
+def drifted_asset():
+    """Asset metadata using some of the older key spellings"""
+    return {
+        "id": "hero",
+        "name": "Hero",
+        "type": "Player",
+        "sprites": [
+            {"id": "hero_walk_1", "name": "walk 1", "frame": 1, "created": "2024-01-01", "updated": "2024-02-01"}
+        ],
+        "animations": [
+            {"id": "hero_walk", "name": "walk", "animation_type": "walk", "frames": [{"sprite_id": "hero_walk_1"}]}
+        ]
+    }
+
+class NormalizeAssetTest(unittest.TestCase):
+    def test_aliases_map_to_canonical_keys(self):
+        canonical = normalize_asset(drifted_asset())
+        sprite = canonical["sprites"][0]
+        self.assertEqual(sprite["frame_number"], 1)
+        self.assertEqual(sprite["created_at"], "2024-01-01")
+        self.assertNotIn("frame", sprite)
+        self.assertEqual(canonical["animations"][0]["type"], "walk")
+        self.assertEqual(canonical["animations"][0]["frames"], ["hero_walk_1"])
+
+    def test_unknown_keys_round_trip_unchanged(self):
+        # Sprites have no updated_at field, so "updated" must not be renamed to it
+        sprite = normalize_asset(drifted_asset())["sprites"][0]
+        self.assertEqual(sprite["updated"], "2024-02-01")
+        self.assertNotIn("updated_at", sprite)
+
+        again = Asset.from_dict(normalize_asset(drifted_asset())).to_dict()
+        self.assertEqual(again["sprites"][0], sprite)
+
+    def test_input_is_not_modified(self):
+        original = drifted_asset()
+        snapshot = copy.deepcopy(original)
+        sprites = original["sprites"]
+
+        canonical = normalize_asset(original)
+
+        self.assertEqual(original, snapshot)
+        self.assertIs(original["sprites"], sprites)
+        self.assertIsNot(canonical["sprites"][0], sprites[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for metasprite_generator.py
+
+Run with: python -m unittest test_metasprite_generator
+"""
+
+import unittest
+import numpy as np
+
+from arkista_sprite_extractor import TILE_SIZE
+from sprite_dedup import apply_flip
+from metasprite_generator import build_metasprites, add_mirrored_frames, format_metasprite_asm
+
+def render_metasprite(records, unique_tiles, origin, size):
+    """Draw metasprite records onto a (height, width) canvas with the origin at origin"""
+    origin_x, origin_y = origin
+    width, height = size
+    canvas = np.zeros((height, width), dtype=unique_tiles.dtype)
+    for dy, tile, attr, dx in records:
+        x, y = dx + origin_x, dy + origin_y
+        canvas[y:y + TILE_SIZE, x:x + TILE_SIZE] = apply_flip(unique_tiles[tile], attr)
+    return canvas
+
+class MirrorMetaspriteTest(unittest.TestCase):
+    def setUp(self):
+        # One 3x2-tile sprite; the middle bottom tile is blank and gets dropped
+        rng = np.random.RandomState(0)
+        self.tiles = rng.randint(1, 4, size=(6, TILE_SIZE, TILE_SIZE)).astype(np.uint8)
+        self.tiles[4] = 0
+        self.metadata = {
+            "player_right_1": {
+                "base_tile": 0,
+                "size": (3, 2),
+                "arrangement": [0, 1, 2, 3, 4, 5],
+                "category": "player"
+            }
+        }
+        self.size = (3 * TILE_SIZE, 2 * TILE_SIZE)
+        self.pixels = np.vstack([np.hstack(list(self.tiles[0:3])), np.hstack(list(self.tiles[3:6]))])
+
+    def mirror(self, origin):
+        unique_tiles, metasprites = build_metasprites(self.tiles, self.metadata, origin=origin)
+        added = add_mirrored_frames(metasprites, self.metadata, origin_x=origin[0])
+        self.assertEqual(added, ["player_left_1"])
+        return unique_tiles, metasprites
+
+    def test_mirror_without_origin(self):
+        origin = (0, 0)
+        unique_tiles, metasprites = self.mirror(origin)
+        rendered = render_metasprite(metasprites["player_left_1"], unique_tiles, origin, self.size)
+        np.testing.assert_array_equal(rendered, self.pixels[:, ::-1])
+
+    def test_mirror_with_origin(self):
+        # Origin at the sprite's feet, off-center horizontally
+        origin = (10, 16)
+        unique_tiles, metasprites = self.mirror(origin)
+
+        right = render_metasprite(metasprites["player_right_1"], unique_tiles, origin, self.size)
+        np.testing.assert_array_equal(right, self.pixels)
+
+        left = render_metasprite(metasprites["player_left_1"], unique_tiles, origin, self.size)
+        np.testing.assert_array_equal(left, self.pixels[:, ::-1])
+
+class TileRangeTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.tiles = rng.randint(1, 4, size=(4, TILE_SIZE, TILE_SIZE)).astype(np.uint8)
+        self.metadata = {
+            "slime_1": {"base_tile": 0, "size": (2, 2), "arrangement": [0, 1, 2, 3], "category": ""}
+        }
+
+    def test_tiles_past_pattern_table(self):
+        with self.assertRaises(ValueError):
+            build_metasprites(self.tiles, self.metadata, first_tile=254)
+
+    def test_negative_first_tile(self):
+        with self.assertRaises(ValueError):
+            build_metasprites(self.tiles, self.metadata, first_tile=-1)
+
+    def test_last_tiles_of_pattern_table(self):
+        unique_tiles, metasprites = build_metasprites(self.tiles, self.metadata, first_tile=252)
+        self.assertEqual(max(tile for _, tile, _, _ in metasprites["slime_1"]), 255)
+        self.assertIn("$FF", format_metasprite_asm(metasprites, {}))
+
+    def test_format_rejects_out_of_range_records(self):
+        for record in [(0, 256, 0, 0), (0, -1, 0, 0), (0, 0, -1, 0)]:
+            with self.assertRaises(ValueError):
+                format_metasprite_asm({"bad": [record]}, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Sprite Thumbnail Cache
+----------------------
+Keeps pre-scaled sprite previews as raw RGBA BLOBs in SQLite so the sprite
+browsers don't have to decode and resize the source PNG on every selection.
+
+Entries are keyed on (source path, zoom) and remember the source file's
+modification time; an entry whose mtime no longer matches is rebuilt. The
+total size of the cache is capped, and the least recently used thumbnails
+are evicted first.
+
+The cache keeps a running total of the cached bytes, so only a miss that
+pushes it over the cap touches the eviction index. The small columns come
+before the pixel data in each row, so the total and the eviction order can
+be read without loading thumbnails. Hits don't write: their last-used times
+are collected and written in one batch with the next write, flush() or
+close().
+
+The cache keeps its table in a database file of its own (the toolkit uses
+sprite_cache.db next to its sprite database), or in an existing sqlite3
+connection the caller passes in.
+
+Requirements:
+- Python 3.6+
+- Pillow (PIL) library
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+from PIL import Image
+
+# Default cap on the total size of cached pixel data
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Hits whose last-used time is written in one go once this many are pending
+TOUCH_BATCH = 256
+
+# The pixel data comes last, so reading the other columns never loads it
+THUMBNAIL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    path TEXT NOT NULL,
+    zoom TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (path, zoom)
+);
+
+CREATE INDEX IF NOT EXISTS idx_thumbnails_lru ON thumbnails(last_used, bytes);
+"""
+
+class ThumbnailCache:
+    """LRU cache of scaled sprite previews stored in a SQLite table"""
+
+    def __init__(self, database, max_bytes=DEFAULT_MAX_BYTES):
+        """Open the cache on an existing sqlite3 connection or a database path"""
+        if isinstance(database, sqlite3.Connection):
+            self.conn = database
+            self.owns_connection = False
+        else:
+            self.conn = sqlite3.connect(database)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.owns_connection = True
+
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.touched = {}         # (path, zoom) -> last-used time not yet written
+
+        self.conn.executescript(THUMBNAIL_SCHEMA)
+        self.conn.commit()
+
+        # Summed once from the index; kept up to date by every change after this
+        self.total = self.conn.execute(
+            "SELECT coalesce(sum(bytes), 0) FROM thumbnails INDEXED BY idx_thumbnails_lru"
+        ).fetchone()[0]
+
+    def close(self):
+        """Write pending last-used times and close the database connection if the cache opened it"""
+        self.flush()
+        if self.owns_connection:
+            self.conn.close()
+
+    def _write_touched(self):
+        if self.touched:
+            self.conn.executemany(
+                "UPDATE thumbnails SET last_used = ? WHERE path = ? AND zoom = ?",
+                [(used, path, zoom) for (path, zoom), used in self.touched.items()]
+            )
+            self.touched = {}
+
+    def flush(self):
+        """Write the last-used times of recent hits"""
+        if self.touched:
+            self._write_touched()
+            self.conn.commit()
+
+    def thumbnail(self, path, scale=1, size=None):
+        """Return an RGBA preview of the image at path
+
+        The image is scaled by an integer factor, or to an exact (width, height)
+        when size is given, using nearest neighbor so pixel art stays sharp.
+        Raises OSError if the source image can't be read.
+        """
+        path = os.path.abspath(path)
+        zoom = f"{size[0]}x{size[1]}" if size else f"x{scale}"
+        mtime = os.stat(path).st_mtime
+
+        row = self.conn.execute(
+            "SELECT mtime, width, height, data FROM thumbnails WHERE path = ? AND zoom = ?",
+            (path, zoom)
+        ).fetchone()
+
+        if row and row[0] == mtime:
+            self.hits += 1
+            self.touched[(path, zoom)] = time.time()
+            if len(self.touched) >= TOUCH_BATCH:
+                self.flush()
+            return Image.frombytes("RGBA", (row[1], row[2]), row[3])
+
+        # Missing or stale: decode and scale the source once
+        self.misses += 1
+        with Image.open(path) as img:
+            image = img.convert("RGBA")
+        if size is None:
+            size = (image.width * scale, image.height * scale)
+        image = image.resize(size, Image.NEAREST)
+
+        data = image.tobytes()
+        if row:
+            self.total -= self.conn.execute(
+                "SELECT bytes FROM thumbnails WHERE path = ? AND zoom = ?", (path, zoom)
+            ).fetchone()[0]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO thumbnails (path, zoom, mtime, width, height, bytes, last_used, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, zoom, mtime, image.width, image.height, len(data), time.time(), data)
+        )
+        self.total += len(data)
+        self._write_touched()
+        if self.total > self.max_bytes:
+            self.evict()
+        self.conn.commit()
+        return image
+
+    def evict(self):
+        """Drop least recently used thumbnails until the cache fits in max_bytes"""
+        if self.total <= self.max_bytes:
+            return 0
+
+        # Eviction order must see the latest hits
+        self._write_touched()
+        cursor = self.conn.execute(
+            "SELECT path, zoom, bytes FROM thumbnails INDEXED BY idx_thumbnails_lru ORDER BY last_used"
+        )
+        stale = []
+        for path, zoom, size in cursor:
+            if self.total <= self.max_bytes:
+                break
+            stale.append((path, zoom))
+            self.total -= size
+
+        self.conn.executemany("DELETE FROM thumbnails WHERE path = ? AND zoom = ?", stale)
+        return len(stale)
+
+    def invalidate(self, path):
+        """Forget every cached zoom level of one source image"""
+        path = os.path.abspath(path)
+        self.total -= self.conn.execute(
+            "SELECT coalesce(sum(bytes), 0) FROM thumbnails WHERE path = ?", (path,)
+        ).fetchone()[0]
+        self.touched = {key: used for key, used in self.touched.items() if key[0] != path}
+        self.conn.execute("DELETE FROM thumbnails WHERE path = ?", (path,))
+        self.conn.commit()
+
+    def clear(self):
+        """Remove every cached thumbnail"""
+        self.touched = {}
+        self.conn.execute("DELETE FROM thumbnails")
+        self.conn.commit()
+        self.total = 0
+
+    def total_bytes(self):
+        """Return the size of all cached pixel data in bytes"""
+        return self.total
+
+    def count(self):
+        """Return the number of cached thumbnails"""
+        return self.conn.execute("SELECT count(*) FROM thumbnails").fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or prune a sprite thumbnail cache')
+    parser.add_argument('database', help='Database holding the thumbnails table')
+    parser.add_argument('--max-mb', type=float,
+                        help='Evict least recently used thumbnails down to this many megabytes')
+    parser.add_argument('--clear', action='store_true', help='Remove every cached thumbnail')
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.database):
+        print(f"Error: Database {args.database} does not exist")
+        return False
+
+    cache = ThumbnailCache(args.database)
+    if args.clear:
+        cache.clear()
+    elif args.max_mb is not None:
+        cache.max_bytes = int(args.max_mb * 1024 * 1024)
+        evicted = cache.evict()
+        cache.conn.commit()
+        print(f"Evicted {evicted} thumbnails")
+
+    print(f"{cache.count()} thumbnails, {cache.total_bytes() / 1024:.1f} KB")
+    cache.close()
+    return True
+
+if __name__ == '__main__':
+    main()
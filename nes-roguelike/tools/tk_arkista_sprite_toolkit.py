@@ -13,6 +13,7 @@ Features include:
 """
 
 import os
+import re
 import sys
 import json
 import sqlite3
@@ -23,8 +24,19 @@ from tkinter import filedialog, ttk, messagebox, simpledialog
 from tkinter.font import Font
 from PIL import Image, ImageTk, ImageDraw
 import shutil
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
 
+from thumbnail_cache import ThumbnailCache
+from sprite_similarity import SimilarityIndex, DEFAULT_MAX_DISTANCE
+from animation_detection import detect_sequences, make_pixel_check
+from metadata_writer import write_json, flush as flush_metadata
+from asset_watcher import AssetWatcher
+from asset_wizard_core import stable_id
+
 # NES palette (first 64 colors)
 NES_PALETTE = [
     (124, 124, 124), (0, 0, 252), (0, 0, 188), (68, 40, 188), (148, 0, 132), (168, 0, 32),
@@ -106,20 +118,354 @@ CREATE TABLE IF NOT EXISTS config (
 );
 """
 
+# Connection pragmas: WAL lets readers run alongside a writer, and NORMAL
+# sync is durable at transaction boundaries in WAL mode without an fsync per commit
+DATABASE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000"  # 16 MB page cache
+]
+
+ASSET_INSERT_SQL = """
+    INSERT OR REPLACE INTO assets 
+    (id, name, category, description, tags, chr_bank, width, height, created_at, updated_at, file_path, preview_path) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SPRITE_INSERT_SQL = """
+    INSERT OR REPLACE INTO sprites
+    (id, asset_id, name, animation_type, direction, frame_number, base_tile, tile_arrangement, file_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+ANIMATION_INSERT_SQL = """
+    INSERT OR REPLACE INTO animations
+    (id, asset_id, name, type, direction, frames, frame_duration, loop)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Named queries used by DatabaseManager, kept together so explain_queries()
+# can check every one of them against the live schema
+DATABASE_QUERIES = {
+    "insert_asset": ASSET_INSERT_SQL,
+    "insert_sprite": SPRITE_INSERT_SQL,
+    "insert_animation": ANIMATION_INSERT_SQL,
+    "all_assets": "SELECT * FROM assets ORDER BY category, name",
+    "assets_by_category": "SELECT * FROM assets WHERE category = ? ORDER BY name",
+    "asset_by_id": "SELECT * FROM assets WHERE id = ?",
+    "sprites_for_asset": "SELECT * FROM sprites WHERE asset_id = ?",
+    "animations_for_asset": "SELECT * FROM animations WHERE asset_id = ?",
+    "delete_sprites_for_asset": "DELETE FROM sprites WHERE asset_id = ?",
+    "delete_animations_for_asset": "DELETE FROM animations WHERE asset_id = ?",
+    "delete_asset": "DELETE FROM assets WHERE id = ?",
+    "search_assets": """
+        SELECT assets.* FROM assets_fts
+        JOIN assets ON assets.rowid = assets_fts.rowid
+        WHERE assets_fts MATCH ?
+        ORDER BY bm25(assets_fts, 0.0, 10.0, 4.0, 2.0, 5.0, 3.0)
+    """,
+    "assets_with_all_tags": """
+        SELECT assets.* FROM assets
+        JOIN (
+            SELECT asset_id FROM asset_tags
+            WHERE tag IN (SELECT value FROM json_each(?))
+            GROUP BY asset_id
+            HAVING count(*) = ?
+        ) AS matched ON matched.asset_id = assets.id
+        ORDER BY assets.category, assets.name
+    """,
+    "assets_with_any_tag": """
+        SELECT * FROM assets
+        WHERE id IN (SELECT asset_id FROM asset_tags WHERE tag IN (SELECT value FROM json_each(?)))
+        ORDER BY category, name
+    """,
+    "asset_stats": """
+        SELECT category, count(*), (SELECT count(*) FROM animations)
+        FROM assets GROUP BY category
+    """,
+    "recent_assets": "SELECT * FROM assets ORDER BY updated_at DESC LIMIT ?",
+    "record_file": "INSERT OR REPLACE INTO asset_files (path, asset_id, bytes, mtime) VALUES (?, ?, ?, ?)",
+    "forget_file": "DELETE FROM asset_files WHERE path = ?",
+    "tracked_files": "SELECT path FROM asset_files",
+    "disk_usage": "SELECT coalesce(sum(bytes), 0) FROM asset_files",
+    "disk_usage_for_asset": "SELECT coalesce(sum(bytes), 0) FROM asset_files WHERE asset_id = ?",
+    "disk_usage_by_asset": "SELECT asset_id, sum(bytes) FROM asset_files WHERE asset_id IS NOT NULL GROUP BY asset_id",
+    "tag_counts": "SELECT tag, count(*) FROM asset_tags GROUP BY tag ORDER BY tag",
+    "insert_asset_tag": "INSERT OR IGNORE INTO asset_tags (asset_id, tag) VALUES (?, ?)",
+    "delete_tags_for_asset": "DELETE FROM asset_tags WHERE asset_id = ?",
+    "search_assets_like": """
+        SELECT * FROM assets 
+        WHERE name LIKE ? OR category LIKE ? OR tags LIKE ? 
+        ORDER BY category, name
+    """
+}
+
+# Schema migrations applied in order after DATABASE_SCHEMA. The number of
+# migrations applied is stored in PRAGMA user_version, so only add new
+# entries to the end of this list - never edit or reorder shipped ones.
+DATABASE_MIGRATIONS = [
+    # 1: Indexes for per-asset lookups and the category/name listing
+    """
+    CREATE INDEX IF NOT EXISTS idx_sprites_asset_id ON sprites(asset_id);
+    CREATE INDEX IF NOT EXISTS idx_animations_asset_id ON animations(asset_id);
+    CREATE INDEX IF NOT EXISTS idx_assets_category_name ON assets(category, name);
+    """,
+    
+    # 2: Full-text search over assets and their sprite names. The FTS rowid
+    # mirrors assets.rowid; triggers keep it in sync. The BEFORE INSERT
+    # triggers drop stale entries because INSERT OR REPLACE doesn't fire
+    # delete triggers for the row it replaces. Skipped on SQLite builds
+    # without FTS5 (see FTS_MIGRATION).
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+        asset_id UNINDEXED, name, category, description, tags, sprite_names,
+        prefix = '2 3'
+    );
+    
+    CREATE TRIGGER IF NOT EXISTS assets_fts_before_insert BEFORE INSERT ON assets BEGIN
+        DELETE FROM assets_fts WHERE rowid = (SELECT rowid FROM assets WHERE id = new.id);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS assets_fts_after_insert AFTER INSERT ON assets BEGIN
+        INSERT INTO assets_fts (rowid, asset_id, name, category, description, tags, sprite_names)
+        VALUES (new.rowid, new.id, new.name, new.category, new.description, replace(new.tags, ',', ' '),
+                (SELECT group_concat(name, ' ') FROM sprites WHERE asset_id = new.id));
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS assets_fts_after_update AFTER UPDATE ON assets BEGIN
+        DELETE FROM assets_fts WHERE rowid = old.rowid;
+        INSERT INTO assets_fts (rowid, asset_id, name, category, description, tags, sprite_names)
+        VALUES (new.rowid, new.id, new.name, new.category, new.description, replace(new.tags, ',', ' '),
+                (SELECT group_concat(name, ' ') FROM sprites WHERE asset_id = new.id));
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS assets_fts_after_delete AFTER DELETE ON assets BEGIN
+        DELETE FROM assets_fts WHERE rowid = old.rowid;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS sprites_fts_before_insert BEFORE INSERT ON sprites BEGIN
+        UPDATE assets_fts SET sprite_names = (
+            SELECT group_concat(name, ' ') FROM sprites
+            WHERE asset_id = (SELECT asset_id FROM sprites WHERE id = new.id) AND id != new.id
+        )
+        WHERE rowid = (SELECT assets.rowid FROM assets JOIN sprites ON sprites.asset_id = assets.id
+                       WHERE sprites.id = new.id);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS sprites_fts_after_insert AFTER INSERT ON sprites BEGIN
+        UPDATE assets_fts SET sprite_names = (
+            SELECT group_concat(name, ' ') FROM sprites WHERE asset_id = new.asset_id
+        )
+        WHERE rowid = (SELECT rowid FROM assets WHERE id = new.asset_id);
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS sprites_fts_after_update AFTER UPDATE ON sprites BEGIN
+        UPDATE assets_fts SET sprite_names = (
+            SELECT group_concat(name, ' ') FROM sprites WHERE asset_id = assets_fts.asset_id
+        )
+        WHERE rowid IN (SELECT rowid FROM assets WHERE id IN (old.asset_id, new.asset_id));
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS sprites_fts_after_delete AFTER DELETE ON sprites BEGIN
+        UPDATE assets_fts SET sprite_names = (
+            SELECT group_concat(name, ' ') FROM sprites WHERE asset_id = old.asset_id
+        )
+        WHERE rowid = (SELECT rowid FROM assets WHERE id = old.asset_id);
+    END;
+    
+    INSERT INTO assets_fts (rowid, asset_id, name, category, description, tags, sprite_names)
+    SELECT rowid, id, name, category, description, replace(tags, ',', ' '),
+           (SELECT group_concat(name, ' ') FROM sprites WHERE sprites.asset_id = assets.id)
+    FROM assets;
+    """,
+    
+    # 3: Normalized tags. assets.tags stays as a denormalized copy for the
+    # full-text index; asset_tags is what tag queries run against. The
+    # existing comma-joined strings are split with a recursive CTE.
+    """
+    CREATE TABLE IF NOT EXISTS asset_tags (
+        asset_id TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (asset_id, tag)
+    ) WITHOUT ROWID;
+    
+    CREATE INDEX IF NOT EXISTS idx_asset_tags_tag ON asset_tags(tag, asset_id);
+    
+    INSERT OR IGNORE INTO asset_tags (asset_id, tag)
+    WITH RECURSIVE split(asset_id, tag, rest) AS (
+        SELECT id, '', tags || ',' FROM assets WHERE tags IS NOT NULL AND tags != ''
+        UNION ALL
+        SELECT asset_id, trim(substr(rest, 1, instr(rest, ',') - 1)), substr(rest, instr(rest, ',') + 1)
+        FROM split WHERE rest != ''
+    )
+    SELECT asset_id, tag FROM split WHERE tag != '';
+    
+    CREATE TRIGGER IF NOT EXISTS asset_tags_after_delete AFTER DELETE ON assets BEGIN
+        DELETE FROM asset_tags WHERE asset_id = old.id;
+    END;
+    """,
+    
+    # 4: Recently updated assets for the dashboard
+    """
+    CREATE INDEX IF NOT EXISTS idx_assets_updated_at ON assets(updated_at);
+    """,
+    
+    # 5: Per-file disk usage, so the dashboard can sum sizes without walking
+    # the asset directory. Files not referenced by an asset have no asset_id.
+    """
+    CREATE TABLE IF NOT EXISTS asset_files (
+        path TEXT PRIMARY KEY,
+        asset_id TEXT,
+        bytes INTEGER NOT NULL,
+        mtime REAL
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_asset_files_asset_id ON asset_files(asset_id);
+    
+    CREATE TRIGGER IF NOT EXISTS asset_files_after_delete AFTER DELETE ON assets BEGIN
+        DELETE FROM asset_files WHERE asset_id = old.id;
+    END;
+    """,
+    
+    # 6: File path lookups, so a disk scan attributes new files to their
+    # sprite or asset without scanning both tables per file
+    """
+    CREATE INDEX IF NOT EXISTS idx_sprites_file_path ON sprites(file_path);
+    CREATE INDEX IF NOT EXISTS idx_assets_file_path ON assets(file_path);
+    """
+]
+
+# Migration number of the FTS5 table. Without FTS5 it is recorded as applied
+# with config "full_text_search" = "unavailable", and searches use LIKE.
+FTS_MIGRATION = 2
+
+def fts5_available(conn):
+    """Return True if this SQLite build can create FTS5 tables"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(text)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+# Stored file path columns, re-keyed by DatabaseManager.normalize_stored_paths()
+FILE_PATH_COLUMNS = [
+    ("assets", "file_path"),
+    ("assets", "preview_path"),
+    ("sprites", "file_path"),
+    ("asset_files", "path")
+]
+
+def library_path(path, root=None):
+    """Return the form a file path is stored in the database
+    
+    Paths inside root are stored relative to it in POSIX form, so the database
+    still matches its files after the library is moved or opened on another
+    machine. Other paths are stored absolute. Relative paths are taken to be
+    relative to root.
+    """
+    if not path:
+        return path
+    if root:
+        path = os.path.join(root, path)
+        try:
+            relative = os.path.relpath(path, root)
+        except ValueError:
+            relative = None     # Different drive on Windows
+        if relative and relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+            return Path(relative).as_posix()
+    return Path(os.path.abspath(path)).as_posix()
+
 class DatabaseManager:
-    """SQLite database manager for sprite assets"""
+    """SQLite database manager for sprite assets
     
-    def __init__(self, db_path):
+    Safe to use from any thread. Each thread reads through its own connection,
+    so background workers can query concurrently under WAL, while every write
+    is handed to a single writer thread and applied in order. A reader
+    connection is closed once its thread has finished, or earlier through
+    release_connection().
+    
+    File paths are stored through library_path(), relative to library_root
+    when they are inside it.
+    """
+    
+    def __init__(self, db_path, library_root=None):
         """Initialize the database connection"""
         self.db_path = db_path
-        self.conn = None
+        self.library_root = os.path.abspath(library_root) if library_root else None
+        self._local = threading.local()     # Per-thread reader connection and open batch
+        self._connections = []              # Every connection opened, for close()
+        self._readers = {}                  # thread -> its reader connection
+        self._connections_lock = threading.Lock()
+        self._write_queue = queue.Queue()
+        self._writer_conn = None
+        self._writer_thread = None
+        self.full_text_search = False
         self.init_database()
     
+    def _connect(self):
+        """Open a tuned connection to the database"""
+        # Connections are only ever used by one thread, but close() may run on another
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in DATABASE_PRAGMAS:
+            conn.execute(pragma)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
+    def _close_connection(self, conn):
+        with self._connections_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+    
+    @property
+    def conn(self):
+        """The calling thread's read-only connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Short-lived workers don't close their connections; do it for them
+            with self._connections_lock:
+                finished = [thread for thread in self._readers if not thread.is_alive()]
+                stale = [self._readers.pop(thread) for thread in finished]
+            for old_conn in stale:
+                self._close_connection(old_conn)
+            
+            conn = self._connect()
+            # Writes must go through the writer thread
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._readers[threading.current_thread()] = conn
+        return conn
+    
+    def release_connection(self):
+        """Close the calling thread's reader connection, e.g. when a worker is done"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._connections_lock:
+                self._readers.pop(threading.current_thread(), None)
+            self._close_connection(conn)
+    
     def init_database(self):
-        """Initialize the database if it doesn't exist"""
+        """Initialize the database if it doesn't exist
+        
+        Errors are reported and leave the database as far as it got. If the
+        database can't be opened at all, writes raise instead of waiting for
+        a writer that never started.
+        """
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            cursor = self.conn.cursor()
+            # The writer manages its own transactions
+            self._writer_conn = self._connect()
+            self._writer_conn.isolation_level = None
+        except sqlite3.Error as e:
+            print(f"Database initialization error: {e}")
+            return
+        
+        try:
+            cursor = self._writer_conn.cursor()
             
             # Create tables from schema
             cursor.executescript(DATABASE_SCHEMA)
@@ -127,40 +473,313 @@ class DatabaseManager:
             # Insert default configuration if not present
             cursor.execute("INSERT OR IGNORE INTO config VALUES (?, ?)", ("last_directory", ""))
             
-            self.conn.commit()
+            # Bring older databases up to the current schema version
+            self.migrate()
+            self.normalize_stored_paths()
             print(f"Database initialized at {self.db_path}")
         except sqlite3.Error as e:
+            if self._writer_conn.in_transaction:
+                self._writer_conn.execute("ROLLBACK")
             print(f"Database initialization error: {e}")
+        
+        try:
+            row = self._writer_conn.execute(
+                "SELECT value FROM config WHERE key = 'full_text_search'"
+            ).fetchone()
+            version = self._writer_conn.execute("PRAGMA user_version").fetchone()[0]
+            self.full_text_search = version >= FTS_MIGRATION and not (row and row[0] == "unavailable")
+        except sqlite3.Error:
+            self.full_text_search = False
+        
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="DatabaseWriter", daemon=True)
+        self._writer_thread.start()
+    
+    def schema_version(self):
+        """Return the number of migrations applied to this database"""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def migrate(self):
+        """Apply any pending DATABASE_MIGRATIONS, each in its own transaction
+        
+        A failing migration is rolled back and its error raised; the ones
+        before it stay applied.
+        """
+        conn = self._writer_conn
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(DATABASE_MIGRATIONS[version:], start=version + 1):
+            if number == FTS_MIGRATION and not fts5_available(conn):
+                print("SQLite was built without FTS5; asset search will use substring matching")
+                migration = "INSERT OR REPLACE INTO config VALUES ('full_text_search', 'unavailable');"
+            try:
+                conn.executescript(f"BEGIN;\n{migration}\nPRAGMA user_version = {number};\nCOMMIT;")
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            print(f"Applied database migration {number}")
+    
+    def library_path(self, path):
+        """Return the stored form of a file path (see library_path())"""
+        return library_path(path, self.library_root)
+    
+    def full_path(self, path):
+        """Return the absolute path of a stored file path"""
+        return os.path.abspath(os.path.join(self.library_root or "", path))
+    
+    def normalize_stored_paths(self):
+        """Re-key stored file paths once for each new library root
+        
+        Rows written before paths were normalized, or under another library
+        root, would otherwise never match the paths a disk scan reports.
+        """
+        if not self.library_root:
+            return
+        
+        conn = self._writer_conn
+        row = conn.execute("SELECT value FROM config WHERE key = 'library_root'").fetchone()
+        if row and row[0] == self.library_root:
+            return
+        
+        conn.execute("BEGIN")
+        try:
+            for table, column in FILE_PATH_COLUMNS:
+                paths = [row[0] for row in conn.execute(
+                    f"SELECT DISTINCT {column} FROM {table} WHERE {column} != ''"
+                )]
+                conn.executemany(
+                    f"UPDATE OR REPLACE {table} SET {column} = ? WHERE {column} = ?",
+                    [(self.library_path(path), path) for path in paths if self.library_path(path) != path]
+                )
+            conn.execute("INSERT OR REPLACE INTO config VALUES ('library_root', ?)", (self.library_root,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def explain_queries(self):
+        """Return the EXPLAIN QUERY PLAN rows for every query in DATABASE_QUERIES
+        
+        Placeholder parameters are bound to NULL, which doesn't change the plan.
+        Returns {query_name: [plan detail strings]}.
+        """
+        plans = {}
+        for name, sql in DATABASE_QUERIES.items():
+            params = (None,) * sql.count("?")
+            rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            plans[name] = [row[-1] for row in rows]
+        return plans
     
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
+        """Finish any queued writes and close every connection"""
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._write_queue.put(None)
+            self._writer_thread.join()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            self._readers = {}
+        self._local = threading.local()
+    
+    def _writer_loop(self):
+        """Apply queued write jobs on the writer thread
+        
+        Jobs that queue up while a transaction is being committed are applied
+        together in the next one (group commit). Each job runs inside its own
+        savepoint, so a failing job is rolled back without affecting the rest.
+        """
+        conn = self._writer_conn
+        running = True
+        while running:
+            jobs = [self._write_queue.get()]
+            while True:
+                try:
+                    jobs.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            running = None not in jobs
+            jobs = [job for job in jobs if job is not None]
+            if not jobs:
+                continue
+            
+            finished = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for job, future in jobs:
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        result = job(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write_job")
+                        conn.execute("RELEASE write_job")
+                        future.set_exception(e)
+                    else:
+                        conn.execute("RELEASE write_job")
+                        finished.append((future, result))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for future, _ in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            # Only report success once the data is visible to readers
+            for future, result in finished:
+                future.set_result(result)
+    
+    def _write(self, job):
+        """Run job(connection) as one transaction on the writer thread
+        
+        Blocks until the job is committed and returns its result, re-raising
+        any exception it raised. Inside batch() the job is queued with the rest
+        of the batch instead and None is returned.
+        """
+        batch_jobs = getattr(self._local, "batch_jobs", None)
+        if batch_jobs is not None:
+            batch_jobs.append(job)
+            return None
+        
+        # A job that writes more is already inside the writer's transaction
+        if threading.current_thread() is self._writer_thread:
+            return job(self._writer_conn)
+        
+        # Nothing would ever run the job (the database failed to open, or was closed)
+        if self._writer_thread is None or not self._writer_thread.is_alive():
+            raise sqlite3.OperationalError(f"Database writer for {self.db_path} is not running")
+        
+        future = Future()
+        self._write_queue.put((job, future))
+        return future.result()
+    
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction that commits when the block exits
+        
+        Writes made inside the block on this thread are collected and applied
+        as a single writer job when the outermost block exits, so they are not
+        visible to reads inside the block. Batches can nest. An exception inside
+        the block discards the batch; a database error while applying it rolls
+        the whole batch back and is raised from the with statement.
+        """
+        if getattr(self._local, "batch_jobs", None) is not None:
+            yield self
+            return
+        
+        self._local.batch_jobs = []
+        try:
+            yield self
+            jobs = self._local.batch_jobs
+        finally:
+            self._local.batch_jobs = None
+        
+        if jobs:
+            self._write(lambda conn: [job(conn) for job in jobs])
+    
+    def _asset_tags(self, asset):
+        """Return an asset's tags stripped, de-duplicated and in their original order"""
+        tags = (tag.strip() for tag in asset.get("tags", []))
+        return list(dict.fromkeys(tag for tag in tags if tag))
+    
+    def _asset_row(self, asset):
+        """Build the assets table row for an asset dict"""
+        now = datetime.datetime.now().isoformat()
+        return (
+            asset.get("id") or str(uuid.uuid4()),
+            asset.get("name", ""),
+            asset.get("category", "Unknown"),
+            asset.get("description", ""),
+            ",".join(self._asset_tags(asset)),
+            asset.get("chr_bank", 0),
+            asset.get("width", 16),
+            asset.get("height", 16),
+            asset.get("created_at", now),
+            now,
+            self.library_path(asset.get("file_path", "")),
+            self.library_path(asset.get("preview_path", ""))
+        )
+    
+    def _sprite_row(self, sprite):
+        """Build the sprites table row for a sprite dict"""
+        return (
+            sprite.get("id") or str(uuid.uuid4()),
+            sprite.get("asset_id", ""),
+            sprite.get("name", ""),
+            sprite.get("animation_type", ""),
+            sprite.get("direction", ""),
+            sprite.get("frame_number", 0),
+            sprite.get("base_tile", 0),
+            json.dumps(sprite.get("tile_arrangement", [0, 1, 2, 3])),
+            self.library_path(sprite.get("file_path", ""))
+        )
+    
+    def _animation_row(self, animation):
+        """Build the animations table row for an animation dict"""
+        return (
+            animation.get("id") or str(uuid.uuid4()),
+            animation.get("asset_id", ""),
+            animation.get("name", ""),
+            animation.get("type", ""),
+            animation.get("direction", ""),
+            json.dumps(animation.get("frames", [])),
+            animation.get("frame_duration", 100),
+            1 if animation.get("loop", True) else 0
+        )
+    
+    def _write_asset_tags(self, cursor, rows):
+        """Replace the asset_tags rows for the given assets table rows"""
+        cursor.executemany(DATABASE_QUERIES["delete_tags_for_asset"], [(row[0],) for row in rows])
+        cursor.executemany(
+            DATABASE_QUERIES["insert_asset_tag"],
+            [(row[0], tag) for row in rows for tag in row[4].split(",") if tag]
+        )
+    
+    def _assets_from_cursor(self, cursor):
+        """Turn the rows of an assets query into asset dicts with a tags list"""
+        columns = [col[0] for col in cursor.description]
+        result = []
+        for row in cursor.fetchall():
+            asset = dict(zip(columns, row))
+            asset["tags"] = asset.get("tags", "").split(",") if asset.get("tags") else []
+            result.append(asset)
+        return result
+    
+    def _file_rows(self, files):
+        """Stat (stored path, asset_id) files, returning (rows to record, rows to forget)"""
+        recorded = []
+        missing = []
+        for path, asset_id in files:
+            if not path:
+                continue
+            try:
+                stat = os.stat(self.full_path(path))
+                recorded.append((path, asset_id, stat.st_size, stat.st_mtime))
+            except OSError:
+                missing.append((path,))
+        return recorded, missing
+    
+    def _write_file_rows(self, cursor, file_rows):
+        """Apply the result of _file_rows()"""
+        recorded, missing = file_rows
+        cursor.executemany(DATABASE_QUERIES["record_file"], recorded)
+        cursor.executemany(DATABASE_QUERIES["forget_file"], missing)
     
     def add_asset(self, asset):
         """Add or update an asset in the database"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO assets 
-                (id, name, category, description, tags, chr_bank, width, height, created_at, updated_at, file_path, preview_path) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                asset.get("id", str(uuid.uuid4())),
-                asset.get("name", ""),
-                asset.get("category", "Unknown"),
-                asset.get("description", ""),
-                ",".join(asset.get("tags", [])),
-                asset.get("chr_bank", 0),
-                asset.get("width", 16),
-                asset.get("height", 16),
-                asset.get("created_at", datetime.datetime.now().isoformat()),
-                datetime.datetime.now().isoformat(),
-                asset.get("file_path", ""),
-                asset.get("preview_path", "")
-            ))
-            self.conn.commit()
-            return asset.get("id", str(uuid.uuid4()))
+            row = self._asset_row(asset)
+            file_rows = self._file_rows([(row[10], row[0]), (row[11], row[0])])
+            
+            def job(conn):
+                cursor = conn.cursor()
+                cursor.execute(DATABASE_QUERIES["insert_asset"], row)
+                self._write_asset_tags(cursor, [row])
+                self._write_file_rows(cursor, file_rows)
+            
+            self._write(job)
+            return row[0]
         except sqlite3.Error as e:
             print(f"Error adding asset: {e}")
             return None
@@ -168,23 +787,15 @@ class DatabaseManager:
     def add_sprite(self, sprite):
         """Add or update a sprite in the database"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO sprites
-                (id, asset_id, name, animation_type, direction, frame_number, base_tile, tile_arrangement, file_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                sprite.get("id", str(uuid.uuid4())),
-                sprite.get("asset_id", ""),
-                sprite.get("name", ""),
-                sprite.get("animation_type", ""),
-                sprite.get("direction", ""),
-                sprite.get("frame_number", 0),
-                sprite.get("base_tile", 0),
-                json.dumps(sprite.get("tile_arrangement", [0, 1, 2, 3])),
-                sprite.get("file_path", "")
-            ))
-            self.conn.commit()
+            row = self._sprite_row(sprite)
+            file_rows = self._file_rows([(row[8], row[1])])
+            
+            def job(conn):
+                cursor = conn.cursor()
+                cursor.execute(DATABASE_QUERIES["insert_sprite"], row)
+                self._write_file_rows(cursor, file_rows)
+            
+            self._write(job)
             return True
         except sqlite3.Error as e:
             print(f"Error adding sprite: {e}")
@@ -193,43 +804,52 @@ class DatabaseManager:
     def add_animation(self, animation):
         """Add or update an animation in the database"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT OR REPLACE INTO animations
-                (id, asset_id, name, type, direction, frames, frame_duration, loop)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                animation.get("id", str(uuid.uuid4())),
-                animation.get("asset_id", ""),
-                animation.get("name", ""),
-                animation.get("type", ""),
-                animation.get("direction", ""),
-                json.dumps(animation.get("frames", [])),
-                animation.get("frame_duration", 100),
-                1 if animation.get("loop", True) else 0
-            ))
-            self.conn.commit()
+            row = self._animation_row(animation)
+            self._write(lambda conn: conn.execute(DATABASE_QUERIES["insert_animation"], row))
             return True
         except sqlite3.Error as e:
             print(f"Error adding animation: {e}")
             return False
     
+    def bulk_import(self, assets=(), sprites=(), animations=()):
+        """Add or update many assets, sprites and animations in one transaction
+        
+        Uses executemany for each table, so importing thousands of extracted
+        sprites costs a single commit. Either everything is imported or, on
+        error, nothing is.
+        """
+        try:
+            # Build rows and stat files on the calling thread; the writer only runs SQL
+            asset_rows = [self._asset_row(a) for a in assets]
+            sprite_rows = [self._sprite_row(s) for s in sprites]
+            animation_rows = [self._animation_row(a) for a in animations]
+            file_rows = self._file_rows([(row[10], row[0]) for row in asset_rows] +
+                                        [(row[11], row[0]) for row in asset_rows] +
+                                        [(row[8], row[1]) for row in sprite_rows])
+            
+            def job(conn):
+                cursor = conn.cursor()
+                cursor.executemany(DATABASE_QUERIES["insert_asset"], asset_rows)
+                self._write_asset_tags(cursor, asset_rows)
+                cursor.executemany(DATABASE_QUERIES["insert_sprite"], sprite_rows)
+                self._write_file_rows(cursor, file_rows)
+                cursor.executemany(DATABASE_QUERIES["insert_animation"], animation_rows)
+            
+            self._write(job)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error importing assets: {e}")
+            return False
+    
     def get_all_assets(self, category=None):
         """Get all assets, optionally filtered by category"""
         try:
             cursor = self.conn.cursor()
             if category:
-                cursor.execute("SELECT * FROM assets WHERE category = ?", (category,))
+                cursor.execute(DATABASE_QUERIES["assets_by_category"], (category,))
             else:
-                cursor.execute("SELECT * FROM assets ORDER BY category, name")
-            
-            columns = [col[0] for col in cursor.description]
-            result = []
-            for row in cursor.fetchall():
-                asset = dict(zip(columns, row))
-                asset["tags"] = asset.get("tags", "").split(",") if asset.get("tags") else []
-                result.append(asset)
-            return result
+                cursor.execute(DATABASE_QUERIES["all_assets"])
+            return self._assets_from_cursor(cursor)
         except sqlite3.Error as e:
             print(f"Error getting assets: {e}")
             return []
@@ -238,14 +858,9 @@ class DatabaseManager:
         """Get a single asset by ID"""
         try:
             cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM assets WHERE id = ?", (asset_id,))
-            row = cursor.fetchone()
-            if row:
-                columns = [col[0] for col in cursor.description]
-                asset = dict(zip(columns, row))
-                asset["tags"] = asset.get("tags", "").split(",") if asset.get("tags") else []
-                return asset
-            return None
+            cursor.execute(DATABASE_QUERIES["asset_by_id"], (asset_id,))
+            assets = self._assets_from_cursor(cursor)
+            return assets[0] if assets else None
         except sqlite3.Error as e:
             print(f"Error getting asset: {e}")
             return None
@@ -254,7 +869,7 @@ class DatabaseManager:
         """Get all sprites for a specific asset"""
         try:
             cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM sprites WHERE asset_id = ?", (asset_id,))
+            cursor.execute(DATABASE_QUERIES["sprites_for_asset"], (asset_id,))
             
             columns = [col[0] for col in cursor.description]
             result = []
@@ -271,7 +886,7 @@ class DatabaseManager:
         """Get all animations for a specific asset"""
         try:
             cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM animations WHERE asset_id = ?", (asset_id,))
+            cursor.execute(DATABASE_QUERIES["animations_for_asset"], (asset_id,))
             
             columns = [col[0] for col in cursor.description]
             result = []
@@ -287,41 +902,202 @@ class DatabaseManager:
     
     def delete_asset(self, asset_id):
         """Delete an asset and all related sprites and animations"""
-        try:
-            cursor = self.conn.cursor()
+        def job(conn):
+            cursor = conn.cursor()
             # Delete related sprites first
-            cursor.execute("DELETE FROM sprites WHERE asset_id = ?", (asset_id,))
+            cursor.execute(DATABASE_QUERIES["delete_sprites_for_asset"], (asset_id,))
             # Delete related animations
-            cursor.execute("DELETE FROM animations WHERE asset_id = ?", (asset_id,))
+            cursor.execute(DATABASE_QUERIES["delete_animations_for_asset"], (asset_id,))
             # Delete the asset
-            cursor.execute("DELETE FROM assets WHERE id = ?", (asset_id,))
-            self.conn.commit()
+            cursor.execute(DATABASE_QUERIES["delete_asset"], (asset_id,))
+        
+        try:
+            self._write(job)
             return True
         except sqlite3.Error as e:
             print(f"Error deleting asset: {e}")
             return False
     
     def search_assets(self, query):
-        """Search assets by name, category, or tags"""
+        """Search assets by name, category, description, tags or sprite names
+        
+        Every word in the query is matched as a prefix ("gob sw" finds
+        "Goblin Swordsman"), and results are ordered by relevance, with name
+        matches ranked highest.
+        """
+        words = re.findall(r"\w+", query)
+        if not words:
+            return self.get_all_assets()
+        
+        match = " ".join(f'"{word}"*' for word in words)
         try:
             cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT * FROM assets 
-                WHERE name LIKE ? OR category LIKE ? OR tags LIKE ? 
-                ORDER BY category, name
-            """, (f"%{query}%", f"%{query}%", f"%{query}%"))
-            
-            columns = [col[0] for col in cursor.description]
-            result = []
-            for row in cursor.fetchall():
-                asset = dict(zip(columns, row))
-                asset["tags"] = asset.get("tags", "").split(",") if asset.get("tags") else []
-                result.append(asset)
-            return result
+            if self.full_text_search:
+                cursor.execute(DATABASE_QUERIES["search_assets"], (match,))
+            else:
+                # SQLite built without FTS5 - fall back to substring matching
+                cursor.execute(DATABASE_QUERIES["search_assets_like"], (f"%{query}%", f"%{query}%", f"%{query}%"))
+            return self._assets_from_cursor(cursor)
         except sqlite3.Error as e:
             print(f"Error searching assets: {e}")
             return []
 
+    def find_assets_by_tags(self, tags, match="all"):
+        """Get the assets tagged with all (match="all") or any (match="any") of the given tags
+        
+        The filtering runs in SQL against the asset_tags index, so only the
+        matching assets are loaded.
+        """
+        tags = list(dict.fromkeys(tag.strip() for tag in tags if tag.strip()))
+        if not tags:
+            return self.get_all_assets()
+        if match not in ("all", "any"):
+            raise ValueError(f"match must be 'all' or 'any', not {match!r}")
+        
+        try:
+            cursor = self.conn.cursor()
+            if match == "all":
+                cursor.execute(DATABASE_QUERIES["assets_with_all_tags"], (json.dumps(tags), len(tags)))
+            else:
+                cursor.execute(DATABASE_QUERIES["assets_with_any_tag"], (json.dumps(tags),))
+            return self._assets_from_cursor(cursor)
+        except sqlite3.Error as e:
+            print(f"Error finding assets by tag: {e}")
+            return []
+    
+    def stats(self):
+        """Get the dashboard counts with a single grouped query
+        
+        Returns {"total_assets", "animations", "categories": {category: count}}.
+        """
+        result = {"total_assets": 0, "animations": 0, "categories": {}}
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(DATABASE_QUERIES["asset_stats"])
+            for category, count, animation_count in cursor.fetchall():
+                result["categories"][category] = count
+                result["total_assets"] += count
+                result["animations"] = animation_count
+            
+            # No assets means no groups, but orphaned animations still count
+            if not result["categories"]:
+                result["animations"] = self.conn.execute("SELECT count(*) FROM animations").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error getting statistics: {e}")
+        return result
+    
+    def recent(self, n=10):
+        """Get the n most recently updated assets, newest first"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(DATABASE_QUERIES["recent_assets"], (n,))
+            return self._assets_from_cursor(cursor)
+        except sqlite3.Error as e:
+            print(f"Error getting recent assets: {e}")
+            return []
+    
+    def disk_usage(self, asset_id=None):
+        """Get the tracked size in bytes of every file, or of one asset's files"""
+        try:
+            if asset_id is None:
+                return self.conn.execute(DATABASE_QUERIES["disk_usage"]).fetchone()[0]
+            return self.conn.execute(DATABASE_QUERIES["disk_usage_for_asset"], (asset_id,)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error getting disk usage: {e}")
+            return 0
+    
+    def disk_usage_by_asset(self):
+        """Get {asset_id: bytes} for every asset with tracked files"""
+        try:
+            return dict(self.conn.execute(DATABASE_QUERIES["disk_usage_by_asset"]).fetchall())
+        except sqlite3.Error as e:
+            print(f"Error getting disk usage: {e}")
+            return {}
+    
+    def tracked_files(self):
+        """Get the paths of every file whose size is tracked"""
+        try:
+            return [self.full_path(row[0]) for row in self.conn.execute(DATABASE_QUERIES["tracked_files"])]
+        except sqlite3.Error as e:
+            print(f"Error getting tracked files: {e}")
+            return []
+    
+    def apply_disk_scan(self, scan):
+        """Reconcile tracked file sizes with the result of scan_disk_usage()
+        
+        scan maps absolute paths to (bytes, mtime), or None for files that no
+        longer exist. New files are attributed to the asset or sprite that
+        references them, if any. Paths are compared in their stored form.
+        """
+        found = [(self.library_path(path), entry[0], entry[1]) for path, entry in scan.items() if entry is not None]
+        gone = [(self.library_path(path),) for path, entry in scan.items() if entry is None]
+        
+        def job(conn):
+            cursor = conn.cursor()
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS disk_scan (path TEXT PRIMARY KEY, bytes INTEGER, mtime REAL)")
+            cursor.execute("DELETE FROM disk_scan")
+            cursor.executemany("INSERT INTO disk_scan VALUES (?, ?, ?)", found)
+            cursor.executemany(DATABASE_QUERIES["forget_file"], gone)
+            
+            # Keep existing attributions; look new files up in one joined pass
+            cursor.execute("""
+                INSERT OR REPLACE INTO asset_files (path, asset_id, bytes, mtime)
+                SELECT disk_scan.path,
+                       coalesce(asset_files.asset_id, sprites.asset_id, assets.id),
+                       disk_scan.bytes, disk_scan.mtime
+                FROM disk_scan
+                LEFT JOIN asset_files ON asset_files.path = disk_scan.path
+                LEFT JOIN sprites ON sprites.file_path = disk_scan.path
+                LEFT JOIN assets ON assets.file_path = disk_scan.path
+                GROUP BY disk_scan.path
+            """)
+            cursor.execute("DELETE FROM disk_scan")
+        
+        try:
+            self._write(job)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error applying disk scan: {e}")
+            return False
+    
+    def get_tag_counts(self):
+        """Get {tag: number of assets} for every tag in use"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(DATABASE_QUERIES["tag_counts"])
+            return dict(cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"Error getting tags: {e}")
+            return {}
+
+def scan_disk_usage(root_dir, paths=()):
+    """Stat every file under root_dir plus the given paths
+    
+    Touches only the filesystem, so it is safe to run on a background thread.
+    Returns {absolute path: (bytes, mtime)} with None for paths that are gone.
+    With root_dir None only the given paths are checked.
+    """
+    scan = {}
+    for dirpath, dirnames, filenames in (os.walk(root_dir) if root_dir else ()):
+        for filename in filenames:
+            path = os.path.abspath(os.path.join(dirpath, filename))
+            try:
+                stat = os.stat(path)
+                scan[path] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                scan[path] = None
+    
+    for path in paths:
+        if path in scan:
+            continue
+        try:
+            stat = os.stat(path)
+            scan[path] = (stat.st_size, stat.st_mtime)
+        except OSError:
+            scan[path] = None
+    
+    return scan
+
 class ArkistaSpriteToolkit:
     """Main application for the Arkista Sprite Toolkit: Enhanced Edition"""
     
@@ -345,13 +1121,18 @@ class ArkistaSpriteToolkit:
         self.app_dir = os.path.join(os.path.expanduser("~"), ".arkista_toolkit")
         os.makedirs(self.app_dir, exist_ok=True)
         
-        # Database initialization
+        # Database initialization; file paths are stored relative to the assets directory
+        self.assets_dir = os.path.join(self.app_dir, "assets")
         self.db_path = os.path.join(self.app_dir, "sprite_database.db")
-        self.db = DatabaseManager(self.db_path)
+        self.db = DatabaseManager(self.db_path, self.assets_dir)
+        
+        # Previews and image hashes are disposable caches that write from the UI
+        # thread, so they get their own file instead of competing with the writer
+        self.cache_db_path = os.path.join(self.app_dir, "sprite_cache.db")
+        self.thumbnails = ThumbnailCache(self.cache_db_path)
         
         # Common data that will be shared between tabs
         self.sprite_data = {}
-        self.assets_dir = os.path.join(self.app_dir, "assets")
         os.makedirs(self.assets_dir, exist_ok=True)
         self.sprites_dir = os.path.join(self.assets_dir, "sprites")
         os.makedirs(self.sprites_dir, exist_ok=True)
@@ -401,6 +1182,15 @@ class ArkistaSpriteToolkit:
         # Setup UI
         self.setup_ui()
         
+        # Reconcile the stored disk usage with what's actually on disk
+        self.rescan_disk_usage()
+        
+        # After that, files changing under the assets directory are applied one by one
+        self.changed_images = queue.Queue()
+        self.watcher = AssetWatcher(self.assets_dir, self.apply_file_events)
+        self.watcher.start()
+        self.root.after(500, self.poll_file_events)
+        
     def setup_ui(self):
         """Set up the main UI with tabs and wizard"""
         # Create main container
@@ -473,10 +1263,11 @@ class ArkistaSpriteToolkit:
         # Update the asset count
         self.update_asset_count()
     
-    def update_asset_count(self):
+    def update_asset_count(self, total=None):
         """Update the asset counter in the status bar"""
-        assets = self.db.get_all_assets()
-        self.asset_count_var.set(f"Assets: {len(assets)}")
+        if total is None:
+            total = self.db.stats()["total_assets"]
+        self.asset_count_var.set(f"Assets: {total}")
         
     def update_status(self, message):
         """Update the status message"""
@@ -787,55 +1578,77 @@ class ArkistaSpriteToolkit:
         # Update recent assets listbox
         self.recent_listbox.delete(0, tk.END)
         
-        # Get all assets ordered by updated_at
-        assets = self.db.get_all_assets()
-        # Sort by updated_at if available
-        try:
-            assets.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
-        except:
-            pass
-        
-        # Take just the first 10
-        recent_assets = assets[:10]
+        # Most recently updated assets, straight from the updated_at index
+        recent_assets = self.db.recent(10)
+        self.recent_asset_ids = [asset['id'] for asset in recent_assets]
         for asset in recent_assets:
             self.recent_listbox.insert(tk.END, f"{asset['name']} ({asset['category']})")
         
         # Update statistics
-        self.stats_labels["Total Assets"].set(str(len(assets)))
-        
-        # Count by category
-        player_count = len([a for a in assets if a['category'] == 'Player'])
-        enemy_count = len([a for a in assets if a['category'] == 'Enemy'])
-        item_count = len([a for a in assets if a['category'] == 'Item'])
+        stats = self.db.stats()
+        categories = stats["categories"]
+        self.stats_labels["Total Assets"].set(str(stats["total_assets"]))
+        self.stats_labels["Player Sprites"].set(str(categories.get('Player', 0)))
+        self.stats_labels["Enemy Sprites"].set(str(categories.get('Enemy', 0)))
+        self.stats_labels["Items"].set(str(categories.get('Item', 0)))
+        self.stats_labels["Animations"].set(str(stats["animations"]))
         
-        self.stats_labels["Player Sprites"].set(str(player_count))
-        self.stats_labels["Enemy Sprites"].set(str(enemy_count))
-        self.stats_labels["Items"].set(str(item_count))
+        # Update disk usage from the tracked file sizes
+        self.update_disk_progress()
         
-        # Count animations
-        animation_count = 0
-        for asset in assets:
-            animations = self.db.get_animations_for_asset(asset['id'])
-            animation_count += len(animations)
+        # Update status bar
+        self.update_asset_count(stats["total_assets"])
+    
+    def update_disk_progress(self):
+        """Show the tracked disk usage as a percentage of 1GB"""
+        total_size = self.db.disk_usage()
+        self.disk_progress['value'] = min(100, (total_size / (1024 * 1024 * 1024)) * 100)
+    
+    def rescan_disk_usage(self):
+        """Re-measure the asset files and reconcile the database on a background thread"""
+        if getattr(self, "disk_scan_thread", None) and self.disk_scan_thread.is_alive():
+            return
         
-        self.stats_labels["Animations"].set(str(animation_count))
+        def scan():
+            # DatabaseManager is thread-safe, so the whole job stays off the UI thread
+            try:
+                self.db.apply_disk_scan(scan_disk_usage(self.assets_dir, self.db.tracked_files()))
+            finally:
+                self.db.release_connection()
         
-        # Update disk usage
-        try:
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(self.assets_dir):
-                for f in filenames:
-                    fp = os.path.join(dirpath, f)
-                    total_size += os.path.getsize(fp)
-            
-            # Set progress to percentage of 1GB
-            disk_pct = min(100, (total_size / (1024 * 1024 * 1024)) * 100)
-            self.disk_progress['value'] = disk_pct
-        except Exception as e:
-            print(f"Error calculating disk usage: {e}")
+        self.disk_scan_thread = threading.Thread(target=scan, daemon=True)
+        self.disk_scan_thread.start()
+        self.root.after(200, self.finish_disk_rescan)
+    
+    def finish_disk_rescan(self):
+        """Refresh the disk usage bar once the background rescan is done"""
+        if self.disk_scan_thread.is_alive():
+            self.root.after(200, self.finish_disk_rescan)
+            return
         
-        # Update status bar
-        self.update_asset_count()
+        self.update_disk_progress()
+    
+    def apply_file_events(self, events):
+        """Reconcile the files a watcher reported (runs on the watcher thread)"""
+        # DatabaseManager is thread-safe; only the Tk side is left for poll_file_events
+        self.db.apply_disk_scan(scan_disk_usage(None, [os.path.abspath(path) for _, path in events]))
+        self.changed_images.put([path for _, path in events if path.lower().endswith('.png')])
+    
+    def poll_file_events(self):
+        """Drop stale thumbnails and refresh the disk usage bar after watched files change"""
+        changed = False
+        while True:
+            try:
+                paths = self.changed_images.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            for path in paths:
+                self.thumbnails.invalidate(path)
+        
+        if changed:
+            self.update_disk_progress()
+        self.root.after(500, self.poll_file_events)
     
     def select_recent_asset(self, event):
         """Handle selecting an asset from the recent list"""
@@ -843,15 +1656,13 @@ class ArkistaSpriteToolkit:
             return
         
         index = self.recent_listbox.curselection()[0]
-        # Get all assets ordered by updated_at
-        assets = self.db.get_all_assets()
-        try:
-            assets.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
-        except:
-            pass
+        # The listbox rows line up with the ids loaded by update_dashboard
+        if index < len(self.recent_asset_ids):
+            asset = self.db.get_asset_by_id(self.recent_asset_ids[index])
+        else:
+            asset = None
         
-        if index < len(assets):
-            asset = assets[index]
+        if asset:
             self.current_asset = asset
             # Switch to asset manager tab
             self.notebook.select(1)  # Asset Manager tab index
@@ -875,6 +1686,7 @@ class ArkistaSpriteToolkit:
         menubar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Bulk Tag Similar Sprites", command=self.bulk_tag_similar)
         tools_menu.add_command(label="Auto-Detect All Animations", command=self.detect_all_animations)
+        tools_menu.add_command(label="Rescan Disk Usage", command=self.rescan_disk_usage)
         
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -1140,6 +1952,8 @@ Created for Craven Caverns NES roguelike project."""
         self.base_directory = directory  # Store the base directory for resolving paths
         self.sprite_listbox.delete(0, tk.END)
         self.sprite_data = {}
+        self.similarity_index = None  # Rebuilt on demand for the new directory
+        flush_metadata(directory)  # Saves still queued for this directory must land before reading
         
         # Load all PNG files from directory
         loaded_count = 0
@@ -1238,25 +2052,128 @@ Created for Craven Caverns NES roguelike project."""
                     notes = data['notes'].replace('\n', '\n  ')
                     f.write(f"  Notes: {notes}\n")
     
+    def get_similarity_index(self):
+        """Return the perceptual hash index of the loaded sprites, building it if needed"""
+        if getattr(self, "similarity_index", None) is None:
+            # Hashes are cached in the cache database, so only new or changed files are decoded
+            self.similarity_index = SimilarityIndex(self.cache_db_path)
+            self.similarity_index.add_images(
+                (sprite_path, os.path.join(self.base_directory, sprite_path)) for sprite_path in self.sprite_data
+            )
+        return self.similarity_index
+    
+    def write_sprite_metadata(self, sprite_path):
+        """Queue a coalesced write of one sprite's metadata next to its image"""
+        metadata_path = os.path.splitext(os.path.join(self.base_directory, sprite_path))[0] + '.json'
+        write_json(metadata_path, self.sprite_data[sprite_path])
+    
     def bulk_tag_similar(self):
-        """Bulk tag similar sprites across the entire set"""
+        """Bulk tag similar sprites across the entire set
+        
+        Every sprite still typed "Unknown" takes the type of its most similar
+        tagged sprite, if one is within the chosen distance.
+        """
         if not self.sprite_data:
             messagebox.showinfo("No Data", "No sprite data to process")
             return
+        
+        max_distance = simpledialog.askinteger(
+            "Bulk Tag Similar", "Maximum difference between sprites (0-64 bits):",
+            initialvalue=DEFAULT_MAX_DISTANCE, minvalue=0, maxvalue=64
+        )
+        if max_distance is None:
+            return
+        
+        self.update_status("Indexing sprites...")
+        index = self.get_similarity_index()
+        
+        tag_count = 0
+        for sprite_path, data in self.sprite_data.items():
+            if data.get("type", "Unknown") != "Unknown":
+                continue
             
-        # This is a simplified implementation
-        # A real implementation would use image similarity algorithms
-        messagebox.showinfo("Bulk Tagging", "Bulk tagging not yet implemented")
+            # Results are nearest first, so the first tagged neighbor wins
+            for _, other_path in index.find_similar(sprite_path, max_distance):
+                other_type = self.sprite_data[other_path].get("type", "Unknown")
+                if other_type != "Unknown":
+                    data["type"] = other_type
+                    self.write_sprite_metadata(sprite_path)
+                    tag_count += 1
+                    break
+        
+        self.update_status(f"Tagged {tag_count} sprites")
+        messagebox.showinfo("Bulk Tagging", f"Applied tags to {tag_count} similar sprites")
     
     def detect_all_animations(self):
         """Auto-detect animation sequences across the entire set"""
         if not self.sprite_data:
             messagebox.showinfo("No Data", "No sprite data to process")
             return
+        
+        # Numbered sheet dumps need the pixel check to split unrelated sprites apart
+        check_pixels = messagebox.askyesno(
+            "Animation Detection", "Confirm sequences by comparing consecutive frames?\n"
+            "(Slower, but splits numbered sprite sheets into separate animations)"
+        )
+        
+        self.update_status("Detecting animations...")
+        frame_check = None
+        if check_pixels:
+            image_paths = {path: os.path.join(self.base_directory, path) for path in self.sprite_data}
+            frame_check = make_pixel_check(image_paths)
+        sequences = detect_sequences(self.sprite_data, frame_check)
+        
+        if not sequences:
+            self.update_status("No animations detected")
+            messagebox.showinfo("Animation Detection", "No animation sequences detected")
+            return
+        
+        # One asset per sprite prefix. Ids come from paths relative to the sprite
+        # directory, so re-running (or importing another checkout) updates in place
+        assets = {}
+        sprites = []
+        animations = []
+        for sequence in sequences:
+            asset_key = os.path.join(self.base_directory, sequence["prefix"])
+            asset_id = stable_id("asset", "detected", Path(sequence["prefix"]).as_posix())
+            assets.setdefault(asset_id, {
+                "id": asset_id,
+                "name": os.path.basename(sequence["prefix"]),
+                "category": "Unknown",
+                "description": f"Detected from {asset_key}"
+            })
             
-        # This is a simplified implementation
-        # A real implementation would detect sequences based on filename patterns
-        messagebox.showinfo("Animation Detection", "Animation detection not yet implemented")
+            sprite_ids = []
+            for sprite_path, frame_number in zip(sequence["frames"], sequence["frame_numbers"]):
+                file_path = os.path.join(self.base_directory, sprite_path)
+                sprite_id = stable_id("sprite", asset_id, Path(sprite_path).as_posix())
+                sprite_ids.append(sprite_id)
+                sprites.append({
+                    "id": sprite_id,
+                    "asset_id": asset_id,
+                    "name": self.sprite_data[sprite_path].get("name", os.path.basename(sprite_path)),
+                    "animation_type": sequence["type"],
+                    "direction": sequence["direction"],
+                    "frame_number": frame_number,
+                    "file_path": file_path
+                })
+            
+            animations.append({
+                "id": stable_id("animation", asset_id, sequence["name"], sequence["type"], sequence["direction"]),
+                "asset_id": asset_id,
+                "name": sequence["name"],
+                "type": sequence["type"],
+                "direction": sequence["direction"],
+                "frames": sprite_ids
+            })
+        
+        if self.db.bulk_import(assets.values(), sprites, animations):
+            self.update_status(f"Detected {len(animations)} animations")
+            messagebox.showinfo("Animation Detection",
+                                f"Detected {len(animations)} animations covering {len(sprites)} sprites")
+            self.update_dashboard()
+        else:
+            messagebox.showerror("Error", "Could not save the detected animations")
     
     # --- Sprite Manager Tab Methods ---
     
@@ -1282,9 +2199,6 @@ Created for Craven Caverns NES roguelike project."""
         image_path = os.path.join(self.base_directory, self.current_sprite)
         
         try:
-            # Load the image
-            image = Image.open(image_path)
-            
             # Get configuration dimensions
             width, height = self.sprite_configs[self.current_config]
             
@@ -1293,8 +2207,8 @@ Created for Craven Caverns NES roguelike project."""
             new_width = width * 8 * scale
             new_height = height * 8 * scale
             
-            # Resize with nearest neighbor for pixel art
-            image = image.resize((new_width, new_height), Image.NEAREST)
+            # Scaled with nearest neighbor for pixel art, decoded only on a cache miss
+            image = self.thumbnails.thumbnail(image_path, size=(new_width, new_height))
             photo = ImageTk.PhotoImage(image)
             
             self.sprite_preview.configure(image=photo)
@@ -1358,11 +2272,7 @@ Created for Craven Caverns NES roguelike project."""
         
         # Save to JSON file
         if hasattr(self, 'base_directory'):
-            image_path = os.path.join(self.base_directory, self.current_sprite)
-            metadata_path = os.path.splitext(image_path)[0] + '.json'
-            
-            with open(metadata_path, 'w') as f:
-                json.dump(self.sprite_data[self.current_sprite], f, indent=2)
+            self.write_sprite_metadata(self.current_sprite)
             
             messagebox.showinfo("Saved", f"Saved metadata for {self.current_sprite}")
     
@@ -1370,10 +2280,25 @@ Created for Craven Caverns NES roguelike project."""
         """Apply current sprite's tags to visually similar sprites"""
         if not self.current_sprite or not self.sprite_data:
             return
-            
-        # This is a simplified implementation
-        # A real implementation would use image similarity algorithms
-        messagebox.showinfo("Tag Similar", "Tag similar feature not yet implemented")
+        
+        current_type = self.type_combo.get()
+        if current_type == "Unknown":
+            messagebox.showwarning("Warning", "Please set a specific type before tagging similar sprites")
+            return
+        
+        similar = self.get_similarity_index().find_similar(self.current_sprite, DEFAULT_MAX_DISTANCE)
+        if not similar:
+            messagebox.showinfo("Tag Similar", "No similar sprites found")
+            return
+        
+        if not messagebox.askyesno("Confirm", f"Apply '{current_type}' type to {len(similar)} similar sprites?"):
+            return
+        
+        for _, sprite_path in similar:
+            self.sprite_data[sprite_path]["type"] = current_type
+            self.write_sprite_metadata(sprite_path)
+        
+        messagebox.showinfo("Tagging Complete", f"Applied tags to {len(similar)} similar sprites")
     
     def detect_animations(self):
         """Auto-detect animation sequences in the current selection"""
@@ -1695,7 +2620,32 @@ Created for Craven Caverns NES roguelike project."""
         messagebox.showinfo("Metadata Saved", f"Saved metadata to {filepath}")
 
 
+def print_query_plans(db_path):
+    """Print EXPLAIN QUERY PLAN output for every DatabaseManager query"""
+    db = DatabaseManager(db_path)
+    print(f"Schema version: {db.schema_version()}")
+    for name, plan in db.explain_queries().items():
+        print(f"\n{name}:")
+        for detail in plan:
+            # Full table scans are what the indexes are there to prevent
+            flag = "  <-- full scan" if detail.startswith("SCAN") and "INDEX" not in detail else ""
+            print(f"  {detail}{flag}")
+    db.close()
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Arkista Sprite Toolkit")
+    parser.add_argument("--explain-queries", action="store_true",
+                        help="Print the query plan of every database query and exit")
+    parser.add_argument("--db", default=os.path.join(os.path.expanduser("~"), ".arkista_toolkit", "sprite_database.db"),
+                        help="Database to use with --explain-queries")
+    args = parser.parse_args()
+    
+    if args.explain_queries:
+        print_query_plans(args.db)
+        sys.exit(0)
+    
     root = tk.Tk()
     app = ArkistaSpriteToolkit(root)
     root.mainloop()
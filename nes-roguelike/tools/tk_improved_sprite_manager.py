@@ -5,10 +5,16 @@ Supports individual 8x8 sprites and configurable multi-tile sprites
 """
 import os
 import json
+import queue
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from PIL import Image, ImageTk
 
+from sprite_similarity import SimilarityIndex, DEFAULT_MAX_DISTANCE
+from animation_detection import detect_sequences
+from metadata_writer import write_json, flush as flush_metadata, get_writer
+from asset_watcher import AssetWatcher, DELETED
+
 class ImprovedSpriteManager:
     def __init__(self, root):
         self.root = root
@@ -17,6 +23,8 @@ class ImprovedSpriteManager:
         
         self.sprite_data = {}
         self.current_sprite = None
+        self.similarity_index = None
+        self.animation_sequences = None  # sprite path -> detected sequence
         self.sprite_configs = {
             "single": (1, 1),     # 1x1 (8x8) single sprite
             "double_h": (2, 1),   # 2x1 (16x8) horizontal double sprite
@@ -26,7 +34,12 @@ class ImprovedSpriteManager:
         
         self.current_config = "quad"  # Default to quad sprites (16x16)
         
+        # Watcher for the loaded directory; events arrive as (directory, events)
+        self.watcher = None
+        self.file_events = queue.Queue()
+        
         self.setup_ui()
+        self.root.after(500, self.poll_file_events)
     
     def setup_ui(self):
         # Main frame with two panes
@@ -179,6 +192,24 @@ class ImprovedSpriteManager:
             if search_text in sprite_path.lower() or search_text in self.sprite_data[sprite_path].get("name", "").lower():
                 self.sprite_listbox.insert(tk.END, sprite_path)
     
+    def load_sprite_metadata(self, full_path):
+        """Return the metadata for a sprite image: its .json file, or defaults"""
+        metadata_path = os.path.splitext(full_path)[0] + '.json'
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as f:
+                return json.load(f)
+        
+        # Create default metadata
+        return {
+            "name": os.path.splitext(os.path.basename(full_path))[0],
+            "type": "Unknown",
+            "bank": "",
+            "animation_frames": "",
+            "size": "8x8" if "single" in self.current_config else "16x16",
+            "palette": "",
+            "notes": ""
+        }
+    
     def load_directory(self):
         """Load all sprite images from a directory"""
         directory = filedialog.askdirectory(title="Select Sprite Directory")
@@ -188,6 +219,9 @@ class ImprovedSpriteManager:
         self.base_directory = directory  # Store the base directory for resolving paths
         self.sprite_listbox.delete(0, tk.END)
         self.sprite_data = {}
+        self.similarity_index = None  # Rebuilt on demand for the new directory
+        self.animation_sequences = None
+        flush_metadata(directory)  # Saves still queued for this directory must land before reading
         
         # Load all PNG files from directory
         loaded_count = 0
@@ -198,24 +232,14 @@ class ImprovedSpriteManager:
                     relative_path = os.path.relpath(full_path, directory)
                     self.sprite_listbox.insert(tk.END, relative_path)
                     loaded_count += 1
-                    
-                    # Check for metadata file
-                    metadata_path = os.path.splitext(full_path)[0] + '.json'
-                    if os.path.exists(metadata_path):
-                        with open(metadata_path, 'r') as f:
-                            self.sprite_data[relative_path] = json.load(f)
-                    else:
-                        # Create default metadata
-                        sprite_name = os.path.splitext(os.path.basename(file))[0]
-                        self.sprite_data[relative_path] = {
-                            "name": sprite_name,
-                            "type": "Unknown",
-                            "bank": "",
-                            "animation_frames": "",
-                            "size": "8x8" if "single" in self.current_config else "16x16",
-                            "palette": "",
-                            "notes": ""
-                        }
+                    self.sprite_data[relative_path] = self.load_sprite_metadata(full_path)
+        
+        # From now on files added, changed or removed in the directory update the list directly
+        if self.watcher:
+            self.watcher.stop()
+        self.watcher = AssetWatcher(directory, lambda events: self.file_events.put((directory, events)),
+                                    suffixes=('.png', '.json'))
+        self.watcher.start()
         
         messagebox.showinfo("Sprites Loaded", f"Loaded {loaded_count} sprites from {directory}")
         
@@ -224,6 +248,52 @@ class ImprovedSpriteManager:
             self.sprite_listbox.selection_set(0)
             self.sprite_listbox.event_generate("<<ListboxSelect>>")
     
+    def poll_file_events(self):
+        """Apply file watcher events for the loaded directory to the sprite list"""
+        sprites_changed = False
+        while True:
+            try:
+                directory, events = self.file_events.get_nowait()
+            except queue.Empty:
+                break
+            if directory != getattr(self, 'base_directory', None):
+                continue  # Left over from a directory that's no longer loaded
+            
+            for kind, path in events:
+                relative_path = os.path.relpath(path, directory)
+                if path.lower().endswith('.png'):
+                    sprites_changed = True
+                    if kind == DELETED:
+                        self.sprite_data.pop(relative_path, None)
+                        if self.current_sprite == relative_path:
+                            self.current_sprite = None
+                        continue
+                    if relative_path in self.sprite_data:
+                        continue  # New pixels for a known sprite; its metadata is unchanged
+                else:
+                    # A metadata file; reload it for the sprite it belongs to, if any
+                    stem = os.path.splitext(relative_path)[0]
+                    matches = [p for p in (stem + '.png', stem + '.PNG') if p in self.sprite_data]
+                    if not matches or get_writer().is_pending(path):
+                        continue  # Not a sprite's metadata, or our own newer save is still queued
+                    relative_path = matches[0]
+                    path = os.path.join(directory, relative_path)
+                
+                try:
+                    self.sprite_data[relative_path] = self.load_sprite_metadata(path)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Error reading metadata for {relative_path}: {e}")
+        
+        if sprites_changed:
+            # Similar sprites and animations have to be found again with the new images
+            self.similarity_index = None
+            self.animation_sequences = None
+            self.filter_sprite_list()
+            if self.current_sprite in self.sprite_listbox.get(0, tk.END):
+                self.sprite_listbox.selection_set(self.sprite_listbox.get(0, tk.END).index(self.current_sprite))
+        
+        self.root.after(500, self.poll_file_events)
+    
     def change_sprite_config(self, event=None):
         """Change the sprite configuration (single, double, quad)"""
         self.current_config = self.config_var.get()
@@ -325,9 +395,8 @@ class ImprovedSpriteManager:
         image_path = os.path.join(self.base_directory, self.current_sprite)
         metadata_path = os.path.splitext(image_path)[0] + '.json'
         
-        # Save metadata file
-        with open(metadata_path, 'w') as f:
-            json.dump(self.sprite_data[self.current_sprite], f, indent=2)
+        # Queue the metadata file; repeated saves within the window become one write
+        write_json(metadata_path, self.sprite_data[self.current_sprite])
             
         messagebox.showinfo("Saved", f"Metadata saved for {self.current_sprite}")
     
@@ -349,44 +418,35 @@ class ImprovedSpriteManager:
         current_data = self.sprite_data[self.current_sprite]
         tag_count = 0
         
-        # Apply to all sprites with similar names
-        current_base = os.path.basename(self.current_sprite)
-        current_prefix = current_base.split('_')[0] if '_' in current_base else ""
+        # Apply to all sprites that look alike (perceptual hash, mirrored frames included)
+        if self.similarity_index is None:
+            self.similarity_index = SimilarityIndex()
+            self.similarity_index.add_images(
+                (sprite_path, os.path.join(self.base_directory, sprite_path)) for sprite_path in self.sprite_data
+            )
         
-        if not current_prefix:
-            messagebox.showwarning("Warning", "Couldn't determine sprite prefix for similarity matching")
-            return
+        for _, sprite_path in self.similarity_index.find_similar(self.current_sprite, DEFAULT_MAX_DISTANCE):
+            # Update type and other relevant fields
+            self.sprite_data[sprite_path]["type"] = current_data["type"]
             
-        for sprite_path in self.sprite_data:
-            # Skip current sprite
-            if sprite_path == self.current_sprite:
-                continue
-                
-            # Check if sprite name has same prefix
-            sprite_base = os.path.basename(sprite_path)
-            if sprite_base.startswith(current_prefix):
-                # Update type and other relevant fields
-                self.sprite_data[sprite_path]["type"] = current_data["type"]
-                
-                # If animation frame info exists, preserve it but update other fields
-                if not self.sprite_data[sprite_path].get("animation_frames"):
-                    self.sprite_data[sprite_path]["animation_frames"] = current_data.get("animation_frames", "")
-                
-                # Always copy these fields
-                self.sprite_data[sprite_path]["bank"] = current_data.get("bank", "")
-                self.sprite_data[sprite_path]["configuration"] = current_data.get("configuration", self.current_config)
-                self.sprite_data[sprite_path]["size"] = current_data.get("size", "")
-                self.sprite_data[sprite_path]["palette"] = current_data.get("palette", "")
-                
-                # Save the updated metadata
-                if hasattr(self, 'base_directory'):
-                    metadata_path = os.path.splitext(os.path.join(self.base_directory, sprite_path))[0] + '.json'
-                    with open(metadata_path, 'w') as f:
-                        json.dump(self.sprite_data[sprite_path], f, indent=2)
-                else:
-                    messagebox.showerror("Error", "Base directory not set. Please reload sprites.")
-                
-                tag_count += 1
+            # If animation frame info exists, preserve it but update other fields
+            if not self.sprite_data[sprite_path].get("animation_frames"):
+                self.sprite_data[sprite_path]["animation_frames"] = current_data.get("animation_frames", "")
+            
+            # Always copy these fields
+            self.sprite_data[sprite_path]["bank"] = current_data.get("bank", "")
+            self.sprite_data[sprite_path]["configuration"] = current_data.get("configuration", self.current_config)
+            self.sprite_data[sprite_path]["size"] = current_data.get("size", "")
+            self.sprite_data[sprite_path]["palette"] = current_data.get("palette", "")
+            
+            # Save the updated metadata
+            if hasattr(self, 'base_directory'):
+                metadata_path = os.path.splitext(os.path.join(self.base_directory, sprite_path))[0] + '.json'
+                write_json(metadata_path, self.sprite_data[sprite_path])
+            else:
+                messagebox.showerror("Error", "Base directory not set. Please reload sprites.")
+            
+            tag_count += 1
         
         messagebox.showinfo("Tagging Complete", f"Applied tags to {tag_count} similar sprites")
     
@@ -395,51 +455,26 @@ class ImprovedSpriteManager:
         if not self.current_sprite:
             return
             
-        current_base = os.path.basename(self.current_sprite)
-        parts = current_base.split('_')
-        
-        if len(parts) < 2:
+        # Parse every sprite name once and index the sequences by member
+        if self.animation_sequences is None:
+            self.animation_sequences = {}
+            for sequence in detect_sequences(self.sprite_data, min_frames=1):
+                for sprite_path in sequence["frames"]:
+                    self.animation_sequences[sprite_path] = sequence
+        
+        sequence = self.animation_sequences.get(self.current_sprite)
+        if sequence is None:
             messagebox.showwarning("Warning", "Sprite filename doesn't follow the convention for animation detection")
             return
-            
-        # Assume format like sprite_012.png where 012 is sequence number
-        try:
-            # Try to find numeric part that might be frame number
-            frame_number = None
-            for part in parts:
-                if part.isdigit():
-                    frame_number = int(part)
-                    break
-            
-            if frame_number is None:
-                raise ValueError("No frame number found")
-                
-            # Find prefix (everything before frame number)
-            prefix = current_base[:current_base.find(str(frame_number))]
-            
-            # Find all sprites with same prefix
-            animation_frames = []
-            for sprite_path in sorted(self.sprite_data.keys()):
-                sprite_base = os.path.basename(sprite_path)
-                if sprite_base.startswith(prefix):
-                    # Extract frame number
-                    for part in sprite_base.split('_'):
-                        if part.isdigit():
-                            animation_frames.append(int(part))
-                            break
-            
-            # Sort frame numbers
-            animation_frames.sort()
-            
-            # Update animation frames field
-            self.anim_entry.delete(0, tk.END)
-            self.anim_entry.insert(0, ",".join(map(str, animation_frames)))
-            
-            messagebox.showinfo("Animation Detection", 
-                               f"Detected {len(animation_frames)} frames in animation sequence")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error detecting animation: {e}")
+        
+        animation_frames = sequence["frame_numbers"]
+        
+        # Update animation frames field
+        self.anim_entry.delete(0, tk.END)
+        self.anim_entry.insert(0, ",".join(map(str, animation_frames)))
+        
+        messagebox.showinfo("Animation Detection", 
+                           f"Detected {len(animation_frames)} frames in animation sequence")
     
     def export_all_data(self):
         """Export all sprite metadata to a JSON file"""